@@ -0,0 +1,62 @@
+import asyncio
+
+from async_pipeline import AsyncTurnPipeline
+from loop import RecordingLoop
+from tracing import tracer
+from triggers import STOP_POLL_INTERVAL
+from events import application_signal
+
+
+class AsyncRecordingLoop(RecordingLoop):
+    def start_live(self, id: int, stop: callable, callback: callable) -> None:
+        """
+        Live recording and interaction loop on one asyncio event loop.
+
+        Takes the same arguments as RecordingLoop.start_live and is started the same way, on a thread
+        owned by the Qt model. The stages run as tasks on that thread's loop, so transcription of one turn,
+        synthesis of the previous one and delivery overlap without a thread per stage. Blocking capture
+        runs in the loop's default executor. Progress is emitted on application_signal, which the GUI
+        mirrors onto Qt signals that are queued onto the GUI thread.
+
+        Args:
+            id (int): An identifier for the recording session.
+            stop (callable): A callable to determine if the loop should stop.
+            callback (callable): Called with the AudioBuffer of each voice response and its turn id, in turn order.
+                May be a coroutine function. If it has an aclose coroutine, that is awaited when the loop ends.
+        """
+        asyncio.run(self.run_live(stop, callback))
+
+    async def run_live(self, stop: callable, callback: callable) -> None:
+        """
+        The body of start_live, for callers that already run an event loop.
+
+        Args:
+            stop (callable): A callable to determine if the loop should stop.
+            callback (callable): Called with the AudioBuffer of each voice response and its turn id, in turn order.
+        """
+        pipeline = AsyncTurnPipeline.from_handler(
+            self.ai_service, callback, max_queue_size=self.max_queue_size,
+            streaming=self.ai_service.stream, archive=self.archive
+        )
+        pipeline.start()
+        trigger = self.create_trigger()
+        trigger.start()
+        try:
+            while not stop():
+                if not await asyncio.to_thread(trigger.wait, STOP_POLL_INTERVAL):
+                    continue
+                audio, transcription, speculation = await asyncio.to_thread(self.capture_turn, trigger, stop)
+                if audio is None or not audio.frames:
+                    continue
+                application_signal.isRecording.emit("WAITING")
+                await pipeline.submit(self.create_turn(audio, transcription, speculation))
+                application_signal.isRecording.emit("USER")
+        finally:
+            print("Exiting loop.")
+            trigger.close()
+            await pipeline.stop()
+            tracer.flush()
+            await asyncio.to_thread(self.close)
+            if hasattr(callback, "aclose"):
+                await callback.aclose()
+            await self.ai_service.aclose()
@@ -0,0 +1,257 @@
+import asyncio
+import inspect
+import time
+
+from handlers.segmenter import SentenceSegmenter
+from metrics import metrics
+from pipeline import STOP, Turn, Segment, voice_name
+from tracing import tracer
+from events import application_signal, USER_PREFIX
+
+
+class AsyncPipelineStage:
+    def __init__(self, name: str, handler: callable, max_queue_size: int = 2, fan_out: bool = False):
+        """
+        Initialize an AsyncPipelineStage, the asyncio counterpart of PipelineStage. It runs as a task, not a thread.
+
+        Args:
+            name (str): The name of the stage, used for logging.
+            handler (callable): A coroutine function called with each input item. Returns the item for the next stage or None.
+            max_queue_size (int): The size of the input queue. A full queue suspends the previous stage (backpressure).
+            fan_out (bool): If True, handler is an async generator and each element is forwarded as soon as it is produced.
+        """
+        self.name = name
+        self.handler = handler
+        self.fan_out = fan_out
+        self.max_queue_size = max_queue_size
+        self.input = None
+        self.next_stage = None
+        self.cancelled = None
+        self.task = None
+
+    def start(self, cancelled: asyncio.Event) -> None:
+        """
+        Start the worker task on the running loop.
+
+        Args:
+            cancelled (asyncio.Event): Set when pending items should be dropped instead of processed.
+        """
+        self.cancelled = cancelled
+        self.input = asyncio.Queue(maxsize=self.max_queue_size)
+        self.task = asyncio.create_task(self.run(), name=f"pipeline-{self.name}")
+
+    async def put(self, item) -> None:
+        """
+        Queue an item for this stage, waiting while the queue is full.
+
+        Args:
+            item: The item to process.
+        """
+        await self.input.put(item)
+
+    async def forward(self, item) -> None:
+        """
+        Hand an item to the next stage, if there is one.
+
+        Args:
+            item: The processed item.
+        """
+        if item is not None and self.next_stage:
+            await self.next_stage.put(item)
+
+    async def run(self) -> None:
+        """
+        Worker loop. Items are handled one at a time, so the order of the input queue is preserved downstream.
+        """
+        while True:
+            item = await self.input.get()
+            if item is STOP:
+                if self.next_stage:
+                    await self.next_stage.put(STOP)
+                break
+            if self.cancelled.is_set():
+                item.close()
+                continue
+            try:
+                if self.fan_out:
+                    async for result in self.handler(item):
+                        await self.forward(result)
+                else:
+                    await self.forward(await self.handler(item))
+            except Exception as e:
+                print(f"Pipeline stage {self.name} failed: {e}")
+                item.close()
+
+
+class AsyncTurnPipeline:
+    def __init__(self, stages: list):
+        """
+        Initialize an AsyncTurnPipeline from an ordered list of stages.
+
+        Args:
+            stages (list): The AsyncPipelineStage instances, first to last.
+        """
+        self.stages = stages
+        self.cancelled = None
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+
+    @classmethod
+    def from_handler(cls, ai_service, callback: callable, max_queue_size: int = 2, streaming: bool = False, archive=None):
+        """
+        Build the STT -> LLM -> TTS -> delivery pipeline for an AsyncAIHandler.
+
+        Args:
+            ai_service (AsyncAIHandler): The AI service for transcribing and responding.
+            callback (callable): Called with the AudioBuffer of each synthesized response and its turn id, in turn order.
+                May be a coroutine function.
+            max_queue_size (int): The input queue size for every stage.
+            streaming (bool): Stream the response and synthesize and deliver it one sentence at a time.
+            archive (AudioArchive): If given, synthesized responses are also written to disk in the background.
+
+        Returns:
+            AsyncTurnPipeline: The (not yet started) pipeline.
+        """
+        async def send(voice, turn_id: int) -> None:
+            result = callback(voice, turn_id)
+            if inspect.isawaitable(result):
+                await result
+
+        async def transcribe(turn: Turn) -> Turn:
+            with tracer.span("transcribe", turn.turn_id):
+                if turn.transcription:
+                    turn.question = await asyncio.to_thread(turn.transcription.finish, turn.audio.frames)
+                if turn.question is None:
+                    turn.question = await ai_service.transcribe_audio(turn.audio)
+            application_signal.addResponseWidgetSignal.emit(f"{USER_PREFIX}{turn.question}")
+            return turn
+
+        async def respond(turn: Turn) -> Turn:
+            with tracer.span("get_response", turn.turn_id):
+                if turn.speculation:
+                    turn.response = await asyncio.to_thread(turn.speculation.resolve, turn.question)
+                if turn.response is None:
+                    turn.response = await ai_service.get_response(turn.question)
+            application_signal.addResponseWidgetSignal.emit(f"{ai_service.NAME} : {turn.response.content}")
+            return turn
+
+        async def speak(turn: Turn) -> Turn:
+            with tracer.span("text_to_speech", turn.turn_id):
+                turn.voice = await ai_service.synthesize_speech(turn.response.content)
+            turn.voice.name = voice_name(turn.audio, "_bot.wav")
+            if archive:
+                archive.submit(turn.voice)
+            return turn
+
+        async def deliver(turn: Turn) -> Turn:
+            application_signal.isRecording.emit("PLAYING")
+            with tracer.span("callback", turn.turn_id):
+                await send(turn.voice, turn.turn_id)
+            turn.delivered = time.monotonic()
+            turn.first_audio = turn.delivered
+            metrics.increment("turns.completed")
+            return turn
+
+        async def deltas(speculated, question: str):
+            if speculated:
+                yield speculated.content
+                return
+            async for delta in ai_service.stream_response(question):
+                yield delta
+
+        async def respond_streaming(turn: Turn):
+            segmenter = SentenceSegmenter()
+            texts = []
+            start = tracer.now()
+            failure = None
+            try:
+                speculated = None
+                if turn.speculation:
+                    speculated = await asyncio.to_thread(turn.speculation.resolve, turn.question)
+                async for delta in deltas(speculated, turn.question):
+                    for text in segmenter.feed(delta):
+                        texts.append(text)
+                        yield Segment(turn, len(texts) - 1, text)
+                for text in segmenter.flush():
+                    texts.append(text)
+                    yield Segment(turn, len(texts) - 1, text)
+            except Exception as e:
+                ## The sentences already spoken still complete the turn, the failure is reported after
+                failure = e
+            finally:
+                tracer.add("get_response", turn.turn_id, start, tracer.now())
+                turn.response = " ".join(texts)
+                application_signal.addResponseWidgetSignal.emit(f"{ai_service.NAME} : {turn.response}")
+            yield Segment(turn, len(texts), None)
+            if failure:
+                raise failure
+
+        async def speak_segment(segment: Segment) -> Segment:
+            if segment.text is None:
+                return segment
+            with tracer.span("text_to_speech", segment.turn.turn_id, segment=segment.index):
+                segment.voice = await ai_service.synthesize_speech(segment.text)
+            segment.voice.name = voice_name(segment.turn.audio, f"_bot_{segment.index}.wav")
+            if archive:
+                archive.submit(segment.voice)
+            return segment
+
+        async def deliver_segment(segment: Segment) -> Segment:
+            turn = segment.turn
+            if segment.text is None:
+                turn.delivered = time.monotonic()
+                metrics.increment("turns.completed")
+                return segment
+            if turn.first_audio is None:
+                application_signal.isRecording.emit("PLAYING")
+            with tracer.span("callback", turn.turn_id, segment=segment.index):
+                await send(segment.voice, turn.turn_id)
+            if turn.first_audio is None:
+                turn.first_audio = time.monotonic()
+            return segment
+
+        if streaming:
+            return cls([
+                AsyncPipelineStage("transcribe", transcribe, max_queue_size),
+                AsyncPipelineStage("respond", respond_streaming, max_queue_size, fan_out=True),
+                AsyncPipelineStage("speak", speak_segment, max_queue_size),
+                AsyncPipelineStage("deliver", deliver_segment, max_queue_size),
+            ])
+        return cls([
+            AsyncPipelineStage("transcribe", transcribe, max_queue_size),
+            AsyncPipelineStage("respond", respond, max_queue_size),
+            AsyncPipelineStage("speak", speak, max_queue_size),
+            AsyncPipelineStage("deliver", deliver, max_queue_size),
+        ])
+
+    def start(self) -> None:
+        """
+        Start a worker task for every stage, and publish the stage queue depths as gauges. Must be called on the running loop.
+        """
+        self.cancelled = asyncio.Event()
+        for stage in self.stages:
+            stage.start(self.cancelled)
+            metrics.register_gauge(f"queue.{stage.name}", stage.input.qsize)
+
+    async def submit(self, turn: Turn) -> None:
+        """
+        Submit a captured turn. Waits while the first stage is full.
+
+        Args:
+            turn (Turn): The turn to process.
+        """
+        await self.stages[0].put(turn)
+
+    async def stop(self, drain: bool = False) -> None:
+        """
+        Stop the pipeline and wait for the workers.
+
+        Args:
+            drain (bool): If True, finish the turns already queued. Otherwise drop them.
+        """
+        if not drain:
+            self.cancelled.set()
+        await self.stages[0].put(STOP)
+        await asyncio.gather(*(stage.task for stage in self.stages))
+        for stage in self.stages:
+            metrics.unregister_gauge(f"queue.{stage.name}")
@@ -0,0 +1,156 @@
+"""
+Compare the threaded turn pipeline with the asyncio pipeline when many sessions run at once.
+
+Every stage is a fake that only waits, standing in for network latency. Each session submits its
+turns back to back. The threaded pipeline needs four worker threads per session (plus one submitting
+thread here); the asyncio pipeline runs every session's stages as tasks on one event loop.
+
+Run from the src directory:
+    python -m benchmarks.async_benchmark --sessions 1 8 32 --turns 5 --latency 0.2
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from async_pipeline import AsyncTurnPipeline
+from benchmarks.fakes import AsyncFakeAIHandler, FakeAIHandler
+from handlers.audio_buffer import AudioBuffer
+from pipeline import TurnPipeline, Turn
+
+
+def create_turns(sessions: int, turns: int) -> list:
+    """
+    Create the turns of every session.
+
+    Args:
+        sessions (int): The number of sessions.
+        turns (int): The number of turns per session.
+
+    Returns:
+        list: One list of turns per session.
+    """
+    audio = np.zeros((16000, 1), dtype='float32')
+    return [[Turn(AudioBuffer(audio, 16000, f"bench_{session}_{index}.wav")) for index in range(turns)]
+            for session in range(sessions)]
+
+
+def run_threaded(sessions: int, turns: int, latency: float) -> tuple:
+    """
+    Run every session on its own threaded TurnPipeline.
+
+    Args:
+        sessions (int): The number of sessions.
+        turns (int): The number of turns per session.
+        latency (float): Seconds each stage and each delivery waits.
+
+    Returns:
+        tuple: The turns, the wall time and the peak thread count.
+    """
+    def callback(audio: AudioBuffer, turn_id: int) -> None:
+        time.sleep(latency)
+
+    session_turns = create_turns(sessions, turns)
+    pipelines = [TurnPipeline.from_handler(FakeAIHandler(latency, latency, latency), callback) for _ in range(sessions)]
+    peak = threading.active_count()
+
+    def feed(pipeline: TurnPipeline, submitted: list) -> None:
+        for turn in submitted:
+            pipeline.submit(turn)
+
+    start = time.monotonic()
+    feeders = []
+    for pipeline, submitted in zip(pipelines, session_turns):
+        pipeline.start()
+        feeders.append(threading.Thread(target=feed, args=(pipeline, submitted)))
+        feeders[-1].start()
+    peak = max(peak, threading.active_count())
+    for feeder in feeders:
+        feeder.join()
+    for pipeline in pipelines:
+        pipeline.stop(drain=True)
+    return session_turns, time.monotonic() - start, peak
+
+
+def run_async(sessions: int, turns: int, latency: float) -> tuple:
+    """
+    Run every session on an AsyncTurnPipeline, all on one event loop.
+
+    Args:
+        sessions (int): The number of sessions.
+        turns (int): The number of turns per session.
+        latency (float): Seconds each stage and each delivery waits.
+
+    Returns:
+        tuple: The turns, the wall time and the peak thread count.
+    """
+    async def callback(audio: AudioBuffer, turn_id: int) -> None:
+        await asyncio.sleep(latency)
+
+    async def feed(pipeline: AsyncTurnPipeline, submitted: list) -> None:
+        for turn in submitted:
+            await pipeline.submit(turn)
+
+    async def main() -> tuple:
+        session_turns = create_turns(sessions, turns)
+        pipelines = [AsyncTurnPipeline.from_handler(AsyncFakeAIHandler(latency, latency, latency), callback)
+                     for _ in range(sessions)]
+        start = time.monotonic()
+        for pipeline in pipelines:
+            pipeline.start()
+        await asyncio.gather(*(feed(pipeline, submitted) for pipeline, submitted in zip(pipelines, session_turns)))
+        peak = threading.active_count()
+        await asyncio.gather(*(pipeline.stop(drain=True) for pipeline in pipelines))
+        return session_turns, time.monotonic() - start, peak
+
+    return asyncio.run(main())
+
+
+def summarize(session_turns: list, total: float, peak: int) -> dict:
+    """
+    Reduce a run to its statistics.
+
+    Args:
+        session_turns (list): The turns of every session.
+        total (float): The wall time.
+        peak (int): The peak thread count.
+
+    Returns:
+        dict: Throughput, latency statistics and the thread count.
+    """
+    latencies = sorted(turn.latency for turns in session_turns for turn in turns)
+    return {
+        "total": total,
+        "throughput": len(latencies) / total,
+        "latency_mean": statistics.mean(latencies),
+        "latency_p95": latencies[int(len(latencies) * 0.95)],
+        "threads": peak,
+    }
+
+
+def main() -> None:
+    """
+    Parse the arguments, run both pipelines for every session count and print the comparison.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds each request waits")
+    args = parser.parse_args()
+
+    for sessions in args.sessions:
+        for name, run in (("threaded", run_threaded), ("asyncio", run_async)):
+            result = summarize(*run(sessions, args.turns, args.latency))
+            print(
+                f"{sessions:3d} sessions {name:>8}: total {result['total']:.2f}s, "
+                f"throughput {result['throughput']:6.1f} turns/s, "
+                f"latency mean {result['latency_mean']:.2f}s p95 {result['latency_p95']:.2f}s, "
+                f"threads {result['threads']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Compare the capture paths of VoiceRecorder on a synthetic input stream, no sound hardware needed.
+
+"queue" is the previous callback, which copied every block into a queue.Queue. "ring" is the current
+VoiceRecorder.callback, which writes into the preallocated AudioRingBuffer. A producer thread calls the
+callback at the block rate of a sound card while a consumer thread drains it the way capture() does.
+
+Reported per path: callback duration percentiles, scheduling jitter of the callback thread, frames lost,
+and the memory the callback allocates (measured in a separate single-threaded pass with tracemalloc,
+which would otherwise distort the timings).
+
+Run from the src directory:
+    python -m benchmarks.capture_benchmark --seconds 5 --block-ms 10
+"""
+import argparse
+import queue
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from handlers.audio_handler import VoiceRecorder
+
+
+class QueueCapture:
+    def __init__(self, channels: int):
+        """
+        Initialize the QueueCapture, the previous capture path: a copy of every block in a queue.Queue.
+
+        Args:
+            channels (int): The number of channels.
+        """
+        self.q = queue.Queue()
+        self.channels = channels
+
+    def callback(self, indata: np.ndarray, frames: int, time, status) -> None:
+        """
+        Queue a copy of the block.
+        """
+        self.q.put(indata.copy())
+
+    def drain(self) -> int:
+        """
+        Take every queued block, as capture() did.
+
+        Returns:
+            int: The number of frames taken.
+        """
+        frames = 0
+        try:
+            block = self.q.get(timeout=0.01)
+        except queue.Empty:
+            return 0
+        blocks = [block]
+        while not self.q.empty():
+            blocks.append(self.q.get_nowait())
+        for block in blocks:
+            frames += len(block)
+        return frames
+
+
+class RingCapture:
+    def __init__(self, recorder: VoiceRecorder):
+        """
+        Initialize the RingCapture, the current capture path through VoiceRecorder's ring buffer.
+
+        Args:
+            recorder (VoiceRecorder): The recorder.
+        """
+        self.recorder = recorder
+        self.callback = recorder.callback
+
+    def drain(self) -> int:
+        """
+        Read every available frame, as capture() does.
+
+        Returns:
+            int: The number of frames read.
+        """
+        if not self.recorder.ring.wait(1, 0.01):
+            return 0
+        return len(self.recorder.ring.read())
+
+
+def percentiles(values: np.ndarray) -> str:
+    """
+    Format microsecond percentiles.
+
+    Args:
+        values (np.ndarray): Durations in nanoseconds.
+
+    Returns:
+        str: p50, p99 and max in microseconds.
+    """
+    p50, p99 = np.percentile(values, (50, 99)) / 1000
+    return f"p50 {p50:7.1f} us, p99 {p99:7.1f} us, max {values.max() / 1000:8.1f} us"
+
+
+def measure_timing(capture, block: np.ndarray, block_seconds: float, seconds: float) -> dict:
+    """
+    Run the producer and the consumer together for a while.
+
+    Args:
+        capture (QueueCapture or RingCapture): The capture path.
+        block (np.ndarray): The block the fake sound card delivers each time, reused like a driver buffer.
+        block_seconds (float): The time between blocks.
+        seconds (float): How long to run.
+
+    Returns:
+        dict: Callback durations and scheduling lateness in nanoseconds, and the frames produced and consumed.
+    """
+    count = int(seconds / block_seconds)
+    durations = np.zeros(count, dtype=np.int64)
+    lateness = np.zeros(count, dtype=np.int64)
+    done = threading.Event()
+    consumed = [0]
+
+    def consume() -> None:
+        while not done.is_set():
+            consumed[0] += capture.drain()
+        consumed[0] += capture.drain()
+
+    consumer = threading.Thread(target=consume, name="consumer")
+    consumer.start()
+    start = time.perf_counter_ns()
+    interval = int(block_seconds * 1e9)
+    for index in range(count):
+        due = start + index * interval
+        while time.perf_counter_ns() < due:
+            time.sleep(max(0.0, (due - time.perf_counter_ns()) / 1e9 - 0.0005))
+        begin = time.perf_counter_ns()
+        capture.callback(block, len(block), None, None)
+        durations[index] = time.perf_counter_ns() - begin
+        lateness[index] = begin - due
+    done.set()
+    consumer.join()
+    return {"durations": durations, "lateness": lateness, "produced": count * len(block), "consumed": consumed[0]}
+
+
+def measure_allocations(capture, block: np.ndarray, count: int = 2000) -> float:
+    """
+    Measure what one callback allocates, including memory it frees again before returning.
+
+    Args:
+        capture (QueueCapture or RingCapture): The capture path.
+        block (np.ndarray): The block to deliver.
+        count (int): The number of callbacks to average over.
+
+    Returns:
+        float: The mean bytes allocated per callback.
+    """
+    total = 0
+    tracemalloc.start()
+    for _ in range(count):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        capture.callback(block, len(block), None, None)
+        total += tracemalloc.get_traced_memory()[1] - before
+        ## Drain outside the measured call, so the copies do not pile up
+        capture.drain()
+    tracemalloc.stop()
+    return total / count
+
+
+def main() -> None:
+    """
+    Parse the arguments, run both capture paths and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--block-ms", type=float, default=10.0, help="Milliseconds per callback block")
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--channels", type=int, default=2)
+    args = parser.parse_args()
+
+    frames = int(args.sample_rate * args.block_ms / 1000)
+    block = np.random.default_rng(0).uniform(-0.5, 0.5, (frames, args.channels)).astype('float32')
+    block_seconds = frames / args.sample_rate
+    print(f"{frames} frames x {args.channels} channels per block, {1 / block_seconds:.0f} callbacks/s, {args.seconds:.0f}s")
+
+    for name in ("queue", "ring"):
+        def create():
+            if name == "queue":
+                return QueueCapture(args.channels)
+            return RingCapture(VoiceRecorder(device={"name": "synthetic"}, sample_rate=args.sample_rate, channel_count=args.channels))
+
+        timing = measure_timing(create(), block, block_seconds, args.seconds)
+        allocated = measure_allocations(create(), block)
+        print(f"{name:>5}: callback {percentiles(timing['durations'])}")
+        print(f"{'':>5}  lateness {percentiles(timing['lateness'])}")
+        print(f"{'':>5}  allocated {allocated:8.0f} B/callback, {allocated / block_seconds / 1024:8.1f} KiB/s, "
+              f"frames lost {timing['produced'] - timing['consumed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Iterator
+
+import numpy as np
+
+from handlers.ai_handler import AIHandler
+from handlers.async_handler import AsyncAIHandler
+from handlers.audio_buffer import AudioBuffer
+from handlers.streaming_stt import TranscriptionBackend
+
+
+DEFAULT_REPLY = (
+    "The weather in Denmark is mild for most of the year. "
+    "Summers are cool, with long evenings and the occasional heat wave. "
+    "Winters are grey and windy, but rarely very cold. "
+    "Bring a rain jacket whenever you visit."
+)
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        """
+        Initialize a FakeMessage, shaped like the chat message the OpenAI SDK returns.
+
+        Args:
+            content (str): The message text.
+        """
+        self.role = "assistant"
+        self.content = content
+
+
+class FakeAIHandler(AIHandler):
+    NAME = "FAKE"
+
+    def __init__(self, transcribe_delay: float = 0.3, response_delay: float = 0.8, speech_delay: float = 0.5,
+                 token_delay: float = 0.0, speech_delay_per_char: float = 0.0, reply: str = DEFAULT_REPLY, **kwargs):
+        """
+        Initialize the FakeAIHandler, an offline stand-in that only sleeps.
+
+        Args:
+            transcribe_delay (float): Seconds spent in transcribe_audio_file.
+            response_delay (float): Seconds until the first token of a response.
+            speech_delay (float): Fixed seconds spent in each text_to_speech call.
+            token_delay (float): Seconds between streamed words. get_response waits for all of them.
+            speech_delay_per_char (float): Extra text_to_speech seconds per character of text.
+            reply (str): The text every response returns.
+            kwargs: Additional keyword arguments.
+        """
+        super().__init__(**kwargs)
+        self.transcribe_delay = transcribe_delay
+        self.response_delay = response_delay
+        self.speech_delay = speech_delay
+        self.token_delay = token_delay
+        self.speech_delay_per_char = speech_delay_per_char
+        self.reply = reply
+
+    def transcribe_audio_file(self, path: str) -> str:
+        """
+        Pretend to transcribe an audio file.
+
+        Args:
+            path (str): The path to the audio file.
+
+        Returns:
+            str: A transcription naming the file.
+        """
+        time.sleep(self.transcribe_delay)
+        return f"question for {path}"
+
+    def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Pretend to transcribe audio held in memory.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: A transcription naming the clip.
+        """
+        time.sleep(self.transcribe_delay)
+        return f"question for {audio.name}"
+
+    def get_response(self, question: str) -> FakeMessage:
+        """
+        Pretend to ask the chat model.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            FakeMessage: The canned response.
+        """
+        return FakeMessage("".join(self.stream_response(question)))
+
+    def prepare_response(self, question: str, cancelled: threading.Event = None) -> FakeMessage:
+        """
+        Pretend to ask the chat model speculatively. A cancellation ends the wait at once.
+
+        Args:
+            question (str): The question to ask the AI.
+            cancelled (threading.Event): Set when the response is no longer wanted.
+
+        Returns:
+            FakeMessage: The canned response, or None if it was cancelled.
+        """
+        cancelled = cancelled or threading.Event()
+        words = self.reply.split(" ")
+        if cancelled.wait(self.response_delay + self.token_delay * (len(words) - 1)):
+            return None
+        return FakeMessage(self.reply)
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        """
+        Pretend to stream a response, one word at a time.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The canned response, word by word.
+        """
+        time.sleep(self.response_delay)
+        for index, word in enumerate(self.reply.split(" ")):
+            if index:
+                time.sleep(self.token_delay)
+                word = " " + word
+            yield word
+
+    def text_to_speech(self, text: str, file_path: str) -> None:
+        """
+        Pretend to synthesize speech. Nothing is written.
+
+        Args:
+            text (str): The text to convert to speech.
+            file_path (str): The path the speech would be saved to.
+        """
+        time.sleep(self.speech_delay + self.speech_delay_per_char * len(text))
+
+    def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Pretend to synthesize speech into memory.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: A short silent clip.
+        """
+        self.text_to_speech(text, None)
+        return AudioBuffer(np.zeros(2400, dtype='int16'), 24000)
+
+
+class LatencyDistribution:
+    ## The shapes a distribution can have
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, kind: str = "fixed", mean: float = 0.0, spread: float = 0.0, seed: int = 0):
+        """
+        Initialize a LatencyDistribution, a seeded source of delays. The same seed gives the same delays.
+
+        Args:
+            kind (str): "fixed", "uniform" (mean +- spread), "normal" or "lognormal" (spread is the standard deviation).
+            mean (float): The mean delay in seconds.
+            spread (float): The half width or standard deviation in seconds.
+            seed (int): The random seed.
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind}, expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.mean = float(mean)
+        self.spread = float(spread)
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0):
+        """
+        Build a distribution from a command line value such as "lognormal:0.8:0.2" or "0.5".
+
+        Args:
+            spec (str): kind:mean:spread, or just a number for a fixed delay.
+            seed (int): The random seed.
+
+        Returns:
+            LatencyDistribution: The distribution.
+        """
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls("fixed", float(parts[0]), seed=seed)
+        return cls(parts[0], float(parts[1]), float(parts[2]) if len(parts) > 2 else 0.0, seed)
+
+    def sample(self) -> float:
+        """
+        Draw one delay.
+
+        Returns:
+            float: The delay in seconds, never negative.
+        """
+        if self.kind == "fixed" or self.spread <= 0 or self.mean <= 0:
+            return max(0.0, self.mean)
+        with self.lock:
+            if self.kind == "uniform":
+                value = self.rng.uniform(self.mean - self.spread, self.mean + self.spread)
+            elif self.kind == "normal":
+                value = self.rng.normal(self.mean, self.spread)
+            else:
+                ## Parameters of the underlying normal that give this mean and standard deviation
+                sigma = np.sqrt(np.log1p((self.spread / self.mean) ** 2))
+                value = self.rng.lognormal(np.log(self.mean) - sigma ** 2 / 2, sigma)
+        return max(0.0, float(value))
+
+    def __str__(self) -> str:
+        """
+        Format the distribution the way parse reads it.
+        """
+        return f"{self.kind}:{self.mean:g}:{self.spread:g}"
+
+
+class ReplayAIHandler(AIHandler):
+    NAME = "REPLAY"
+
+    def __init__(self, transcribe: LatencyDistribution, respond: LatencyDistribution, speak: LatencyDistribution,
+                 voices: list = None, token_delay: float = 0.0, reply: str = DEFAULT_REPLY,
+                 transcribe_per_second: float = 0.0, **kwargs):
+        """
+        Initialize the ReplayAIHandler, an offline stand-in whose delays follow seeded distributions
+        and whose speech is taken from recorded clips.
+
+        Args:
+            transcribe (LatencyDistribution): Seconds spent in each transcription.
+            transcribe_per_second (float): Extra transcription seconds per second of audio.
+            respond (LatencyDistribution): Seconds until the first token of each response.
+            speak (LatencyDistribution): Seconds spent in each speech synthesis.
+            voices (list): AudioBuffers returned by synthesize_speech in turn, for example the recorded bot clips.
+                Defaults to a short silent clip.
+            token_delay (float): Seconds between streamed words.
+            reply (str): The text every response returns.
+            kwargs: Additional keyword arguments.
+        """
+        super().__init__(**kwargs)
+        self.transcribe = transcribe
+        self.respond = respond
+        self.speak = speak
+        self.voices = voices or [AudioBuffer(np.zeros(2400, dtype='int16'), 24000)]
+        self.token_delay = token_delay
+        self.reply = reply
+        self.transcribe_per_second = transcribe_per_second
+        self.spoken = 0
+
+    def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Pretend to transcribe audio held in memory.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: A transcription naming the clip.
+        """
+        time.sleep(self.transcribe.sample() + self.transcribe_per_second * audio.duration)
+        return f"question for {audio.name}"
+
+    def get_response(self, question: str) -> FakeMessage:
+        """
+        Pretend to ask the chat model.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            FakeMessage: The canned response.
+        """
+        return FakeMessage("".join(self.stream_response(question)))
+
+    def prepare_response(self, question: str, cancelled: threading.Event = None) -> FakeMessage:
+        """
+        Pretend to ask the chat model speculatively. A cancellation ends the wait at once.
+
+        Args:
+            question (str): The question to ask the AI.
+            cancelled (threading.Event): Set when the response is no longer wanted.
+
+        Returns:
+            FakeMessage: The canned response, or None if it was cancelled.
+        """
+        cancelled = cancelled or threading.Event()
+        words = self.reply.split(" ")
+        if cancelled.wait(self.respond.sample() + self.token_delay * (len(words) - 1)):
+            return None
+        return FakeMessage(self.reply)
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        """
+        Pretend to stream a response, one word at a time.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The canned response, word by word.
+        """
+        time.sleep(self.respond.sample())
+        for index, word in enumerate(self.reply.split(" ")):
+            if index:
+                time.sleep(self.token_delay)
+                word = " " + word
+            yield word
+
+    def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Pretend to synthesize speech, returning the next recorded clip.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The clip.
+        """
+        time.sleep(self.speak.sample())
+        voice = self.voices[self.spoken % len(self.voices)]
+        self.spoken += 1
+        return AudioBuffer(voice.data, voice.sample_rate)
+
+
+class FakeTranscriptionBackend(TranscriptionBackend):
+    def __init__(self, handler=None, latency: float = 0.15, per_second: float = 0.05, words_per_second: float = 2.5,
+                 level: float = 0.01, **kwargs):
+        """
+        Initialize the FakeTranscriptionBackend, an offline streaming transcription backend. Set
+        stt_backend: benchmarks.fakes.FakeTranscriptionBackend in the AI config to use it.
+
+        The text depends only on the audio: one word per 1 / words_per_second seconds of sound above level.
+        Partial transcripts therefore grow while someone speaks and stay the same during silence.
+
+        Args:
+            handler (AIHandler): Unused.
+            latency (float): Fixed seconds spent in each request.
+            per_second (float): Extra seconds per second of audio.
+            words_per_second (float): Words produced per second of sound.
+            level (float): The RMS level (full scale 1.0) of 100 ms of audio that counts as sound.
+            kwargs: Additional keyword arguments.
+        """
+        super().__init__(handler)
+        self.latency = latency
+        self.per_second = per_second
+        self.words_per_second = words_per_second
+        self.level = level
+
+    def transcribe(self, audio: AudioBuffer) -> str:
+        """
+        Pretend to transcribe a piece of a recording.
+
+        Args:
+            audio (AudioBuffer): The audio.
+
+        Returns:
+            str: One "word" per stretch of sound.
+        """
+        time.sleep(self.latency + self.per_second * audio.duration)
+        data = audio.data.mean(axis=1) if audio.data.ndim > 1 else audio.data
+        size = max(1, audio.sample_rate // 10)
+        count = len(data) // size
+        rms = np.sqrt(np.square(data[:count * size].reshape(count, size), dtype='float32').mean(axis=1))
+        sound_seconds = np.count_nonzero(rms >= self.level) / 10
+        return " ".join(["word"] * int(sound_seconds * self.words_per_second))
+
+
+class AsyncFakeAIHandler(AsyncAIHandler):
+    NAME = "FAKE"
+
+    def __init__(self, transcribe_delay: float = 0.3, response_delay: float = 0.8, speech_delay: float = 0.5,
+                 token_delay: float = 0.0, reply: str = DEFAULT_REPLY, **kwargs):
+        """
+        Initialize the AsyncFakeAIHandler, the asyncio counterpart of FakeAIHandler. It only awaits sleeps.
+
+        Args:
+            transcribe_delay (float): Seconds spent in transcribe_audio.
+            response_delay (float): Seconds until the first token of a response.
+            speech_delay (float): Seconds spent in each synthesize_speech call.
+            token_delay (float): Seconds between streamed words. get_response waits for all of them.
+            reply (str): The text every response returns.
+            kwargs: Additional keyword arguments.
+        """
+        super().__init__(**kwargs)
+        self.transcribe_delay = transcribe_delay
+        self.response_delay = response_delay
+        self.speech_delay = speech_delay
+        self.token_delay = token_delay
+        self.reply = reply
+
+    async def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Pretend to transcribe audio held in memory.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: A transcription naming the clip.
+        """
+        await asyncio.sleep(self.transcribe_delay)
+        return f"question for {audio.name}"
+
+    async def get_response(self, question: str) -> FakeMessage:
+        """
+        Pretend to ask the chat model.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            FakeMessage: The canned response.
+        """
+        return FakeMessage("".join([delta async for delta in self.stream_response(question)]))
+
+    async def stream_response(self, question: str) -> AsyncIterator[str]:
+        """
+        Pretend to stream a response, one word at a time.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The canned response, word by word.
+        """
+        await asyncio.sleep(self.response_delay)
+        for index, word in enumerate(self.reply.split(" ")):
+            if index:
+                await asyncio.sleep(self.token_delay)
+                word = " " + word
+            yield word
+
+    async def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Pretend to synthesize speech into memory.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: A short silent clip.
+        """
+        await asyncio.sleep(self.speech_delay)
+        return AudioBuffer(np.zeros(2400, dtype='int16'), 24000)
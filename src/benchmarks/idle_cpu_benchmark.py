@@ -0,0 +1,80 @@
+"""
+Measure the CPU an idle live loop uses while waiting for a turn, before and after event-driven triggers.
+
+"polling" is the old loop: spin on a key check with no sleep. "event" blocks on a TurnTrigger.
+No key is ever pressed, so both loops stay idle for the whole run.
+
+Run from the src directory:
+    python -m benchmarks.idle_cpu_benchmark --seconds 5
+"""
+import argparse
+import threading
+import time
+
+from triggers import TurnTrigger, STOP_POLL_INTERVAL
+
+
+def polling_loop(stop: threading.Event) -> None:
+    """
+    The pre-trigger idle loop, with a key check that is never true.
+
+    Args:
+        stop (threading.Event): Set to end the loop.
+    """
+    is_pressed = lambda: False
+    while True:
+        if stop.is_set():
+            break
+        if is_pressed():
+            break
+
+
+def event_loop(stop: threading.Event) -> None:
+    """
+    The trigger-based idle loop.
+
+    Args:
+        stop (threading.Event): Set to end the loop.
+    """
+    trigger = TurnTrigger()
+    while not stop.is_set():
+        if trigger.wait(STOP_POLL_INTERVAL):
+            break
+
+
+def measure(loop: callable, seconds: float) -> float:
+    """
+    Run an idle loop on a thread and measure the process CPU time it used.
+
+    Args:
+        loop (callable): The loop to run.
+        seconds (float): How long to run it.
+
+    Returns:
+        float: CPU use as a percentage of one core.
+    """
+    stop = threading.Event()
+    thread = threading.Thread(target=loop, args=(stop,))
+    cpu = time.process_time()
+    wall = time.monotonic()
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return 100 * (time.process_time() - cpu) / (time.monotonic() - wall)
+
+
+def main() -> None:
+    """
+    Parse the arguments, measure both loops and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for name, loop in (("polling", polling_loop), ("event", event_loop)):
+        print(f"{name:>8}: {measure(loop, args.seconds):5.1f}% of one core while idle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare the conversation log implementations when a long session floods them with messages.
+
+"labels" is the old log, one word-wrapped QLabel per message in a scroll area. "model" is the
+ResponseLogView, a QListView over a capped ResponseLogModel fed through its batching queue.
+Each mode inserts the messages in slices, letting Qt lay out and paint between slices as it would
+during a live session, and reports the insert time and the growth of the process RSS.
+
+Run each mode in its own process so the memory numbers do not mix, from the src directory:
+    python -m benchmarks.log_benchmark --mode model --messages 100000
+    python -m benchmarks.log_benchmark --mode labels --messages 10000
+Set QT_QPA_PLATFORM=offscreen to run without a display.
+"""
+import argparse
+import time
+
+from PyQt5.QtWidgets import QApplication, QLabel, QScrollArea, QSizePolicy, QVBoxLayout, QWidget
+from PyQt5.QtCore import Qt
+
+from metrics import resident_memory
+from ui.widgets.response_log import ResponseLogView
+
+MESSAGE = (
+    "Assistant : This room shows the history of the installation, from the first sketches to the "
+    "finished avatar. Ask me about piece number {index} and I will tell you more."
+)
+
+
+def create_labels_log() -> tuple:
+    """
+    Build the old QLabel log.
+
+    Returns:
+        tuple: The top-level widget and a function that adds one message.
+    """
+    scroll = QScrollArea()
+    widget = QWidget()
+    layout = QVBoxLayout(widget)
+    layout.setAlignment(Qt.AlignTop)
+    scroll.setWidgetResizable(True)
+    scroll.setWidget(widget)
+
+    def add(message: str) -> None:
+        label = QLabel(message)
+        label.setWordWrap(True)
+        label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        layout.addWidget(label)
+
+    return scroll, add
+
+
+def create_model_log(limit: int) -> tuple:
+    """
+    Build the ResponseLogView.
+
+    Args:
+        limit (int): The retention cap.
+
+    Returns:
+        tuple: The view and a function that adds one message.
+    """
+    view = ResponseLogView(limit)
+    return view, view.add_message
+
+
+def main() -> None:
+    """
+    Parse the arguments, fill the log and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("model", "labels"), default="model")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=2000, help="Retention cap of the model log")
+    parser.add_argument("--slice", type=int, default=100, help="Messages inserted between event loop passes")
+    args = parser.parse_args()
+
+    app = QApplication([])
+    widget, add = create_model_log(args.limit) if args.mode == "model" else create_labels_log()
+    widget.resize(800, 600)
+    widget.show()
+    app.processEvents()
+
+    rss_before = resident_memory()
+    start = time.perf_counter()
+    worst = 0.0
+    for first in range(0, args.messages, args.slice):
+        slice_start = time.perf_counter()
+        for index in range(first, min(first + args.slice, args.messages)):
+            add(MESSAGE.format(index=index))
+        if args.mode == "model":
+            widget.flush()
+        app.processEvents()
+        worst = max(worst, time.perf_counter() - slice_start)
+    total = time.perf_counter() - start
+    rss_after = resident_memory()
+
+    print(f"mode {args.mode}, messages {args.messages}, slice {args.slice}")
+    print(f"insert total {total:.2f}s, {args.messages / total:,.0f} messages/s, worst slice {worst * 1000:.1f} ms")
+    if rss_before is not None:
+        print(f"rss {rss_before / 2 ** 20:.1f} MB -> {rss_after / 2 ** 20:.1f} MB (+{(rss_after - rss_before) / 2 ** 20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare the request payload of an unbounded message list with ConversationMemory over a long session.
+
+Run from the src directory:
+    python -m benchmarks.memory_benchmark --turns 500
+"""
+import argparse
+import json
+
+from handlers.memory import ConversationMemory
+
+SYSTEM_MESSAGE = "I want your messages to be no more than two sentences"
+QUESTION = "Visitor question number {index}: what can you tell me about the exhibit in this room?"
+ANSWER = (
+    "This room shows the history of the installation, from the first sketches to the finished avatar. "
+    "Ask me about any of the pieces on the walls and I will tell you more."
+)
+
+
+def main() -> None:
+    """
+    Parse the arguments, simulate the session and print the payload sizes.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--budget", type=int, default=3000, help="history_token_budget")
+    parser.add_argument("--every", type=int, default=50, help="Print every N turns")
+    args = parser.parse_args()
+
+    unbounded = [{"role": "system", "content": SYSTEM_MESSAGE}]
+    memory = ConversationMemory(SYSTEM_MESSAGE, args.budget)
+    unbounded_total = 0
+    bounded_total = 0
+
+    print(f"{'turn':>5} {'unbounded bytes':>16} {'bounded bytes':>14} {'bounded tokens':>15}")
+    for index in range(1, args.turns + 1):
+        question = QUESTION.format(index=index)
+        unbounded.append({"role": "user", "content": question})
+        memory.add("user", question)
+
+        ## The payload is what get_response sends for this turn
+        unbounded_bytes = len(json.dumps(unbounded))
+        bounded_bytes = len(json.dumps(memory.messages()))
+        unbounded_total += unbounded_bytes
+        bounded_total += bounded_bytes
+        if index == 1 or index % args.every == 0:
+            print(f"{index:>5} {unbounded_bytes:>16} {bounded_bytes:>14} {memory.total_tokens:>15}")
+
+        unbounded.append({"role": "assistant", "content": ANSWER})
+        memory.add("assistant", ANSWER)
+
+    print(f"total bytes sent: unbounded {unbounded_total}, bounded {bounded_total} "
+          f"({unbounded_total / bounded_total:.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
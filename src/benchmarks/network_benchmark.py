@@ -0,0 +1,80 @@
+"""
+Compare per-request latency of bare requests.post calls with the pooled RestClient.
+
+The server is the Flask app from handlers/network/server.py, hosted in this process on a free port.
+Requests go to its /health route, so only the HTTP cost is measured.
+
+Run from the src directory:
+    python -m benchmarks.network_benchmark --requests 500
+"""
+import argparse
+import contextlib
+import io
+import logging
+import statistics
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from handlers.network.client import RestClient
+from handlers.network.server import app
+
+
+def measure(send: callable, count: int) -> list:
+    """
+    Time a number of sequential requests.
+
+    Args:
+        send (callable): Sends one request.
+        count (int): The number of requests.
+
+    Returns:
+        list: The latency of each request in milliseconds.
+    """
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> None:
+    """
+    Parse the arguments, run both clients and print the comparison.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    ## Keep the request logs of both sides out of the results
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    payload = {'path': "example2_0_bot.wav", 'instance_name': "/World/audio2face/PlayerStreaming"}
+
+    def bare() -> None:
+        requests.post(base_url + "/health", json=payload).raise_for_status()
+
+    with RestClient("health", base_url, payload['instance_name']) as client:
+        pooled = lambda: client.send_text(payload['path']).raise_for_status()
+        ## Warm both paths up so imports and the first connect are not measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            measure(bare, 5)
+            measure(pooled, 5)
+        for name, send in (("bare", bare), ("pooled", pooled)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies = sorted(measure(send, args.requests))
+            print(
+                f"{name:>7}: mean {statistics.mean(latencies):6.2f} ms, "
+                f"p50 {latencies[len(latencies) // 2]:6.2f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare the serial live loop against the staged turn pipeline with fake AI stages.
+
+Run from the src directory:
+    python -m benchmarks.pipeline_benchmark --turns 10 --capture 1.0
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.fakes import FakeAIHandler
+from handlers.audio_buffer import AudioBuffer
+from pipeline import TurnPipeline, Turn
+
+
+def run(pipelined: bool, turns: int, capture: float, delivery: float, handler: FakeAIHandler, streaming: bool = False) -> dict:
+    """
+    Simulate a live session of back to back utterances.
+
+    Args:
+        pipelined (bool): Use the worker pipeline instead of running the stages inline.
+        turns (int): The number of utterances.
+        capture (float): Seconds the user spends speaking per utterance.
+        delivery (float): Seconds the callback (network send) takes.
+        handler (FakeAIHandler): The fake AI stages.
+        streaming (bool): Stream the response and speak it sentence by sentence.
+
+    Returns:
+        dict: Total time, throughput and per-turn latency statistics.
+    """
+    def callback(audio: AudioBuffer, turn_id: int) -> None:
+        time.sleep(delivery)
+
+    pipeline = TurnPipeline.from_handler(handler, callback, streaming=streaming)
+    submitted = []
+
+    start = time.monotonic()
+    if pipelined:
+        pipeline.start()
+    for index in range(turns):
+        time.sleep(capture)
+        turn = Turn(AudioBuffer(np.zeros((int(capture * 16000), 1), dtype='float32'), 16000, f"bench_{index}.wav"))
+        submitted.append(turn)
+        if pipelined:
+            pipeline.submit(turn)
+        else:
+            pipeline.run_serial(turn)
+    if pipelined:
+        pipeline.stop(drain=True)
+    total = time.monotonic() - start
+
+    latencies = [turn.latency for turn in submitted]
+    first_audio = [turn.time_to_first_audio for turn in submitted]
+    return {
+        "total": total,
+        "throughput": len(submitted) / total,
+        "latency_mean": statistics.mean(latencies),
+        "latency_max": max(latencies),
+        "first_audio_mean": statistics.mean(first_audio),
+    }
+
+
+def main() -> None:
+    """
+    Parse the arguments, run both modes and print the comparison.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--capture", type=float, default=1.0, help="Seconds of speech per turn")
+    parser.add_argument("--transcribe", type=float, default=0.3)
+    parser.add_argument("--response", type=float, default=0.8)
+    parser.add_argument("--speech", type=float, default=0.5)
+    parser.add_argument("--delivery", type=float, default=0.1)
+    args = parser.parse_args()
+
+    handler = FakeAIHandler(args.transcribe, args.response, args.speech)
+    for name, pipelined in (("serial", False), ("pipelined", True)):
+        result = run(pipelined, args.turns, args.capture, args.delivery, handler)
+        print(
+            f"{name:>10}: total {result['total']:.2f}s, "
+            f"throughput {result['throughput']:.2f} turns/s, "
+            f"latency mean {result['latency_mean']:.2f}s max {result['latency_max']:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Compare the previous and the streaming playback paths of VoiceRecorder, no sound hardware needed.
+
+"previous" is the old VoiceRecorder.play: the whole file read into memory, then sd.play and sd.wait,
+blocking the caller until the sound ended. "streaming" is StreamingPlayer: blocks are read on a
+background thread into a ring buffer that an output callback drains. The output stream is simulated
+by a thread that calls the callback at the block rate of a sound card, sped up by --speed.
+
+Reported per path: how long the caller is blocked, the time until the first sound, the peak Python
+allocations (tracemalloc), and for the streaming path how long stop() takes to silence it. A second
+comparison plays --chunks chunks that each take --produce-ms to produce (like sentence-by-sentence
+speech synthesis), collected first versus played as they arrive.
+
+Run from the src directory:
+    python -m benchmarks.playback_benchmark --minutes 5 --speed 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+from handlers.playback import Playback, StreamingPlayer
+
+
+class SimulatedOutputStream:
+    def __init__(self, samplerate: int, channels: int, callback: callable, finished_callback: callable,
+                 speed: float = 1.0, blocksize: int = 512, **kwargs):
+        """
+        Initialize the SimulatedOutputStream, a stand-in for sd.OutputStream that calls the callback
+        from a thread, paced like a sound card.
+
+        Args:
+            samplerate (int): The sample rate.
+            channels (int): The number of channels.
+            callback (callable): Fills each output block.
+            finished_callback (callable): Called once the stream has stopped.
+            speed (float): How much faster than real time blocks are requested.
+            blocksize (int): Frames per block.
+            kwargs: Other sd.OutputStream arguments, ignored.
+        """
+        self.samplerate = samplerate
+        self.channels = channels
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.speed = speed
+        self.blocksize = blocksize
+        self.aborted = threading.Event()
+        self.first_sound = None
+        self.thread = threading.Thread(target=self.run, name="simulated-output", daemon=True)
+
+    def start(self) -> None:
+        """
+        Start requesting blocks.
+        """
+        self.thread.start()
+
+    def abort(self) -> None:
+        """
+        Stop requesting blocks straight away.
+        """
+        self.aborted.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def close(self) -> None:
+        """
+        Release the stream.
+        """
+        pass
+
+    def run(self) -> None:
+        """
+        Request blocks until the callback stops the stream or it is aborted.
+        """
+        outdata = np.zeros((self.blocksize, self.channels), dtype='float32')
+        start = time.perf_counter()
+        played = 0
+        while not self.aborted.is_set():
+            try:
+                self.callback(outdata, self.blocksize, None, None)
+            except sd.CallbackStop:
+                break
+            if self.first_sound is None and outdata.any():
+                self.first_sound = time.perf_counter()
+            played += self.blocksize
+            self.aborted.wait(max(0.0, start + played / self.samplerate / self.speed - time.perf_counter()))
+        self.finished_callback()
+
+
+class SimulatedPlayer(StreamingPlayer):
+    def __init__(self, speed: float = 1.0, **kwargs):
+        """
+        Initialize the SimulatedPlayer, a StreamingPlayer whose playbacks use a SimulatedOutputStream.
+
+        Args:
+            speed (float): How much faster than real time the output runs.
+            kwargs: StreamingPlayer arguments.
+        """
+        super().__init__(**kwargs)
+        self.speed = speed
+        self.streams = []
+
+    def create_playback(self, sample_rate: int, channels: int, on_finished: callable = None) -> Playback:
+        """
+        Create a playback on a simulated output stream.
+        """
+        player = self
+
+        class SimulatedPlayback(Playback):
+            def open_stream(self, device=None):
+                stream = SimulatedOutputStream(self.sample_rate, self.channels, self.callback,
+                                               self.on_stream_finished, speed=player.speed)
+                player.streams.append(stream)
+                return stream
+
+        return SimulatedPlayback(sample_rate, channels, self.buffer_ms, self.device, on_finished)
+
+
+def write_clip(path: str, minutes: float, sample_rate: int, channels: int) -> None:
+    """
+    Write a 16 bit test clip: a quiet tone with noise, block by block.
+
+    Args:
+        path (str): The file to write.
+        minutes (float): The length of the clip.
+        sample_rate (int): The sample rate.
+        channels (int): The number of channels.
+    """
+    rng = np.random.default_rng(0)
+    frames = int(minutes * 60 * sample_rate)
+    with sf.SoundFile(path, "w", sample_rate, channels, "PCM_16") as sound_file:
+        for start in range(0, frames, sample_rate):
+            t = np.arange(start, min(frames, start + sample_rate)) / sample_rate
+            tone = 0.2 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(len(t))
+            sound_file.write(np.repeat(tone[:, None], channels, axis=1).astype('float32'))
+
+
+def measure(play: callable) -> dict:
+    """
+    Run one playback path under tracemalloc.
+
+    Args:
+        play (callable): Starts playback and returns a callable that waits for the first sound and the end.
+
+    Returns:
+        dict: The blocked, first sound and total times in seconds and the peak allocations in bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    finish = play()
+    blocked = time.perf_counter() - start
+    first_sound = finish() - start
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"blocked": blocked, "first_sound": first_sound, "total": total, "peak": peak}
+
+
+def report(name: str, result: dict) -> None:
+    """
+    Print one result row.
+    """
+    print(f"{name:>10} {result['blocked'] * 1000:9.1f}ms {result['first_sound'] * 1000:9.1f}ms "
+          f"{result['total'] * 1000:9.1f}ms {result['peak'] / 2 ** 20:9.2f}MB")
+
+
+def main() -> None:
+    """
+    Parse the arguments, play the clip and the chunks both ways and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5.0, help="Length of the test clip")
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=20.0, help="How much faster than real time the output runs")
+    parser.add_argument("--buffer-ms", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=5, help="Chunks in the produced-while-playing comparison")
+    parser.add_argument("--produce-ms", type=float, default=300.0, help="Time to produce each chunk")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "playback.wav")
+    write_clip(path, args.minutes, args.sample_rate, args.channels)
+    print(f"{args.minutes:g} min clip, {args.sample_rate} Hz x {args.channels} channels, "
+          f"{os.path.getsize(path) / 2 ** 20:.1f} MB on disk, output at {args.speed:g}x real time")
+    print(f"{'path':>10} {'blocked':>11} {'first sound':>11} {'total':>11} {'peak alloc':>11}")
+
+    def previous_file():
+        ## sf.read of the whole file, then sd.play and sd.wait for its duration
+        data, sample_rate = sf.read(path, dtype='float32')
+        first_sound = time.perf_counter()
+        time.sleep(len(data) / sample_rate / args.speed)
+        return lambda: first_sound
+
+    report("previous", measure(previous_file))
+
+    player = SimulatedPlayer(speed=args.speed, buffer_ms=args.buffer_ms)
+
+    def streaming_file():
+        playback = player.play_file(path)
+
+        def finish():
+            playback.wait()
+            return player.streams[-1].first_sound
+        return finish
+
+    report("streaming", measure(streaming_file))
+
+    ## Stopping: how long until a playing file goes silent
+    playback = player.play_file(path)
+    time.sleep(0.2)
+    start = time.perf_counter()
+    player.stop()
+    playback.wait()
+    print(f"stop() silenced the streaming path in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    chunk_frames = args.sample_rate
+    produce = args.produce_ms / 1000
+
+    def chunks():
+        for index in range(args.chunks):
+            time.sleep(produce)
+            yield np.full((chunk_frames, args.channels), 0.1, dtype='float32')
+
+    print(f"\n{args.chunks} chunks of 1 s audio, {args.produce_ms:g} ms to produce each")
+    print(f"{'path':>10} {'blocked':>11} {'first sound':>11} {'total':>11} {'peak alloc':>11}")
+
+    def previous_chunks():
+        data = np.concatenate(list(chunks()))
+        first_sound = time.perf_counter()
+        time.sleep(len(data) / args.sample_rate / args.speed)
+        return lambda: first_sound
+
+    report("previous", measure(previous_chunks))
+
+    def streaming_chunks():
+        playback = player.play_chunks(chunks(), args.sample_rate, args.channels)
+
+        def finish():
+            playback.wait()
+            return player.streams[-1].first_sound
+        return finish
+
+    report("streaming", measure(streaming_chunks))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
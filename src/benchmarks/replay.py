@@ -0,0 +1,442 @@
+"""
+Replay recorded conversations through the live loop with deterministic fake AI backends.
+
+The user clips (audio/example2_*.wav) are fed block by block, at their real pace, into the callback of
+a VoiceRecorder whose input stream is replaced by the file. RecordingLoop.start_live then runs exactly
+as it does live: the trigger, capture, the staged pipeline and the delivery callback. Transcription,
+the chat response and speech synthesis sleep for delays drawn from seeded distributions, and speech
+returns the recorded bot clips (audio/example2_*_bot.wav).
+
+Reported: throughput, end-to-end and per-stage latency percentiles, CPU time, and Python allocations
+(tracemalloc). --output writes the results as JSON, with the commit they were measured on, and
+--compare prints the change against an earlier results file.
+
+Run from the src directory:
+    python -m benchmarks.replay --repeat 3 --output replay.json
+    python -m benchmarks.replay --repeat 3 --compare replay.json
+Delays are kind:mean:spread in seconds, kind being fixed, uniform, normal or lognormal.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import glob
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.fakes import LatencyDistribution, ReplayAIHandler
+from handlers.audio_buffer import AudioBuffer
+from handlers.audio_handler import VoiceRecorder
+from loop import RecordingLoop
+from metrics import metrics
+from tracing import tracer
+from triggers import TurnTrigger
+
+AUDIO_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "audio"))
+
+## Metrics --compare reports, with whether a higher value is better
+COMPARED = {
+    "throughput": True, "latency.p50": False, "latency.p95": False, "time_to_first_audio.p50": False,
+    "cpu_seconds": False, "allocated_peak_mb": False,
+}
+
+
+class ReplayStream:
+    def __init__(self, recorder, blocksize: int = None):
+        """
+        Initialize the ReplayStream, a stand-in for sd.InputStream that plays the recorder's current clip
+        into its callback from a thread, paced like a sound card. After the clip it keeps delivering
+        silence, as a microphone would, until the stream is closed.
+
+        Args:
+            recorder (ReplayRecorder): The recorder whose callback receives the blocks.
+            blocksize (int): Frames per block. Defaults to the recorder's chunk size.
+        """
+        self.recorder = recorder
+        self.blocksize = int(blocksize or recorder.chunk_size)
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="replay-stream", daemon=True)
+
+    def __enter__(self):
+        """
+        Start delivering blocks.
+        """
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        Stop delivering blocks.
+        """
+        self.closed.set()
+        self.thread.join()
+
+    def run(self) -> None:
+        """
+        Deliver the clip block by block, then silence. Releases the recorder's trigger when the clip ends.
+        """
+        recorder = self.recorder
+        clip = recorder.clip
+        silence = np.zeros((self.blocksize, recorder.channel_count), dtype='float32')
+        start = time.perf_counter()
+        sent = 0
+        while not self.closed.is_set():
+            if sent < len(clip):
+                block = clip[sent:sent + self.blocksize]
+                sent += len(block)
+                recorder.callback(block, len(block), None, None)
+                if sent >= len(clip):
+                    recorder.trigger.release()
+                ## Sleep until the next block would have been captured
+                delay = start + sent / recorder.sample_rate / recorder.speed - time.perf_counter() if recorder.speed > 0 else 0
+            else:
+                recorder.callback(silence, len(silence), None, None)
+                delay = self.blocksize / recorder.sample_rate
+            if delay > 0:
+                self.closed.wait(delay)
+
+
+class ReplayRecorder(VoiceRecorder):
+    def __init__(self, sample_rate: int, channel_count: int, speed: float = 1.0, **kwargs):
+        """
+        Initialize the ReplayRecorder, a VoiceRecorder whose input stream plays files instead of a microphone.
+
+        Args:
+            sample_rate (int): The sample rate of the clips.
+            channel_count (int): The channel count of the clips.
+            speed (float): Playback speed of the clips. 0 delivers them as fast as possible.
+            kwargs: Additional VoiceRecorder arguments.
+        """
+        super().__init__(device={"name": "replay"}, sample_rate=sample_rate, channel_count=channel_count, **kwargs)
+        self.speed = float(speed)
+        self.clip = None
+        self.trigger = None
+
+    def open_stream(self, **kwargs) -> ReplayStream:
+        """
+        Open a stream that plays the current clip.
+
+        Args:
+            **kwargs: sd.InputStream arguments. Only blocksize is used.
+
+        Returns:
+            ReplayStream: The stream.
+        """
+        return ReplayStream(self, kwargs.get("blocksize"))
+
+
+class ReplayTrigger(TurnTrigger):
+    def __init__(self, recorder: ReplayRecorder, clips: list, gap: float = 0.0):
+        """
+        Initialize the ReplayTrigger, which starts one turn per clip and releases it when the clip ends.
+
+        Args:
+            recorder (ReplayRecorder): The recorder the clips are played into.
+            clips (list): The clips, as (frames, channels) float32 arrays.
+            gap (float): Seconds of silence between the end of one turn and the start of the next.
+        """
+        super().__init__()
+        self.recorder = recorder
+        self.clips = list(clips)
+        self.gap = gap
+        self.next_index = 0
+        recorder.trigger = self
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Start the next turn after the gap.
+
+        Args:
+            timeout (float): How long to wait when every clip has been played.
+
+        Returns:
+            bool: True if a turn started.
+        """
+        if self.next_index >= len(self.clips):
+            time.sleep(timeout or 0)
+            return False
+        if self.next_index and self.gap:
+            time.sleep(self.gap)
+        self.recorder.clip = self.clips[self.next_index]
+        self.next_index += 1
+        self.released.clear()
+        return True
+
+
+class ReplayLoop(RecordingLoop):
+    def __init__(self, trigger: ReplayTrigger, **kwargs):
+        """
+        Initialize the ReplayLoop, a RecordingLoop driven by a ReplayTrigger that keeps every turn it creates.
+
+        Args:
+            trigger (ReplayTrigger): The trigger.
+            kwargs: RecordingLoop arguments.
+        """
+        super().__init__(recorder=trigger.recorder, **kwargs)
+        self.trigger = trigger
+        self.turns = []
+
+    def create_trigger(self, capture_mode: str = None) -> ReplayTrigger:
+        """
+        Use the replay trigger whatever the capture mode.
+
+        Args:
+            capture_mode (str): Ignored.
+
+        Returns:
+            ReplayTrigger: The trigger.
+        """
+        return self.trigger
+
+    def create_turn(self, audio, transcription=None, speculation=None):
+        """
+        Create a turn and keep it for the results.
+
+        Args:
+            audio (AudioBuffer): The recording.
+            transcription (TranscriptionStream): The transcription streamed during the capture, if any.
+            speculation (SpeculativeResponse): The reply requested during the capture, if any.
+
+        Returns:
+            Turn: The turn.
+        """
+        turn = super().create_turn(audio, transcription, speculation)
+        self.turns.append(turn)
+        return turn
+
+
+def summarize(values: list) -> dict:
+    """
+    Summarize durations.
+
+    Args:
+        values (list): Durations in seconds.
+
+    Returns:
+        dict: The count and the mean, p50, p95, p99 and max in milliseconds.
+    """
+    values = np.asarray(values, dtype=float) * 1000
+    if not len(values):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {
+        "count": len(values), "mean": float(values.mean()), "p50": float(p50), "p95": float(p95),
+        "p99": float(p99), "max": float(values.max()),
+    }
+
+
+def load_clips(pattern: str, hold: float = 0.0) -> tuple:
+    """
+    Read the user and bot clips.
+
+    Args:
+        pattern (str): A glob for the clips. Files ending in _bot are the bot's replies.
+        hold (float): Seconds of silence added to the end of every user clip, as if the key were held after speaking.
+
+    Returns:
+        tuple: The user clips as (frames, channels) float32 arrays, their sample rate and channel count,
+            and the bot clips as AudioBuffers.
+    """
+    paths = sorted(glob.glob(pattern))
+    users = [AudioBuffer.from_file(path) for path in paths if not path.endswith("_bot.wav")]
+    bots = [AudioBuffer.from_file(path) for path in paths if path.endswith("_bot.wav")]
+    if not users:
+        raise SystemExit(f"No user clips match {pattern}")
+    sample_rate = users[0].sample_rate
+    channels = max(audio.data.shape[1] if audio.data.ndim > 1 else 1 for audio in users)
+    clips = []
+    for audio in users:
+        if audio.sample_rate != sample_rate:
+            raise SystemExit(f"{audio.name} is {audio.sample_rate} Hz, the other clips are {sample_rate} Hz")
+        data = audio.data.reshape(len(audio.data), -1)
+        if hold:
+            data = np.concatenate([data, np.zeros((int(hold * sample_rate), data.shape[1]), dtype=data.dtype)])
+        clips.append(np.ascontiguousarray(np.broadcast_to(data, (len(data), channels)) if data.shape[1] == 1 else data))
+    return clips, sample_rate, channels, bots
+
+
+def git_commit() -> str:
+    """
+    Read the commit the benchmark runs on.
+
+    Returns:
+        str: The commit hash, with "-dirty" if there are uncommitted changes, or None outside a git checkout.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    """
+    Replay the clips and measure.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        dict: The results.
+    """
+    clips, sample_rate, channels, bots = load_clips(args.pattern, args.hold)
+    clips = clips * args.repeat
+    handler = ReplayAIHandler(
+        LatencyDistribution.parse(args.stt, args.seed), LatencyDistribution.parse(args.llm, args.seed + 1),
+        LatencyDistribution.parse(args.tts, args.seed + 2), voices=bots, token_delay=args.token_delay, stream=args.streaming,
+        transcribe_per_second=args.stt_per_second, streaming_stt=args.streaming_stt, stt_backend=args.stt_backend,
+        speculative_response=args.speculate,
+    )
+    delivery = LatencyDistribution.parse(args.delivery, args.seed + 3)
+    recorder = ReplayRecorder(sample_rate, channels, args.speed)
+    trigger = ReplayTrigger(recorder, clips, args.gap)
+    loop = ReplayLoop(
+        trigger, path=".", filename="replay", ai_service=handler, sample_rate=sample_rate, recording_key="",
+        max_queue_size=args.max_queue_size, archive=False, trace=True,
+    )
+    delivered = []
+
+    def callback(audio: AudioBuffer, turn_id: int) -> None:
+        time.sleep(delivery.sample())
+        delivered.append(time.perf_counter())
+
+    ## Stop once every turn has been delivered, start_live stops the pipeline without draining it
+    stop = lambda: len(loop.turns) == len(clips) and all(turn.delivered is not None for turn in loop.turns)
+
+    if args.allocations:
+        tracemalloc.start()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    ## The recorder and the loop print every capture, keep them out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        loop.start_live(0, stop, callback)
+    end = delivered[-1] if delivered else time.perf_counter()
+    cpu = time.process_time() - cpu_start
+    allocated = tracemalloc.get_traced_memory() if args.allocations else None
+    tracemalloc.stop()
+
+    wall = end - start
+    audio_seconds = sum(len(clip) for clip in clips) / sample_rate
+    return {
+        "turns": len(loop.turns),
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall,
+        "throughput": len(loop.turns) / wall,
+        "latency": summarize([turn.latency for turn in loop.turns]),
+        "time_to_first_audio": summarize([turn.time_to_first_audio for turn in loop.turns]),
+        "stages": tracer.percentiles(),
+        "cpu_seconds": cpu,
+        "cpu_percent": 100 * cpu / wall,
+        "allocated_current_mb": allocated[0] / 2 ** 20 if allocated else None,
+        "allocated_peak_mb": allocated[1] / 2 ** 20 if allocated else None,
+        "speculation": {name[len("speculation."):]: count for name, count in metrics.snapshot()["counters"].items()
+                        if name.startswith("speculation.")},
+    }
+
+
+def lookup(results: dict, name: str):
+    """
+    Read a dotted metric name from the results.
+
+    Args:
+        results (dict): The results.
+        name (str): For example "latency.p95".
+
+    Returns:
+        The value, or None.
+    """
+    for part in name.split("."):
+        results = results.get(part) if isinstance(results, dict) else None
+    return results
+
+
+def compare(baseline: dict, results: dict) -> None:
+    """
+    Print the change of the main metrics against a baseline.
+
+    Args:
+        baseline (dict): A results file written with --output.
+        results (dict): The current results file contents.
+    """
+    print(f"\ncompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for name, higher_is_better in COMPARED.items():
+        before, after = lookup(baseline["results"], name), lookup(results["results"], name)
+        if not before or after is None:
+            continue
+        change = 100 * (after - before) / before
+        worse = change < 0 if higher_is_better else change > 0
+        print(f"{name:>25}: {before:10.2f} -> {after:10.2f} ({change:+6.1f}%{' worse' if worse and abs(change) >= 5 else ''})")
+
+
+def main() -> None:
+    """
+    Parse the arguments, replay the clips, print the results and write them out.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pattern", default=os.path.join(AUDIO_PATH, "example2_*.wav"))
+    parser.add_argument("--repeat", type=int, default=1, help="Play the clips this many times")
+    parser.add_argument("--speed", type=float, default=1.0, help="Capture speed, 0 for as fast as possible")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds between utterances")
+    parser.add_argument("--stt", default="lognormal:0.3:0.1", help="Transcription delay")
+    parser.add_argument("--stt-per-second", type=float, default=0.0, help="Extra transcription seconds per second of audio")
+    parser.add_argument("--streaming-stt", action="store_true", help="Transcribe while the clips are still being captured")
+    parser.add_argument("--stt-backend", default="", help="TranscriptionBackend for streaming, e.g. benchmarks.fakes.FakeTranscriptionBackend")
+    parser.add_argument("--speculate", action="store_true", help="Ask for the reply once the partial transcript is stable")
+    parser.add_argument("--hold", type=float, default=0.0, help="Seconds of silence after each clip before the turn ends")
+    parser.add_argument("--llm", default="lognormal:0.8:0.3", help="Delay until the first token of a response")
+    parser.add_argument("--tts", default="lognormal:0.5:0.15", help="Speech synthesis delay")
+    parser.add_argument("--delivery", default="0.05", help="Delay of the delivery callback")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed words")
+    parser.add_argument("--streaming", action="store_true", help="Stream responses and speak them sentence by sentence")
+    parser.add_argument("--max-queue-size", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-allocations", dest="allocations", action="store_false", help="Skip tracemalloc, which slows Python down")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="A results file to compare with")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": git_commit(), "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "args": vars(args),
+        },
+        "results": run(args),
+    }
+
+    summary = results["results"]
+    print(f"turns {summary['turns']}, audio {summary['audio_seconds']:.1f}s, wall {summary['wall_seconds']:.2f}s, "
+          f"throughput {summary['throughput']:.3f} turns/s")
+    for name in ("latency", "time_to_first_audio"):
+        stats = summary[name]
+        print(f"{name:>19}: p50 {stats['p50']:8.1f} ms, p95 {stats['p95']:8.1f} ms, p99 {stats['p99']:8.1f} ms")
+    for name, stats in summary["stages"].items():
+        print(f"{name:>19}: p50 {stats['p50']:8.1f} ms, p95 {stats['p95']:8.1f} ms, p99 {stats['p99']:8.1f} ms (n {stats['count']})")
+    print(f"cpu {summary['cpu_seconds']:.2f}s ({summary['cpu_percent']:.1f}%)", end="")
+    if summary["allocated_peak_mb"] is not None:
+        print(f", allocations peak {summary['allocated_peak_mb']:.1f} MB, still held {summary['allocated_current_mb']:.1f} MB")
+    else:
+        print()
+    speculation = summary["speculation"]
+    if speculation:
+        print(f"speculation: used {speculation.get('used', 0)} of {speculation.get('started', 0)}, "
+              f"wasted {speculation.get('wasted', 0)} ({speculation.get('wasted_ms', 0)} ms)")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, "r") as file:
+            compare(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare the old per-request subprocess player with the in-process PlaybackWorker.
+
+Both servers are the Flask app from handlers/network/server.py, hosted in this process on a free port.
+The subprocess backend runs a stand-in for the Audio2Face test_client.py that does the same start-up
+work (interpreter, numpy and soundfile imports, reading the clip) without a gRPC server. The in-process
+backend uses FakePlayer, which also reads the clip. Playback itself takes no time in either, so the
+difference is the per-request overhead.
+
+Requests set "wait", so each one measures the full upload-to-played time, as the old route did.
+
+Run from the src directory:
+    python -m benchmarks.server_benchmark --requests 50 --concurrency 4
+"""
+import argparse
+import contextlib
+import glob
+import io
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from handlers.network.players import FakePlayer, SubprocessPlayer
+from handlers.network.server import create_app
+
+
+CLIENT_SCRIPT = """
+import sys
+import numpy as np
+import soundfile
+
+data, samplerate = soundfile.read(sys.argv[1], dtype="float32")
+if len(data.shape) > 1:
+    data = np.average(data, axis=1)
+"""
+
+
+def serve(app):
+    """
+    Host an app on a free loopback port.
+
+    Args:
+        app: The Flask app.
+
+    Returns:
+        tuple: The server and its base URL.
+    """
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def measure(base_url: str, clips: list, count: int, concurrency: int) -> dict:
+    """
+    Upload clips and wait for each to play.
+
+    Args:
+        base_url (str): The server URL.
+        clips (list): The clip paths, used in turn.
+        count (int): The number of requests.
+        concurrency (int): The number of clients sending at once.
+
+    Returns:
+        dict: Requests per second and latency percentiles in milliseconds.
+    """
+    session = requests.Session()
+
+    def send(index: int) -> float:
+        payload = {'path': clips[index % len(clips)], 'instance_name': "/World/audio2face/PlayerStreaming", 'wait': True}
+        start = time.perf_counter()
+        session.post(base_url + "/upload_audio", json=payload).raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = sorted(executor.map(send, range(count)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": count / elapsed,
+        "latency_mean_ms": statistics.mean(latencies),
+        "latency_p50_ms": latencies[len(latencies) // 2],
+        "latency_p95_ms": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    """
+    Parse the arguments, run both backends and print the comparison.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--audio", default=os.path.join(os.path.dirname(__file__), "../../audio"))
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    clips = sorted(glob.glob(os.path.join(args.audio, "example2_*.wav")))
+    with tempfile.TemporaryDirectory() as folder:
+        script_path = os.path.join(folder, "test_client.py")
+        with open(script_path, "w") as file:
+            file.write(CLIENT_SCRIPT)
+
+        for name, player in (("subprocess", SubprocessPlayer(script_path)), ("worker", FakePlayer())):
+            app = create_app(player, max_queue_size=args.requests)
+            server, base_url = serve(app)
+            ## Warm up, so the first import and connect are not measured. The route prints every request
+            with contextlib.redirect_stdout(io.StringIO()):
+                measure(base_url, clips, 2, 1)
+                results = measure(base_url, clips, args.requests, args.concurrency)
+            server.shutdown()
+            app.config['WORKER'].close()
+            print(
+                f"{name:>10}: {results['requests_per_second']:7.1f} req/s, "
+                f"mean {results['latency_mean_ms']:8.2f} ms, "
+                f"p50 {results['latency_p50_ms']:8.2f} ms, "
+                f"p95 {results['latency_p95_ms']:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
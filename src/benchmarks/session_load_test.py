@@ -0,0 +1,121 @@
+"""
+Load-test the SessionManager with many simulated sessions against fake backends.
+
+Every session gets its own FakeAIHandler and speaks at random intervals. Responses are delivered over
+the pooled HTTP session to the relay server app from handlers/network/server.py, hosted in this process
+with a FakePlayer, using the streaming upload mode and one Audio2Face instance name per session.
+Pass --no-network to deliver to a callback that only waits instead.
+
+Run from the src directory:
+    python -m benchmarks.session_load_test --sessions 32 --turns 5 --workers 8
+"""
+import argparse
+import contextlib
+import io
+import logging
+import random
+import statistics
+import threading
+import time
+
+import numpy as np
+from werkzeug.serving import make_server
+
+from benchmarks.fakes import FakeAIHandler
+from handlers.audio_buffer import AudioBuffer
+from handlers.network.players import FakePlayer
+from handlers.network.server import create_app
+from sessions import SessionManager
+
+
+def schedule(sessions: int, turns: int, interval: float, seed: int) -> list:
+    """
+    Pick when every session speaks.
+
+    Args:
+        sessions (int): The number of sessions.
+        turns (int): The number of utterances per session.
+        interval (float): The mean seconds between utterances of one session. 0 submits everything at once.
+        seed (int): The random seed.
+
+    Returns:
+        list: (time, session id) pairs, in time order.
+    """
+    rng = random.Random(seed)
+    events = []
+    for session in range(sessions):
+        moment = 0.0
+        for _ in range(turns):
+            moment += rng.expovariate(1 / interval) if interval > 0 else 0.0
+            events.append((moment, f"session{session:03d}"))
+    return sorted(events)
+
+
+def main() -> None:
+    """
+    Parse the arguments, run the load and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=5, help="Utterances per session")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=2.0, help="Mean seconds between utterances of a session")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds each fake AI request waits")
+    parser.add_argument("--max-pending", type=int, default=2, help="Turns a session may queue before new ones are dropped")
+    parser.add_argument("--no-network", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    network, server, send = None, None, None
+    if args.no_network:
+        send = lambda session, audio, turn_id: time.sleep(args.latency)
+    else:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        app = create_app(FakePlayer())
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        network = {
+            "base_url": f"http://127.0.0.1:{server.server_port}", "endpoint": "upload_audio",
+            "instance_name": "/World/audio2face/PlayerStreaming", "upload_mode": "stream", "pool_size": args.workers,
+        }
+
+    manager = SessionManager(
+        lambda session_id: FakeAIHandler(args.latency, args.latency, args.latency),
+        network, workers=args.workers, max_pending=args.max_pending, send=send
+    )
+    for session in range(args.sessions):
+        manager.open(f"session{session:03d}", f"/World/avatar{session:03d}/PlayerStreaming")
+
+    recording = np.zeros(16000, dtype='int16')
+    submitted, dropped = 0, 0
+    ## The pipelines print every transcript and response, keep them out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.monotonic()
+        for moment, session_id in schedule(args.sessions, args.turns, args.interval, args.seed):
+            time.sleep(max(0.0, start + moment - time.monotonic()))
+            if manager.submit(session_id, AudioBuffer(recording, 16000), block=False):
+                submitted += 1
+            else:
+                dropped += 1
+        manager.close(drain=True)
+        total = time.monotonic() - start
+    if server:
+        server.shutdown()
+
+    stats = manager.stats()
+    latencies = sorted(latency for session in manager.sessions.values() for latency in session.latencies)
+    completed = [session["completed"] for session in stats.values()]
+    means = [session["latency_mean"] for session in stats.values() if session["latency_mean"] is not None]
+    ## Jain's index over per-session mean latency: 1.0 when every session is served equally
+    fairness = sum(means) ** 2 / (len(means) * sum(mean ** 2 for mean in means))
+    print(f"sessions {args.sessions}, workers {args.workers}, submitted {submitted}, dropped {dropped}")
+    print(f"total {total:.2f}s, throughput {sum(completed) / total:.1f} turns/s")
+    print(
+        f"latency mean {statistics.mean(latencies):.3f}s, p50 {latencies[len(latencies) // 2]:.3f}s, "
+        f"p95 {latencies[int(len(latencies) * 0.95)]:.3f}s, max {latencies[-1]:.3f}s"
+    )
+    print(f"completed per session min {min(completed)} max {max(completed)}, fairness {fairness:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare the cold start of the GUI and the headless entry points.
+
+Each run starts main.py in a fresh interpreter with --exit-after-start, which loads the configs,
+builds the window in GUI mode, prints a STARTUP line with the startup time and RSS and exits.
+The wall time also includes interpreter startup and shutdown.
+
+Run from the src directory:
+    python -m benchmarks.startup_benchmark --runs 5
+Set QT_QPA_PLATFORM=offscreen to run the GUI mode without a display.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def run(headless: bool) -> dict:
+    """
+    Start main.py once and read its startup report.
+
+    Args:
+        headless (bool): Start the headless entry point instead of the GUI.
+
+    Returns:
+        dict: The STARTUP report, plus the wall time of the whole process in milliseconds.
+    """
+    command = [sys.executable, MAIN_PATH, "--exit-after-start"] + (["--headless"] if headless else [])
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(MAIN_PATH))
+    wall_ms = (time.perf_counter() - start) * 1000
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return {**json.loads(line[len("STARTUP "):]), "wall_ms": wall_ms}
+    raise RuntimeError(f"{' '.join(command)} printed no startup report:\n{result.stdout}{result.stderr}")
+
+
+def main() -> None:
+    """
+    Parse the arguments, start both modes repeatedly and print the medians.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, headless in (("gui", False), ("headless", True)):
+        reports = [run(headless) for _ in range(args.runs)]
+        results[mode] = {
+            "startup_ms": statistics.median(report["startup_ms"] for report in reports),
+            "wall_ms": statistics.median(report["wall_ms"] for report in reports),
+            "rss_mb": statistics.median(report["rss_mb"] or 0 for report in reports),
+            "qt_loaded": reports[0]["qt_loaded"],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, result in results.items():
+        print(f"{mode:>9}: startup {result['startup_ms']:7.1f} ms, wall {result['wall_ms']:7.1f} ms, "
+              f"rss {result['rss_mb']:6.1f} MB, Qt loaded {result['qt_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare time-to-first-audio for whole-reply and sentence-streamed responses with a fake streaming backend.
+
+Run from the src directory:
+    python -m benchmarks.streaming_benchmark --turns 3
+"""
+import argparse
+
+from benchmarks.fakes import FakeAIHandler
+from benchmarks.pipeline_benchmark import run
+
+
+def main() -> None:
+    """
+    Parse the arguments, run both modes and print the comparison.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--capture", type=float, default=4.0, help="Seconds of speech per turn")
+    parser.add_argument("--transcribe", type=float, default=0.3)
+    parser.add_argument("--first-token", type=float, default=0.4, help="Seconds until the first streamed token")
+    parser.add_argument("--token", type=float, default=0.03, help="Seconds between streamed words")
+    parser.add_argument("--speech", type=float, default=0.2, help="Fixed seconds per TTS call")
+    parser.add_argument("--speech-per-char", type=float, default=0.004)
+    parser.add_argument("--delivery", type=float, default=0.05)
+    args = parser.parse_args()
+
+    handler = FakeAIHandler(
+        args.transcribe, args.first_token, args.speech,
+        token_delay=args.token, speech_delay_per_char=args.speech_per_char
+    )
+    for name, streaming in (("whole", False), ("streamed", True)):
+        result = run(True, args.turns, args.capture, args.delivery, handler, streaming=streaming)
+        print(
+            f"{name:>9}: first audio mean {result['first_audio_mean']:.2f}s, "
+            f"turn latency mean {result['latency_mean']:.2f}s, "
+            f"throughput {result['throughput']:.2f} turns/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
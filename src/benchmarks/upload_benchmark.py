@@ -0,0 +1,94 @@
+"""
+Compare the cost of converting and encoding recordings for transcription against the bytes it saves.
+
+Every clip is encoded the way it was uploaded before (a float WAV at the capture rate and channels),
+then through UploadFormat in each format. Reported per format: the conversion time, the total time
+including encoding, the upload size, and the net time saved on a link of the given bandwidth
+(transfer time saved minus the extra encoding time).
+
+Run from the src directory:
+    python -m benchmarks.upload_benchmark --mbps 10 --repeats 5
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from handlers.audio_buffer import AudioBuffer
+from handlers.upload_format import UploadFormat
+
+CLIPS = os.path.join(os.path.dirname(__file__), "..", "..", "audio", "example2_[0-9].wav")
+
+
+def timed(function, repeats: int):
+    """
+    Call a function several times.
+
+    Args:
+        function (callable): The function, without arguments.
+        repeats (int): The number of calls.
+
+    Returns:
+        tuple: The last result and the median duration in seconds.
+    """
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return result, float(np.median(durations))
+
+
+def main() -> None:
+    """
+    Parse the arguments, encode every clip in every format and print the totals.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", default=CLIPS, help="Glob of the recordings to encode")
+    parser.add_argument("--mbps", type=float, default=10.0, help="Upload bandwidth in megabits per second")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--sample-rate", type=int, default=16000, help="Upload sample rate, 0 keeps the capture rate")
+    parser.add_argument("--channels", type=int, default=1, help="1 downmixes, 0 keeps the capture channels")
+    args = parser.parse_args()
+
+    clips = [AudioBuffer.from_file(path) for path in sorted(glob.glob(args.clips))]
+    if not clips:
+        parser.error(f"No clips match {args.clips}")
+    seconds = sum(clip.duration for clip in clips)
+    first = clips[0]
+    print(f"{len(clips)} clips, {seconds:.1f}s, {first.sample_rate} Hz x {first.channels} channels, "
+          f"upload at {args.mbps:g} Mbit/s")
+
+    ## The previous upload: AudioBuffer.to_wav of the captured float samples
+    baseline_bytes = 0
+    baseline_time = 0.0
+    for clip in clips:
+        content, duration = timed(lambda: clip.to_wav().getvalue(), args.repeats)
+        baseline_bytes += len(content)
+        baseline_time += duration
+    bytes_per_second = args.mbps * 1e6 / 8
+    print(f"{'format':>8} {'convert':>9} {'total':>9} {'bytes':>10} {'ratio':>6} {'upload':>9} {'net saved':>10}")
+    print(f"{'previous':>8} {'':>9} {baseline_time * 1000:7.1f}ms {baseline_bytes:10d} {1:6.2f} "
+          f"{baseline_bytes / bytes_per_second * 1000:7.1f}ms {'':>10}")
+
+    for format in UploadFormat.FORMATS:
+        upload = UploadFormat(args.sample_rate, args.channels, format)
+        total_bytes = 0
+        convert_time = 0.0
+        encode_time = 0.0
+        for clip in clips:
+            _, duration = timed(lambda: upload.convert(clip), args.repeats)
+            convert_time += duration
+            (_, content), duration = timed(lambda: upload.encode(clip), args.repeats)
+            encode_time += duration
+            total_bytes += len(content)
+        upload_time = total_bytes / bytes_per_second
+        saved = (baseline_bytes / bytes_per_second + baseline_time) - (upload_time + encode_time)
+        print(f"{format:>8} {convert_time * 1000:7.1f}ms {encode_time * 1000:7.1f}ms {total_bytes:10d} "
+              f"{total_bytes / baseline_bytes:6.2f} {upload_time * 1000:7.1f}ms {saved * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Run hands-free endpointing over the recorded clips in audio/ and time it, with no audio hardware.
+
+Each clip is padded with trailing silence so the endpointer can close the utterance. Blocks are fed
+one at a time, like a live stream, and then all at once to show the vectorized path.
+
+Run from the src directory:
+    python -m benchmarks.vad_benchmark
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+import webrtcvad
+
+from handlers.vad import VoiceActivityEndpointer
+
+AUDIO_FOLDER = os.path.join(os.path.dirname(__file__), "../../audio")
+
+
+def endpoint(endpointer: VoiceActivityEndpointer, blocks: np.ndarray, batch: int) -> tuple:
+    """
+    Feed blocks to the endpointer until the utterance ends.
+
+    Args:
+        endpointer (VoiceActivityEndpointer): The endpointer, reset first.
+        blocks (np.ndarray): All blocks of the clip.
+        batch (int): The number of blocks per feed call.
+
+    Returns:
+        tuple: The processing time in seconds and the number of blocks fed.
+    """
+    endpointer.reset()
+    fed = 0
+    start = time.perf_counter()
+    for index in range(0, len(blocks), batch):
+        fed += len(blocks[index:index + batch])
+        if endpointer.feed(blocks[index:index + batch]):
+            break
+    return time.perf_counter() - start, fed
+
+
+def main() -> None:
+    """
+    Parse the arguments, run every clip and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", default=AUDIO_FOLDER)
+    parser.add_argument("--silence-ms", type=int, default=800)
+    parser.add_argument("--aggressiveness", type=int, default=1)
+    parser.add_argument("--padding", type=float, default=1.5, help="Seconds of silence appended to each clip")
+    args = parser.parse_args()
+
+    vad = webrtcvad.Vad(args.aggressiveness)
+    for path in sorted(glob.glob(os.path.join(args.folder, "*.wav"))):
+        data, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+        padding = np.zeros((int(args.padding * sample_rate), data.shape[1]), dtype='float32')
+        data = np.concatenate([data, padding])
+
+        endpointer = VoiceActivityEndpointer(vad, sample_rate, silence_ms=args.silence_ms)
+        blocks = endpointer.blocks_from(data)
+        vectorized, _ = endpoint(endpointer, blocks, len(blocks))
+        streamed, fed = endpoint(endpointer, blocks, 1)
+
+        duration = len(data) / sample_rate
+        utterance = len(endpointer.utterance) / sample_rate
+        print(
+            f"{os.path.basename(path):>20}: {duration:5.2f}s clip, utterance {utterance:5.2f}s, "
+            f"ended={endpointer.finished}, webrtcvad calls {endpointer.vad_calls}/{fed} frames, "
+            f"streamed {duration / streamed:5.0f}x realtime, vectorized {duration / vectorized:5.0f}x realtime"
+        )
+
+
+if __name__ == "__main__":
+    main()
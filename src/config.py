@@ -46,4 +46,19 @@ class Config:
         verification logic for their configurations.
         """
         pass
-        # Implement verification logic here
\ No newline at end of file
+        # Implement verification logic here
+
+
+def to_bool(value: Any) -> bool:
+    """
+    Read a boolean config value. Values edited in the UI come back as strings.
+
+    Args:
+        value (Any): The raw config value.
+
+    Returns:
+        bool: The parsed value.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
@@ -0,0 +1,80 @@
+"""
+A plain-Python event bus, so the pipeline can report progress without importing Qt.
+
+Everything emits on application_signal. Slots run on the emitting thread, so Qt widgets never
+connect here directly: ui/signal.py mirrors every event onto Qt signals (qt_signal), which Qt
+delivers on the GUI thread. In headless mode nothing imports Qt at all.
+"""
+import threading
+
+
+## Conversation log prefixes. A partial transcript replaces the previous one in the log, and the final
+## transcript replaces the last partial, so a turn being spoken takes a single row
+USER_PREFIX = "USER : "
+PARTIAL_PREFIX = "USER ... : "
+
+
+class Signal:
+    def __init__(self, name: str):
+        """
+        Initialize the Signal, a named list of slots with the connect/emit interface of a pyqtSignal.
+
+        Args:
+            name (str): The signal name, used in error messages.
+        """
+        self.name = name
+        self.slots = ()
+        self.lock = threading.Lock()
+
+    def connect(self, slot: callable) -> None:
+        """
+        Call a function on every emit.
+
+        Args:
+            slot (callable): Called with the emitted arguments.
+        """
+        with self.lock:
+            self.slots = self.slots + (slot,)
+
+    def disconnect(self, slot: callable = None) -> None:
+        """
+        Stop calling a function.
+
+        Args:
+            slot (callable): The slot to remove. None removes every slot.
+        """
+        with self.lock:
+            self.slots = tuple(connected for connected in self.slots if slot is not None and connected != slot)
+
+    def emit(self, *args) -> None:
+        """
+        Call every slot, in the order they were connected. A failing slot does not stop the others.
+
+        Args:
+            *args: The arguments passed to every slot.
+        """
+        ## The tuple is replaced, never changed, so emit needs no lock
+        for slot in self.slots:
+            try:
+                slot(*args)
+            except Exception as e:
+                print(f"{self.name} slot failed: {e}")
+
+
+class EventBus:
+    ## Every event, with the same names as the Qt signals in ui/signal.py
+    SIGNALS = (
+        "addResponseWidgetSignal", "closeDialogSignal", "shutdownSignal", "isRecording",
+        "deliveryMetricsSignal", "metricsSignal",
+    )
+
+    def __init__(self):
+        """
+        Initialize the EventBus with one Signal per event.
+        """
+        for name in self.SIGNALS:
+            setattr(self, name, Signal(name))
+
+
+# A global instance of EventBus
+application_signal = EventBus()
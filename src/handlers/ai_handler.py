@@ -1,6 +1,42 @@
+import copy
+import os
+import tempfile
+import threading
 from pathlib import Path
+from typing import Iterator
 
-from config import Config
+from config import Config, to_bool
+from handlers.audio_buffer import AudioBuffer
+from handlers.memory import ConversationMemory, Message
+from handlers.speculation import SpeculativeResponse
+from handlers.streaming_stt import TranscriptionStream, create_backend
+from handlers.tts_cache import TTSCache
+from handlers.upload_format import UploadFormat
+
+
+## Asks the chat model to fold messages evicted from the history into the running summary
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a user and an assistant in at most three sentences. "
+    "Keep names, facts and open questions. Start from the previous summary if there is one."
+)
+
+
+def summary_messages(previous: str, messages: list) -> list:
+    """
+    Build the chat request that summarizes messages evicted from the conversation history.
+
+    Args:
+        previous (str): The previous summary, or an empty string.
+        messages (list): The evicted messages, in the chat completions format.
+
+    Returns:
+        list: The request messages, in the chat completions format.
+    """
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Previous summary: {previous}\n\n{transcript}"},
+    ]
 
 
 class AIConfig(Config):
@@ -27,15 +63,68 @@ class AIConfig(Config):
 
 
 class AIHandler:
-    def __init__(self, **kwargs):
+    def __init__(self, stream: bool = False, upload_sample_rate: int = 16000, upload_channels: int = 1,
+                 upload_format: str = "wav", streaming_stt: bool = False, stt_backend: str = "",
+                 stt_partial_ms: int = 1000, stt_window_ms: int = 5000, speculative_response: bool = False,
+                 speculation_stable_ms: int = 500, speculation_limit: int = 2, **kwargs):
         """
         Initialize the AIHandler class.
         
         Args:
+            stream (bool): Whether the live loop should use stream_response and speak the reply sentence by sentence.
+            upload_sample_rate (int): The sample rate recordings are converted to before transcription. 0 keeps it.
+            upload_channels (int): 1 downmixes recordings to mono before transcription. 0 keeps the channels.
+            upload_format (str): The encoding of uploaded recordings, "wav", "flac" or "opus".
+            streaming_stt (bool): Whether the live loop transcribes while the user is still speaking.
+            stt_backend (str): The TranscriptionBackend class used while streaming. Empty uses transcribe_audio.
+            stt_partial_ms (int): New audio needed before the next partial transcript.
+            stt_window_ms (int): The longest stretch of audio transcribed in one streaming request.
+            speculative_response (bool): With streaming_stt, ask for the reply once the partial transcript is stable.
+            speculation_stable_ms (int): How long a partial transcript must stay unchanged before a speculative request.
+            speculation_limit (int): The most speculative requests per turn.
             kwargs: Additional keyword arguments.
         """
+        self.stream = to_bool(stream)
+        self.upload = UploadFormat(upload_sample_rate, upload_channels, upload_format)
+        self.streaming_stt = to_bool(streaming_stt)
+        self.stt_backend = stt_backend
+        self.stt_partial_ms = int(stt_partial_ms)
+        self.stt_window_ms = int(stt_window_ms)
+        self.transcription_backend = None
+        self.speculative_response = to_bool(speculative_response)
+        self.speculation_stable_ms = int(speculation_stable_ms)
+        self.speculation_limit = int(speculation_limit)
+
+    def warm_up(self) -> None:
+        """
+        Prepare the handler for its first request, for example by opening the connection.
+        Called in the background by the HandlerRegistry when warm_up is set in the config.
+        """
+        pass
+
+    def reset(self) -> None:
+        """
+        Forget the conversation. Called when a reused handler starts a new session.
+        """
         pass
 
+    def close(self) -> None:
+        """
+        Release the handler's connections and caches. Called by the HandlerRegistry once a new config's
+        handler has replaced this one.
+        """
+        pass
+
+    def fork(self) -> "AIHandler":
+        """
+        Create a handler for another conversation that shares this one's client, caches and settings.
+        Handlers with a conversation history give the copy its own, empty one.
+
+        Returns:
+            AIHandler: The new handler.
+        """
+        return copy.copy(self)
+
     def get_response(self, question: str) -> str:
         """
         Get a response from the AI model.
@@ -48,6 +137,77 @@ class AIHandler:
         """
         raise NotImplementedError("Subclasses should implement this method")
 
+    def prepare_response(self, question: str, cancelled: threading.Event = None):
+        """
+        Get a response without adding the exchange to the conversation, for a speculative request.
+        Handlers should stop as soon as cancelled is set. Handlers without a conversation history
+        can answer the way get_response does.
+
+        Args:
+            question (str): The question to ask the AI.
+            cancelled (threading.Event): Set when the response is no longer wanted.
+
+        Returns:
+            The AI's response message, or None if it was cancelled.
+        """
+        response = self.get_response(question)
+        return None if cancelled is not None and cancelled.is_set() else response
+
+    def accept_response(self, question: str, response) -> None:
+        """
+        Add an exchange from prepare_response to the conversation, once it is known to be the real one.
+
+        Args:
+            question (str): The question.
+            response: The message prepare_response returned.
+        """
+        pass
+
+    def history_version(self) -> int:
+        """
+        A number that changes whenever the conversation history changes, so a speculative response
+        built on an older history can be recognized. Handlers without a history always return 0.
+
+        Returns:
+            int: The version.
+        """
+        return 0
+
+    def has_history(self) -> bool:
+        """
+        Whether the conversation has begun, so a reply may depend on what was said before.
+        Handlers without a history always return False.
+
+        Returns:
+            bool: True if there is history.
+        """
+        return False
+
+    def open_speculation(self) -> SpeculativeResponse:
+        """
+        Start speculating on the replies to the next turn, if speculative_response is set.
+
+        Returns:
+            SpeculativeResponse: Takes the turn's partial transcripts, or None.
+        """
+        if not self.speculative_response:
+            return None
+        return SpeculativeResponse(self, self.speculation_stable_ms, self.speculation_limit)
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        """
+        Stream a response from the AI model.
+
+        Handlers without a streaming API yield the whole response at once.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The response text, one delta at a time.
+        """
+        yield self.get_response(question).content
+
     def transcribe_audio_file(self, path: str) -> str:
         """
         Transcribe an audio file.
@@ -60,6 +220,23 @@ class AIHandler:
         """
         raise NotImplementedError("Subclasses should implement this method")
 
+    def open_transcription(self, sample_rate: int, on_partial: callable = None) -> TranscriptionStream:
+        """
+        Start transcribing a recording while it is captured. Feed it audio as it arrives and call finish
+        at the end of the utterance for the final transcript.
+
+        Args:
+            sample_rate (int): The sample rate of the recording.
+            on_partial (callable): Called with each partial transcript, on the stream's worker thread.
+
+        Returns:
+            TranscriptionStream: The stream.
+        """
+        if self.transcription_backend is None:
+            self.transcription_backend = create_backend(self.stt_backend, self)
+        return TranscriptionStream(self.transcription_backend, sample_rate, self.stt_partial_ms, self.stt_window_ms,
+                                   on_partial)
+
     def text_to_speech(self, text: str, file_path: str) -> None:
         """
         Convert text to speech and save to a file.
@@ -70,13 +247,80 @@ class AIHandler:
         """
         raise NotImplementedError("Subclasses should implement this method")
 
+    def embed(self, text: str) -> list:
+        """
+        Embed text for similarity search.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            list: The embedding vector.
+        """
+        raise NotImplementedError("Subclasses should implement this method")
+
+    def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe audio held in memory.
+
+        Handlers that can only read files get a temporary copy, in the upload format, through transcribe_audio_file.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: The transcription of the audio.
+        """
+        name, content = self.upload.encode(audio)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, name)
+            Path(path).write_bytes(content)
+            return self.transcribe_audio_file(path)
+
+    def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Convert text to speech held in memory.
+
+        Handlers that can only write files go through a temporary file from text_to_speech.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The speech.
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "speech.wav")
+            self.text_to_speech(text, path)
+            return AudioBuffer.from_file(path)
+
+    def stream_speech(self, text: str) -> Iterator[AudioBuffer]:
+        """
+        Convert text to speech, yielding the audio in chunks as it is produced.
+
+        Handlers without streaming synthesis yield the whole clip at once.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Yields:
+            AudioBuffer: The next chunk of speech, all at the same sample rate and channel count.
+        """
+        yield self.synthesize_speech(text)
+
 
-class OpenAIHandler(AIHandler):
+class OpenAIConversation:
     NAME = "OPEN_AI"
+    ## The sample rate of the raw PCM the speech endpoint returns
+    PCM_SAMPLE_RATE = 24000
 
-    def __init__(self, system_message: str, chat_model: str, transcribe_model: str, speech_model: str, voice: str, **kwargs):
+    def __init__(self, system_message: str, chat_model: str, transcribe_model: str, speech_model: str, voice: str,
+                 history_token_budget: int = 3000, summarize_history: bool = False,
+                 embedding_model: str = "text-embedding-3-small", tts_cache_path: str = "", tts_cache_max_mb: int = 512,
+                 tts_cache_keep_seconds: float = 300, tts_cache: TTSCache = None, **kwargs):
         """
-        Initialize the OpenAIHandler class.
+        Initialize the settings, conversation memory and TTS cache shared by the OpenAI handlers. Subclasses
+        create the client and provide summarize; the other keyword arguments go to the handler base class.
 
         Args:
             system_message (str): The system message for the AI.
@@ -84,19 +328,176 @@ class OpenAIHandler(AIHandler):
             transcribe_model (str): The transcription model name.
             speech_model (str): The speech model name.
             voice (str): The voice to use for speech.
+            history_token_budget (int): The maximum number of prompt tokens the conversation history may use.
+            summarize_history (bool): Summarize messages that fall out of the history instead of dropping them.
+            embedding_model (str): The embedding model name, used for similarity lookup in the response cache.
+            tts_cache_path (str): The folder for the on-disk speech cache. Empty disables it.
+            tts_cache_max_mb (int): The size cap of the speech cache in megabytes.
+            tts_cache_keep_seconds (float): How long speech that was just used is protected from eviction.
+            tts_cache (TTSCache): A speech cache shared with other handlers. Overrides tts_cache_path.
             kwargs: Additional keyword arguments.
         """
         super().__init__(**kwargs)
-
-        from openai import OpenAI
-        self.client = OpenAI()
-        self.messages = [{"role": "system", "content": system_message}]
+        summarizer = self.summarize if to_bool(summarize_history) else None
+        self.memory = ConversationMemory(system_message, int(history_token_budget), summarizer, chat_model)
 
         self.system_message = system_message
         self.chat_model = chat_model
         self.transcribe_model = transcribe_model
         self.speech_model = speech_model
         self.voice = voice
+        self.embedding_model = embedding_model
+        self.tts_cache = tts_cache
+        ## A cache passed in belongs to the caller and is left open by close
+        self.owns_tts_cache = self.tts_cache is None and bool(tts_cache_path)
+        if self.owns_tts_cache:
+            self.tts_cache = TTSCache(tts_cache_path, int(tts_cache_max_mb) * 1024 * 1024, tts_cache_keep_seconds)
+
+    def reset(self) -> None:
+        """
+        Forget the conversation, keeping the system message.
+        """
+        self.memory.clear()
+
+    def close(self) -> None:
+        """
+        Close the TTS cache, if the handler created it.
+        """
+        if self.owns_tts_cache:
+            self.tts_cache.close()
+
+    def history_version(self) -> int:
+        """
+        The version of the conversation memory.
+
+        Returns:
+            int: The version.
+        """
+        return self.memory.version
+
+    def has_history(self) -> bool:
+        """
+        Whether the conversation has begun, including a summary of evicted messages.
+
+        Returns:
+            bool: True if there is history.
+        """
+        with self.memory.lock:
+            return bool(self.memory.history) or self.memory.summary is not None
+
+    @property
+    def messages(self) -> list:
+        """
+        The conversation history that the next request will send.
+        """
+        return self.memory.messages()
+
+    def request_messages(self, question: str) -> list:
+        """
+        Build the messages for a request about a question, without adding the question to the history.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            list: The messages, in the chat completions format.
+        """
+        return self.memory.messages() + [{"role": "user", "content": question}]
+
+    def cached_speech(self, text: str) -> AudioBuffer:
+        """
+        Look speech up in the TTS cache.
+
+        Args:
+            text (str): The spoken text.
+
+        Returns:
+            AudioBuffer: The cached clip, or None without a cache or on a miss.
+        """
+        if not self.tts_cache:
+            return None
+        return self.tts_cache.get(self.speech_model, self.voice, text)
+
+    def store_speech(self, text: str, audio: AudioBuffer) -> None:
+        """
+        Store new speech in the TTS cache, if there is one.
+
+        Args:
+            text (str): The spoken text.
+            audio (AudioBuffer): The speech.
+        """
+        if self.tts_cache:
+            self.tts_cache.put(self.speech_model, self.voice, text, audio)
+
+
+class OpenAIHandler(OpenAIConversation, AIHandler):
+    def __init__(self, **kwargs):
+        """
+        Initialize the OpenAIHandler class.
+
+        Args:
+            kwargs: The settings of OpenAIConversation and AIHandler.
+        """
+        super().__init__(**kwargs)
+
+        from openai import OpenAI
+        self.client = OpenAI()
+
+    def warm_up(self) -> None:
+        """
+        Fetch the chat model's metadata. The cheap request opens the TLS connection the first turn reuses.
+        """
+        self.client.models.retrieve(self.chat_model)
+
+    def close(self) -> None:
+        """
+        Close the TTS cache and the HTTP connections of the OpenAI client.
+        """
+        super().close()
+        self.client.close()
+
+    def fork(self) -> "OpenAIHandler":
+        """
+        Create a handler for another conversation. The OpenAI client and its connection pool, and the
+        TTS cache, are shared; the conversation memory is new.
+
+        Returns:
+            OpenAIHandler: The new handler.
+        """
+        handler = super().fork()
+        summarizer = handler.summarize if self.memory.summarizer else None
+        handler.memory = ConversationMemory(self.system_message, self.memory.token_budget, summarizer, self.chat_model)
+        return handler
+
+    def summarize(self, previous: str, messages: list) -> str:
+        """
+        Summarize messages evicted from the conversation history.
+
+        Args:
+            previous (str): The previous summary, or an empty string.
+            messages (list): The evicted messages, in the chat completions format.
+
+        Returns:
+            str: The new summary.
+        """
+        response = self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=summary_messages(previous, messages)
+        )
+        return response.choices[0].message.content
+
+    def embed(self, text: str) -> list:
+        """
+        Embed text using OpenAI.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            list: The embedding vector.
+        """
+        response = self.client.embeddings.create(model=self.embedding_model, input=text)
+        return response.data[0].embedding
 
     def transcribe_audio_file(self, path: str) -> str:
         """
@@ -125,17 +526,83 @@ class OpenAIHandler(AIHandler):
         Returns:
             dict: The AI's response.
         """
-        self.messages.append({"role": "user", "content": question})
+        self.memory.add("user", question)
 
         response = self.client.chat.completions.create(
             model=self.chat_model,
-            messages=self.messages
+            messages=self.memory.messages()
         )
 
-        self.messages.append(response.choices[0].message)
+        self.memory.add("assistant", response.choices[0].message.content)
 
         return response.choices[0].message
 
+    def prepare_response(self, question: str, cancelled: threading.Event = None) -> Message:
+        """
+        Get a response from the OpenAI model without adding it to the conversation. The response is
+        streamed, so a cancellation closes the connection and the model stops generating.
+
+        Args:
+            question (str): The question to ask the AI.
+            cancelled (threading.Event): Set when the response is no longer wanted.
+
+        Returns:
+            Message: The AI's response, or None if it was cancelled.
+        """
+        stream = self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=self.request_messages(question),
+            stream=True
+        )
+
+        content = []
+        with stream:
+            for chunk in stream:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content.append(chunk.choices[0].delta.content)
+        return Message("assistant", "".join(content), 0)
+
+    def accept_response(self, question: str, response: Message) -> None:
+        """
+        Add a prepared exchange to the conversation.
+
+        Args:
+            question (str): The question.
+            response (Message): The response.
+        """
+        self.memory.add_exchange(question, response.content)
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        """
+        Stream a response from the OpenAI model. The question and the reply are added to the conversation
+        together once the stream is complete, so a failed or abandoned stream leaves the history unchanged.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The response text, one token delta at a time.
+        """
+        stream = self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=self.request_messages(question),
+            stream=True
+        )
+
+        content = []
+        with stream:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    content.append(delta)
+                    yield delta
+
+        self.memory.add_exchange(question, "".join(content))
+
     def text_to_speech(self, text: str, file_path: str) -> None:
         """
         Convert text to speech using OpenAI and save to a file.
@@ -153,6 +620,80 @@ class OpenAIHandler(AIHandler):
 
         response.stream_to_file(speech_file_path)
 
+    def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe audio held in memory using OpenAI. The clip is converted and encoded in memory and uploaded directly.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: The transcription of the audio.
+        """
+        transcription = self.client.audio.transcriptions.create(
+            model=self.transcribe_model,
+            file=self.upload.encode(audio)
+        )
+        return transcription.text
+
+    def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Convert text to speech using OpenAI. The raw PCM response is wrapped without decoding or copying.
+
+        With a TTS cache, repeated text is read from disk instead, and new speech is stored there.
+        Either way the returned clip's path points at the cached file, so it can be sent as is.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The speech, 24 kHz mono 16 bit.
+        """
+        audio = self.cached_speech(text)
+        if audio:
+            return audio
+
+        response = self.client.audio.speech.create(
+            model=self.speech_model,
+            voice=self.voice,
+            input=text,
+            response_format="pcm"
+        )
+        audio = AudioBuffer.from_pcm16(response.content, self.PCM_SAMPLE_RATE)
+        self.store_speech(text, audio)
+        return audio
+
+    def stream_speech(self, text: str) -> Iterator[AudioBuffer]:
+        """
+        Convert text to speech using OpenAI, yielding the raw PCM response in chunks as it downloads.
+
+        With a TTS cache, repeated text is read from disk in one piece, and new speech is stored there
+        once the whole response has arrived.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Yields:
+            AudioBuffer: The next chunk of speech, 24 kHz mono 16 bit.
+        """
+        audio = self.cached_speech(text)
+        if audio:
+            yield audio
+            return
+
+        chunks = []
+        with self.client.audio.speech.with_streaming_response.create(
+            model=self.speech_model,
+            voice=self.voice,
+            input=text,
+            response_format="pcm"
+        ) as response:
+            ## An even chunk size keeps every chunk a whole number of 16 bit samples
+            for chunk in response.iter_bytes(self.PCM_SAMPLE_RATE // 10 * 2):
+                chunks.append(chunk)
+                yield AudioBuffer.from_pcm16(chunk, self.PCM_SAMPLE_RATE)
+        self.store_speech(text, AudioBuffer.from_pcm16(b"".join(chunks), self.PCM_SAMPLE_RATE))
+
 
 class GeminiHandler(AIHandler):
     NAME = "GEMINI"
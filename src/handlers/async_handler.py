@@ -0,0 +1,382 @@
+import asyncio
+from typing import AsyncIterator
+
+from config import to_bool
+from handlers.ai_handler import AIHandler, OpenAIConversation, summary_messages
+from handlers.audio_buffer import AudioBuffer
+from handlers.speculation import SpeculativeResponse
+from handlers.streaming_stt import TranscriptionStream
+from handlers.upload_format import UploadFormat
+
+
+## Returned by next() when a wrapped synchronous stream is exhausted
+_DONE = object()
+
+
+class AsyncAIHandler:
+    NAME = "ASYNC"
+
+    def __init__(self, stream: bool = False, upload_sample_rate: int = 16000, upload_channels: int = 1,
+                 upload_format: str = "wav", **kwargs):
+        """
+        Initialize the AsyncAIHandler, the asyncio counterpart of AIHandler.
+
+        Args:
+            stream (bool): Whether the live loop should stream responses and speak them sentence by sentence.
+            upload_sample_rate (int): The sample rate recordings are converted to before transcription. 0 keeps it.
+            upload_channels (int): 1 downmixes recordings to mono before transcription. 0 keeps the channels.
+            upload_format (str): The encoding of uploaded recordings, "wav", "flac" or "opus".
+            kwargs: Additional keyword arguments.
+        """
+        self.stream = to_bool(stream)
+        self.upload = UploadFormat(upload_sample_rate, upload_channels, upload_format)
+        ## Streaming transcription runs on threads, so only handlers wrapping an AIHandler offer it
+        self.streaming_stt = False
+        self.speculative_response = False
+
+    async def get_response(self, question: str):
+        """
+        Get a response from the AI.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            The AI's response message. Its content attribute holds the text.
+        """
+        raise NotImplementedError("Subclasses should implement this method")
+
+    async def stream_response(self, question: str) -> AsyncIterator[str]:
+        """
+        Stream a response from the AI. Handlers without streaming yield the whole response at once.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The response text, in pieces as they arrive.
+        """
+        response = await self.get_response(question)
+        yield response.content
+
+    async def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe audio held in memory.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: The transcription of the audio.
+        """
+        raise NotImplementedError("Subclasses should implement this method")
+
+    async def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Convert text to speech in memory.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The speech.
+        """
+        raise NotImplementedError("Subclasses should implement this method")
+
+    def warm_up(self) -> None:
+        """
+        Prepare for the first turn. Called in the background by the HandlerRegistry when warm_up is set in the config.
+        """
+        pass
+
+    def reset(self) -> None:
+        """
+        Forget the conversation. Called when a reused handler starts a new session.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Release the handler's caches. Called by the HandlerRegistry once a new config's handler has replaced this one.
+        """
+        pass
+
+    async def aclose(self) -> None:
+        """
+        Release the handler's connections.
+        """
+        pass
+
+
+class ThreadedAIHandler(AsyncAIHandler):
+    def __init__(self, handler: AIHandler):
+        """
+        Initialize the ThreadedAIHandler, which runs a synchronous AIHandler in worker threads.
+
+        Any handler (cached, Gemini, benchmark fakes) can be used from the async live loop this way.
+
+        Args:
+            handler (AIHandler): The handler to wrap.
+        """
+        super().__init__(stream=handler.stream)
+        self.streaming_stt = handler.streaming_stt
+        self.speculative_response = handler.speculative_response
+        self.handler = handler
+        self.NAME = handler.NAME
+
+    async def get_response(self, question: str):
+        """
+        Get a response from the wrapped handler.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            The AI's response message.
+        """
+        return await asyncio.to_thread(self.handler.get_response, question)
+
+    async def stream_response(self, question: str) -> AsyncIterator[str]:
+        """
+        Stream a response from the wrapped handler, pulling each piece in a worker thread.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The response text.
+        """
+        deltas = self.handler.stream_response(question)
+        while True:
+            delta = await asyncio.to_thread(next, deltas, _DONE)
+            if delta is _DONE:
+                return
+            yield delta
+
+    async def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe audio with the wrapped handler.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: The transcription of the audio.
+        """
+        return await asyncio.to_thread(self.handler.transcribe_audio, audio)
+
+    def open_transcription(self, sample_rate: int, on_partial: callable = None) -> TranscriptionStream:
+        """
+        Start a streaming transcription with the wrapped handler. The stream has its own worker thread.
+
+        Args:
+            sample_rate (int): The sample rate of the recording.
+            on_partial (callable): Called with each partial transcript.
+
+        Returns:
+            TranscriptionStream: The stream.
+        """
+        return self.handler.open_transcription(sample_rate, on_partial)
+
+    def open_speculation(self) -> SpeculativeResponse:
+        """
+        Start speculating on the replies to the next turn with the wrapped handler. Requests run on their own threads.
+
+        Returns:
+            SpeculativeResponse: Takes the turn's partial transcripts, or None.
+        """
+        return self.handler.open_speculation()
+
+    async def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Convert text to speech with the wrapped handler.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The speech.
+        """
+        return await asyncio.to_thread(self.handler.synthesize_speech, text)
+
+
+class AsyncOpenAIHandler(OpenAIConversation, AsyncAIHandler):
+    def __init__(self, **kwargs):
+        """
+        Initialize the AsyncOpenAIHandler, which talks to OpenAI through an AsyncOpenAI client.
+
+        It takes the same configuration as OpenAIHandler. Every session runs its own event loop and
+        closes the client when it ends, so the client is created on first use in each loop; the
+        handler itself, with its memory and TTS cache, is reused by the HandlerRegistry. Summaries of
+        evicted history are requested through the same client, on the handler's event loop.
+
+        Args:
+            kwargs: The settings of OpenAIConversation and AsyncAIHandler.
+        """
+        super().__init__(**kwargs)
+
+        from openai import AsyncOpenAI
+        self.client_class = AsyncOpenAI
+        self.connection = None
+        ## The event loop the handler is used on, set whenever the memory changes
+        self.loop = None
+
+    @property
+    def client(self):
+        """
+        The AsyncOpenAI client of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self.connection is None or self.connection[0] is not loop:
+            self.connection = (loop, self.client_class())
+        return self.connection[1]
+
+    async def remember(self, role: str, content: str) -> None:
+        """
+        Add a message to the history. Runs in a worker thread, because eviction may summarize.
+
+        Args:
+            role (str): "user" or "assistant".
+            content (str): The message text.
+        """
+        self.loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.memory.add, role, content)
+
+    async def remember_exchange(self, question: str, reply: str) -> None:
+        """
+        Add a question and its reply to the history together, in a worker thread like remember.
+
+        Args:
+            question (str): The user message.
+            reply (str): The assistant message.
+        """
+        self.loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.memory.add_exchange, question, reply)
+
+    def summarize(self, previous: str, messages: list) -> str:
+        """
+        Summarize messages evicted from the conversation history. Called by the memory on the worker
+        thread of remember; the request runs on the handler's event loop, which is free meanwhile.
+
+        Args:
+            previous (str): The previous summary, or an empty string.
+            messages (list): The evicted messages, in the chat completions format.
+
+        Returns:
+            str: The new summary.
+        """
+        return asyncio.run_coroutine_threadsafe(self.request_summary(previous, messages), self.loop).result()
+
+    async def request_summary(self, previous: str, messages: list) -> str:
+        """
+        Ask the chat model for the new summary.
+
+        Args:
+            previous (str): The previous summary, or an empty string.
+            messages (list): The evicted messages, in the chat completions format.
+
+        Returns:
+            str: The new summary.
+        """
+        response = await self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=summary_messages(previous, messages)
+        )
+        return response.choices[0].message.content
+
+    async def get_response(self, question: str):
+        """
+        Get a response from the OpenAI model.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            The AI's response message.
+        """
+        await self.remember("user", question)
+        response = await self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=self.memory.messages()
+        )
+        await self.remember("assistant", response.choices[0].message.content)
+        return response.choices[0].message
+
+    async def stream_response(self, question: str) -> AsyncIterator[str]:
+        """
+        Stream a response from the OpenAI model. The question and the reply are added to the conversation
+        together once the stream is complete, so a failed or abandoned stream leaves the history unchanged.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The response text, one token delta at a time.
+        """
+        stream = await self.client.chat.completions.create(
+            model=self.chat_model,
+            messages=self.request_messages(question),
+            stream=True
+        )
+
+        content = []
+        async with stream:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    content.append(delta)
+                    yield delta
+
+        await self.remember_exchange(question, "".join(content))
+
+    async def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe audio held in memory using OpenAI. The conversion runs on a worker thread, off the event loop.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: The transcription of the audio.
+        """
+        upload = await asyncio.to_thread(self.upload.encode, audio)
+        transcription = await self.client.audio.transcriptions.create(
+            model=self.transcribe_model,
+            file=upload
+        )
+        return transcription.text
+
+    async def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Convert text to speech using OpenAI, through the TTS cache if there is one.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The speech, 24 kHz mono 16 bit.
+        """
+        audio = await asyncio.to_thread(self.cached_speech, text)
+        if audio:
+            return audio
+
+        response = await self.client.audio.speech.create(
+            model=self.speech_model,
+            voice=self.voice,
+            input=text,
+            response_format="pcm"
+        )
+        audio = AudioBuffer.from_pcm16(response.content, self.PCM_SAMPLE_RATE)
+        await asyncio.to_thread(self.store_speech, text, audio)
+        return audio
+
+    async def aclose(self) -> None:
+        """
+        Close the HTTP connections of the OpenAI client. The next session creates a new one.
+        """
+        if self.connection is not None:
+            _, client = self.connection
+            self.connection = None
+            await client.close()
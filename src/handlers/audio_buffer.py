@@ -0,0 +1,231 @@
+import io
+import os
+import queue
+import tempfile
+import threading
+
+import numpy as np
+import soundfile as sf
+
+
+class AudioBuffer:
+    def __init__(self, data: np.ndarray, sample_rate: int, name: str = None):
+        """
+        Initialize the AudioBuffer, a clip of audio held in memory.
+
+        Args:
+            data (np.ndarray): The samples, shaped (frames,) or (frames, channels).
+            sample_rate (int): The sample rate of the samples.
+            name (str): The file name used when the clip is archived or saved.
+        """
+        self.data = data
+        self.sample_rate = int(sample_rate)
+        self.name = name
+        self.path = None
+
+    @property
+    def channels(self) -> int:
+        """
+        The number of channels in the clip.
+        """
+        return 1 if self.data.ndim == 1 else self.data.shape[1]
+
+    @property
+    def frames(self) -> int:
+        """
+        The number of frames in the clip.
+        """
+        return self.data.shape[0]
+
+    @property
+    def duration(self) -> float:
+        """
+        The length of the clip in seconds.
+        """
+        return self.frames / self.sample_rate
+
+    @classmethod
+    def from_file(cls, path: str):
+        """
+        Read a clip from an audio file.
+
+        Args:
+            path (str): The path to the audio file.
+
+        Returns:
+            AudioBuffer: The clip.
+        """
+        data, sample_rate = sf.read(path, dtype='float32')
+        audio = cls(data, sample_rate, os.path.basename(path))
+        audio.path = path
+        return audio
+
+    @classmethod
+    def from_bytes(cls, content: bytes, name: str = None):
+        """
+        Read a clip from encoded audio (WAV, FLAC, ...) held in memory.
+
+        Args:
+            content (bytes): The encoded audio.
+            name (str): The file name used when the clip is archived or saved.
+
+        Returns:
+            AudioBuffer: The clip.
+        """
+        data, sample_rate = sf.read(io.BytesIO(content), dtype='float32')
+        return cls(data, sample_rate, name)
+
+    @classmethod
+    def from_pcm16(cls, content: bytes, sample_rate: int, channels: int = 1, name: str = None):
+        """
+        Wrap raw little-endian 16 bit PCM without copying it.
+
+        Args:
+            content (bytes): The raw samples.
+            sample_rate (int): The sample rate of the samples.
+            channels (int): The number of interleaved channels.
+            name (str): The file name used when the clip is archived or saved.
+
+        Returns:
+            AudioBuffer: The clip.
+        """
+        data = np.frombuffer(content, dtype='<i2')
+        if channels > 1:
+            data = data.reshape(-1, channels)
+        return cls(data, sample_rate, name)
+
+    def to_wav(self) -> io.BytesIO:
+        """
+        Encode the clip as a WAV file in memory.
+
+        Returns:
+            io.BytesIO: The WAV file, positioned at the start. Can be handed to any API that takes a file object.
+        """
+        wav = io.BytesIO()
+        sf.write(wav, self.data, self.sample_rate, format='WAV')
+        wav.seek(0)
+        return wav
+
+    def wav_bytes(self) -> memoryview:
+        """
+        Encode the clip as WAV and return a view of the encoded bytes, without copying them.
+
+        Returns:
+            memoryview: The WAV file contents.
+        """
+        return self.to_wav().getbuffer()
+
+    def pcm16(self) -> memoryview:
+        """
+        Return the clip as raw interleaved little-endian 16 bit PCM. Clips already held as int16 are not copied.
+
+        Returns:
+            memoryview: The raw samples, as bytes.
+        """
+        data = self.data
+        if data.dtype != np.dtype('<i2'):
+            data = (np.clip(data, -1.0, 1.0) * 32767).astype('<i2')
+        return memoryview(np.ascontiguousarray(data)).cast('B')
+
+    def write(self, path: str) -> str:
+        """
+        Write a copy of the clip to disk, leaving path unchanged. The file is written under a temporary
+        name and renamed, so readers never see half a clip and two writers of the same path never interleave.
+
+        Args:
+            path (str): The path to write to. The format follows the extension.
+
+        Returns:
+            str: The path written to.
+        """
+        folder, name = os.path.split(path)
+        descriptor, temporary_path = tempfile.mkstemp(prefix=".", suffix=os.path.splitext(name)[1], dir=folder or ".")
+        os.close(descriptor)
+        try:
+            sf.write(temporary_path, self.data, self.sample_rate)
+            os.replace(temporary_path, path)
+        except Exception:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return path
+
+    def save(self, path: str) -> str:
+        """
+        Write the clip to disk and remember where, so it can be sent by path.
+
+        Args:
+            path (str): The path to write to. The format follows the extension.
+
+        Returns:
+            str: The path written to.
+        """
+        self.path = self.write(path)
+        return path
+
+
+class AudioArchive:
+    def __init__(self, path: str, max_queue_size: int = 32):
+        """
+        Initialize the AudioArchive, which writes clips to disk on a background thread.
+
+        Args:
+            path (str): The folder to write clips to.
+            max_queue_size (int): The number of clips that may wait to be written. Clips beyond that are dropped.
+        """
+        self.path = path
+        self.q = queue.Queue(maxsize=max_queue_size)
+        self.thread = threading.Thread(target=self.run, name="audio-archive", daemon=True)
+        self.thread.start()
+
+    def submit(self, audio: AudioBuffer) -> None:
+        """
+        Queue a clip to be written. Never blocks the caller.
+
+        Args:
+            audio (AudioBuffer): The clip to archive. Its name is used as the file name.
+        """
+        try:
+            self.q.put_nowait(audio)
+        except queue.Full:
+            print(f"Audio archive is behind, dropped {audio.name}")
+
+    def remove(self, name: str) -> None:
+        """
+        Queue an archived clip to be deleted. It is deleted after the clips queued before it are
+        written, so a deletion never races a write of the same file. Never blocks the caller.
+
+        Args:
+            name (str): The file name of the clip.
+        """
+        try:
+            self.q.put_nowait(name)
+        except queue.Full:
+            print(f"Audio archive is behind, kept {name}")
+
+    def run(self) -> None:
+        """
+        Worker loop that writes queued clips and deletes queued file names. The clips are shared with
+        the delivery, so their path is left alone: a clip is sent from the TTS cache or from folder_path,
+        never from the archive.
+        """
+        while True:
+            audio = self.q.get()
+            if audio is None:
+                break
+            try:
+                if isinstance(audio, str):
+                    path = os.path.join(self.path, audio)
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    audio.write(os.path.join(self.path, audio.name))
+            except Exception as e:
+                print(f"Could not archive {getattr(audio, 'name', audio)}: {e}")
+
+    def close(self) -> None:
+        """
+        Write the clips already queued and stop the worker.
+        """
+        self.q.put(None)
+        self.thread.join()
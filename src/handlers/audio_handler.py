@@ -3,10 +3,18 @@ import soundfile as sf
 import numpy as np
 import webrtcvad
 import keyboard
-import sys
-import queue
+import threading
 
 from config import Config
+from handlers.audio_buffer import AudioBuffer
+from handlers.playback import Playback, StreamingPlayer
+from handlers.ring_buffer import AudioRingBuffer
+from handlers.vad import VoiceActivityEndpointer
+from metrics import metrics
+
+
+## The sounddevice CallbackFlags counted by the recorder
+STATUS_FLAGS = ("input_overflow", "input_underflow", "output_overflow", "output_underflow")
 
 
 class AudioConfig(Config):
@@ -33,7 +41,8 @@ class AudioConfig(Config):
 
 
 class VoiceRecorder:
-    def __init__(self, device: dict = None, sample_rate: int = 44100, channel_count: int = 2, chunk_duration_ms: int = 30):
+    def __init__(self, device: dict = None, sample_rate: int = 44100, channel_count: int = 2, chunk_duration_ms: int = 30,
+                 silence_ms: int = 800, buffer_ms: int = 2000, playback_buffer_ms: int = 500):
         """
         Initialize the VoiceRecorder class.
 
@@ -42,6 +51,9 @@ class VoiceRecorder:
             sample_rate (int): The sample rate for recording.
             channel_count (int): The number of audio channels.
             chunk_duration_ms (int): The duration of each audio chunk in milliseconds.
+            silence_ms (int): In hands-free capture, the utterance ends after this much trailing silence.
+            buffer_ms (int): How much audio the capture ring buffer holds before the callback drops frames.
+            playback_buffer_ms (int): How much audio is read ahead of the output during playback.
         """
         if device:
             self.device = device.get("name")
@@ -53,8 +65,24 @@ class VoiceRecorder:
         self.channel_count = channel_count
         self.chunk_size = int(sample_rate * chunk_duration_ms / 1000)  # Convert from ms to samples
         self.vad = webrtcvad.Vad(1)  # 0 to 3, where 3 is the most aggressive
-        self.recording = np.array([])
-        self.q = queue.Queue()
+        self.endpointer = VoiceActivityEndpointer(self.vad, sample_rate, chunk_duration_ms, silence_ms=silence_ms)
+        ## The callback writes here without allocating or locking, the capture loops read from it
+        self.ring = AudioRingBuffer(int(sample_rate * buffer_ms / 1000), channel_count)
+        self.poll_interval = chunk_duration_ms / 1000
+        self.player = StreamingPlayer(buffer_ms=playback_buffer_ms)
+
+    def open_stream(self, **kwargs):
+        """
+        Open the input stream that feeds callback.
+
+        Args:
+            **kwargs: Extra sd.InputStream arguments, for example blocksize.
+
+        Returns:
+            sd.InputStream: The stream, to be used as a context manager.
+        """
+        return sd.InputStream(samplerate=self.sample_rate, device=self.device, channels=self.channel_count,
+                              callback=self.callback, **kwargs)
 
     def record(self, file: str, key: str) -> None:
         """
@@ -64,14 +92,108 @@ class VoiceRecorder:
             file (str): The file path to save the recording.
             key (str): The key to hold down for recording.
         """
+        self.ring.clear()
         with sf.SoundFile(file, mode='w', samplerate=self.sample_rate, channels=self.channel_count) as sound_file:
-            with sd.InputStream(samplerate=self.sample_rate, device=self.device, channels=self.channel_count, callback=self.callback):
+            with self.open_stream():
                 print('#' * 80)
                 print('Press the specified key to stop the recording')
                 print('#' * 80)
                 while keyboard.is_pressed(key):
-                    sound_file.write(self.q.get())
+                    if self.ring.wait(1, self.poll_interval):
+                        self.write_available(sound_file)
                 print("Recording stopped")
+            self.write_available(sound_file)
+
+    def write_available(self, sound_file: sf.SoundFile) -> None:
+        """
+        Write the captured frames straight from the ring buffer to a file, without copying them first.
+
+        Args:
+            sound_file (sf.SoundFile): The open file.
+        """
+        views = self.ring.views()
+        for view in views:
+            sound_file.write(view)
+        self.ring.consume(sum(len(view) for view in views))
+
+    def capture(self, released: threading.Event, stop: callable = None, transcription=None) -> AudioBuffer:
+        """
+        Record audio into memory until released is set.
+
+        Args:
+            released (threading.Event): Set when the turn ends, for example when the recording key comes up.
+            stop (callable): Returning True also ends the recording.
+            transcription (TranscriptionStream): If given, fed every block as it is captured.
+
+        Returns:
+            AudioBuffer: The recording.
+        """
+        blocks = []
+        self.ring.clear()
+        with self.open_stream():
+            print('#' * 80)
+            print('Release the trigger to stop the recording')
+            print('#' * 80)
+            while not released.is_set() and not (stop and stop()):
+                ## Copy out whatever arrived since the last pass, many callback blocks at a time
+                if self.ring.wait(1, self.poll_interval):
+                    blocks.append(self.ring.read())
+                    if transcription:
+                        transcription.feed(blocks[-1])
+            print("Recording stopped")
+        ## Collect the frames that arrived before the stream closed, so they do not leak into the next recording
+        if self.ring.available:
+            blocks.append(self.ring.read())
+            if transcription:
+                transcription.feed(blocks[-1])
+
+        if blocks:
+            data = np.concatenate(blocks)
+        else:
+            data = np.zeros((0, self.channel_count), dtype='float32')
+        return AudioBuffer(data, self.sample_rate)
+
+    def listen(self, stop: callable = None, on_speech: callable = None, transcription=None) -> AudioBuffer:
+        """
+        Record one utterance hands-free. Voice activity detection decides where it starts and ends.
+
+        Args:
+            stop (callable): Checked between blocks. Returning True abandons the utterance.
+            on_speech (callable): Called once when speech is first detected.
+            transcription (TranscriptionStream): If given, fed the utterance as it grows, from the pre-roll on.
+
+        Returns:
+            AudioBuffer: The utterance, or None if stop was requested first.
+        """
+        self.endpointer.reset()
+        self.ring.clear()
+        ## The endpointer's block list that was fed, and how much of it
+        fed_blocks, fed = None, 0
+        with self.open_stream(blocksize=self.chunk_size):
+            while not self.endpointer.finished:
+                if stop and stop():
+                    return None
+                if not self.ring.wait(self.chunk_size, 0.1):
+                    continue
+                triggered = self.endpointer.triggered
+                ## Blocks usually arrive one at a time, but a backlog is decided in one vectorized call
+                count = self.ring.available // self.chunk_size
+                blocks = self.ring.read(count * self.chunk_size).reshape(count, self.chunk_size, self.channel_count)
+                self.endpointer.feed(blocks)
+                if on_speech and self.endpointer.triggered and not triggered:
+                    on_speech()
+                if transcription and self.endpointer.triggered:
+                    ## A new list means the endpointer dropped a false start and began another utterance
+                    if self.endpointer.blocks is not fed_blocks:
+                        if fed_blocks is not None:
+                            transcription.reset()
+                        fed_blocks, fed = self.endpointer.blocks, 0
+                    if len(fed_blocks) > fed:
+                        transcription.feed(np.concatenate(fed_blocks[fed:]))
+                        fed = len(fed_blocks)
+        ## Drop the frames captured after the endpoint
+        self.ring.clear()
+        return AudioBuffer(self.endpointer.utterance, self.sample_rate)
 
     def callback(self, indata: np.ndarray, frames: int, time, status) -> None:
         """
@@ -83,18 +205,30 @@ class VoiceRecorder:
             time: The time information.
             status: The status of the recording.
         """
+        ## Printing here would block the audio thread, so problems are only counted (see the dashboard)
         if status:
-            print(status, file=sys.stderr)
-        self.q.put(indata.copy())
-
-    def play(self, file: str) -> None:
+            for flag in STATUS_FLAGS:
+                if getattr(status, flag):
+                    metrics.increment(f"audio.{flag}")
+        ## No copy and no queue: the block goes straight into preallocated storage
+        if self.ring.write(indata) < frames:
+            metrics.increment("audio.ring_overflow")
+
+    def play(self, file: str, on_finished: callable = None) -> Playback:
         """
-        Play the recorded file.
+        Play the recorded file at its own sample rate, without blocking. Any earlier playback is stopped.
 
         Args:
             file (str): The file path of the recording to play.
+            on_finished (callable): Called once playback has finished or was stopped.
+
+        Returns:
+            Playback: The playback, for waiting or stopping.
+        """
+        return self.player.play_file(file, on_finished)
+
+    def stop_playing(self) -> None:
+        """
+        Stop any currently playing audio.
         """
-        with sf.SoundFile(file, mode='r') as sound_file:
-            data = sound_file.read(dtype='float32')
-            sd.play(data, samplerate=26000)
-            sd.wait()
\ No newline at end of file
+        self.player.stop()
@@ -0,0 +1,608 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Iterator
+
+import numpy as np
+
+from handlers.ai_handler import AIHandler
+from handlers.audio_buffer import AudioArchive, AudioBuffer
+from handlers.memory import Message
+from handlers.speculation import normalize_transcript
+from handlers.streaming_stt import TranscriptionStream
+from metrics import metrics
+
+
+def audio_file_name(question: str, text: str) -> str:
+    """
+    Name the cached audio for a text spoken in the reply to a question. Every entry has its own files,
+    so evicting one entry never deletes speech another entry still uses.
+
+    Args:
+        question (str): The normalized question of the entry.
+        text (str): The spoken text.
+
+    Returns:
+        str: A file name derived from a hash of the question and the text.
+    """
+    return hashlib.sha1(f"{question}\n{text}".encode("utf-8")).hexdigest() + ".wav"
+
+
+def read_cache_settings(config: dict) -> dict:
+    """
+    Read the response cache settings from an AI config, the same way for every caller.
+
+    Args:
+        config (dict): The AI configuration, as in open_ai.yml.
+
+    Returns:
+        dict: The ResponseCache keyword arguments, without the embedder.
+    """
+    return {
+        "path": config.get("response_cache_path") or None,
+        "max_entries": int(config.get("response_cache_size", 256)),
+        "ttl_seconds": float(config.get("response_cache_ttl", 7 * 24 * 3600)),
+        "similarity_threshold": float(config.get("response_cache_similarity", 0)),
+        "min_words": int(config.get("response_cache_min_words", 4)),
+    }
+
+
+class CacheEntry:
+    def __init__(self, question: str, reply: str, created: float = None, embedding: np.ndarray = None):
+        """
+        Initialize a CacheEntry, a cached reply and the speech synthesized for it.
+
+        Args:
+            question (str): The normalized question.
+            reply (str): The text reply.
+            created (float): The wall clock time the reply was cached.
+            embedding (np.ndarray): The unit-length embedding of the question, if similarity lookup is on.
+        """
+        self.question = question
+        self.reply = reply
+        self.created = created or time.time()
+        self.embedding = embedding
+        ## Spoken text -> AudioBuffer. A streamed reply is spoken in several segments
+        self.audio = {}
+
+
+class ResponseCache:
+    def __init__(self, path: str = None, max_entries: int = 256, ttl_seconds: float = 7 * 24 * 3600,
+                 similarity_threshold: float = 0.0, embedder: callable = None, flush_delay: float = 1.0,
+                 min_words: int = 4):
+        """
+        Initialize the ResponseCache, an LRU cache of replies and their speech, keyed by normalized question.
+
+        Changes are persisted by a background writer, at most once per flush_delay, so writes never
+        happen on the threads that answer.
+
+        Args:
+            path (str): The folder to persist the cache in. None keeps it in memory only.
+            max_entries (int): The number of entries kept. The least recently used entry is evicted first.
+            ttl_seconds (float): Entries older than this are treated as missing.
+            similarity_threshold (float): Cosine similarity above which a different question counts as a hit. 0 disables it.
+            embedder (callable): Returns an embedding vector for a string. Required for similarity lookup.
+            flush_delay (float): Seconds the writer waits after a change, so a burst of changes is written once.
+            min_words (int): Questions this long are answered from the cache in the middle of a conversation.
+                Shorter ones, such as "yes", depend on what was said before and only use the cache
+                at the start of a conversation.
+        """
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.similarity_threshold = float(similarity_threshold)
+        self.embedder = embedder if self.similarity_threshold > 0 else None
+        self.entries = collections.OrderedDict()
+        self.audio_index = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.flush_delay = float(flush_delay)
+        self.min_words = int(min_words)
+        self.dirty = threading.Event()
+        self.closed = False
+        self.writer = None
+        self.hits = 0
+        self.misses = 0
+        metrics.register_gauge("cache.response", lambda: {"hits": self.hits, "misses": self.misses})
+
+        self.archive = None
+        if self.path:
+            os.makedirs(os.path.join(self.path, "audio"), exist_ok=True)
+            self.archive = AudioArchive(os.path.join(self.path, "audio"))
+            self.load()
+            self.writer = threading.Thread(target=self.run_writer, name="response-cache-writer", daemon=True)
+            self.writer.start()
+
+    def embed(self, question: str) -> np.ndarray:
+        """
+        Embed a question for similarity lookup.
+
+        Args:
+            question (str): The normalized question.
+
+        Returns:
+            np.ndarray: The unit-length embedding, or None if similarity lookup is off.
+        """
+        if not self.embedder:
+            return None
+        vector = np.asarray(self.embedder(question), dtype='float32')
+        return vector / (np.linalg.norm(vector) or 1)
+
+    def get(self, question: str) -> CacheEntry:
+        """
+        Look a question up, first by exact normalized text, then by embedding similarity.
+
+        Args:
+            question (str): The transcript.
+
+        Returns:
+            CacheEntry: The entry, or None on a miss.
+        """
+        key = normalize_transcript(question)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None and self.embedder and self.entries:
+            entry = self.nearest(self.embed(key))
+        with self.lock:
+            if entry and time.time() - entry.created > self.ttl_seconds:
+                self.remove(entry.question)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(entry.question)
+            self.hits += 1
+            return entry
+
+    def nearest(self, embedding: np.ndarray) -> CacheEntry:
+        """
+        Find the entry with the most similar question.
+
+        Args:
+            embedding (np.ndarray): The unit-length embedding of the question.
+
+        Returns:
+            CacheEntry: The closest entry above the similarity threshold, or None.
+        """
+        with self.lock:
+            candidates = [entry for entry in self.entries.values() if entry.embedding is not None]
+        if not candidates:
+            return None
+        similarity = np.stack([entry.embedding for entry in candidates]) @ embedding
+        best = int(np.argmax(similarity))
+        return candidates[best] if similarity[best] >= self.similarity_threshold else None
+
+    def put(self, question: str, reply: str) -> CacheEntry:
+        """
+        Cache a reply.
+
+        Args:
+            question (str): The transcript.
+            reply (str): The text reply.
+
+        Returns:
+            CacheEntry: The new entry.
+        """
+        key = normalize_transcript(question)
+        entry = CacheEntry(key, reply, embedding=self.embed(key))
+        with self.lock:
+            self.remove(key)
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.remove(next(iter(self.entries)))
+        self.dirty.set()
+        return entry
+
+    def add_audio(self, entry: CacheEntry, text: str, audio: AudioBuffer) -> None:
+        """
+        Attach synthesized speech to an entry.
+
+        Args:
+            entry (CacheEntry): The entry whose reply was spoken.
+            text (str): The spoken text, the whole reply or one segment of it.
+            audio (AudioBuffer): The speech.
+        """
+        with self.lock:
+            if self.entries.get(entry.question) is not entry:
+                return
+            entry.audio[text] = audio
+            self.audio_index[text] = audio
+        if self.archive:
+            archived = AudioBuffer(audio.data, audio.sample_rate, audio_file_name(entry.question, text))
+            self.archive.submit(archived)
+        self.dirty.set()
+
+    def get_audio(self, text: str) -> AudioBuffer:
+        """
+        Find cached speech for a text.
+
+        Args:
+            text (str): The text to speak.
+
+        Returns:
+            AudioBuffer: The speech, or None on a miss.
+        """
+        with self.lock:
+            return self.audio_index.get(text)
+
+    def remove(self, key: str) -> None:
+        """
+        Drop an entry and its speech. The caller holds the lock.
+
+        Args:
+            key (str): The normalized question.
+        """
+        entry = self.entries.pop(key, None)
+        if not entry:
+            return
+        for text, audio in entry.audio.items():
+            ## The same text may have been spoken for other entries, their speech takes over the lookup
+            if self.audio_index.get(text) is audio:
+                self.audio_index.pop(text)
+                for other in self.entries.values():
+                    if text in other.audio:
+                        self.audio_index[text] = other.audio[text]
+                        break
+            ## The file is deleted by the archive's writer, after any write of it still queued
+            if self.archive:
+                self.archive.remove(audio_file_name(entry.question, text))
+
+    def run_writer(self) -> None:
+        """
+        Writer loop: persist the index once changes have settled for flush_delay.
+        """
+        while not self.closed:
+            self.dirty.wait()
+            if self.closed:
+                break
+            time.sleep(self.flush_delay)
+            self.dirty.clear()
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Could not save the response cache: {e}")
+
+    def close(self) -> None:
+        """
+        Stop the writer, write any pending changes and the queued speech.
+        """
+        self.closed = True
+        self.dirty.set()
+        if self.writer:
+            self.writer.join()
+            self.save()
+        if self.archive:
+            self.archive.close()
+        metrics.unregister_gauge("cache.response")
+
+    def save(self) -> None:
+        """
+        Write the index to disk, the embeddings to a separate .npy file. The snapshot is taken and written
+        under one lock, so an older snapshot can never replace a newer one, and files are replaced
+        atomically so a crash never leaves half an index.
+        """
+        if not self.path:
+            return
+        index_path = os.path.join(self.path, "index.json")
+        embeddings_path = os.path.join(self.path, "embeddings.npy")
+        with self.save_lock:
+            with self.lock:
+                entries = list(self.entries.values())
+                embeddings = [entry.embedding for entry in entries if entry.embedding is not None]
+                rows = iter(range(len(embeddings)))
+                index = [
+                    {
+                        "question": entry.question,
+                        "reply": entry.reply,
+                        "created": entry.created,
+                        "embedding": next(rows) if entry.embedding is not None else None,
+                        "audio": {text: audio_file_name(entry.question, text) for text in entry.audio},
+                    }
+                    for entry in entries
+                ]
+            if embeddings:
+                with open(embeddings_path + ".tmp", "wb") as file:
+                    np.save(file, np.stack(embeddings))
+                os.replace(embeddings_path + ".tmp", embeddings_path)
+            with open(index_path + ".tmp", "w") as file:
+                json.dump(index, file)
+            os.replace(index_path + ".tmp", index_path)
+
+    def load(self) -> None:
+        """
+        Read the index and the cached speech from disk. Entries whose audio is missing keep only their text.
+        """
+        index_path = os.path.join(self.path, "index.json")
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        embeddings_path = os.path.join(self.path, "embeddings.npy")
+        embeddings = np.load(embeddings_path) if os.path.exists(embeddings_path) else None
+        for item in index:
+            embedding = item.get("embedding")
+            ## A row of embeddings.npy, or the vector itself in indexes written before it existed
+            if isinstance(embedding, int):
+                embedding = embeddings[embedding] if embeddings is not None and embedding < len(embeddings) else None
+            entry = CacheEntry(
+                item["question"], item["reply"], item["created"],
+                np.asarray(embedding, dtype='float32') if embedding is not None else None
+            )
+            for text, file_name in item.get("audio", {}).items():
+                audio_path = os.path.join(self.path, "audio", file_name)
+                if os.path.exists(audio_path):
+                    entry.audio[text] = AudioBuffer.from_file(audio_path)
+                    self.audio_index[text] = entry.audio[text]
+            self.entries[entry.question] = entry
+
+
+class CachedAIHandler(AIHandler):
+    def __init__(self, handler: AIHandler, cache: ResponseCache):
+        """
+        Initialize the CachedAIHandler, which answers repeated questions from a ResponseCache.
+
+        A hit skips both the chat and the speech request. The cache is only used for turns that do not
+        depend on the conversation so far, see context_free, and replies served from it are added to the
+        wrapped handler's conversation history like any other.
+
+        Args:
+            handler (AIHandler): The handler to wrap.
+            cache (ResponseCache): The cache.
+        """
+        super().__init__(stream=handler.stream)
+        self.streaming_stt = handler.streaming_stt
+        self.speculative_response = handler.speculative_response
+        self.speculation_stable_ms = handler.speculation_stable_ms
+        self.speculation_limit = handler.speculation_limit
+        self.handler = handler
+        self.cache = cache
+        self.NAME = handler.NAME
+        ## Recently cached replies, and speech synthesized before its reply was cached (streamed replies)
+        self.pending = collections.deque(maxlen=8)
+        self.unclaimed = collections.deque(maxlen=32)
+        ## Speculative replies served from the cache, which are not cached again when accepted
+        self.prepared = collections.deque(maxlen=8)
+
+    def reset(self) -> None:
+        """
+        Forget the wrapped handler's conversation. The cache is kept.
+        """
+        self.handler.reset()
+
+    def context_free(self, question: str) -> bool:
+        """
+        Whether the reply to a question can be cached and served from the cache: at the start of a
+        conversation, or when the question is long enough to stand on its own.
+
+        Args:
+            question (str): The transcript.
+
+        Returns:
+            bool: True if the cache may be used.
+        """
+        return not self.handler.has_history() or len(normalize_transcript(question).split()) >= self.cache.min_words
+
+    def lookup(self, question: str) -> CacheEntry:
+        """
+        Look a question up in the cache, if it is context free. A hit is added to the wrapped handler's history.
+
+        Args:
+            question (str): The transcript.
+
+        Returns:
+            CacheEntry: The entry, or None on a miss or if the cache may not be used.
+        """
+        if not self.context_free(question):
+            return None
+        entry = self.cache.get(question)
+        if entry:
+            self.handler.accept_response(question, Message("assistant", entry.reply, 0))
+        return entry
+
+    def get_response(self, question: str) -> Message:
+        """
+        Get a response, from the cache if possible.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Returns:
+            Message: The response.
+        """
+        cacheable = self.context_free(question)
+        entry = self.lookup(question)
+        if entry is None:
+            reply = self.handler.get_response(question).content
+            if not cacheable:
+                return Message("assistant", reply, 0)
+            entry = self.cache.put(question, reply)
+            self.claim(entry)
+        return Message("assistant", entry.reply, 0)
+
+    def prepare_response(self, question: str, cancelled: threading.Event = None) -> Message:
+        """
+        Get a speculative response, from the cache if possible.
+
+        Args:
+            question (str): The question to ask the AI.
+            cancelled (threading.Event): Set when the response is no longer wanted.
+
+        Returns:
+            Message: The response, or None if it was cancelled.
+        """
+        entry = self.cache.get(question) if self.context_free(question) else None
+        if entry is None:
+            return self.handler.prepare_response(question, cancelled)
+        response = Message("assistant", entry.reply, 0)
+        self.prepared.append(response)
+        return response
+
+    def history_version(self) -> int:
+        """
+        The version of the wrapped handler's conversation history.
+
+        Returns:
+            int: The version.
+        """
+        return self.handler.history_version()
+
+    def has_history(self) -> bool:
+        """
+        Whether the wrapped handler's conversation has begun.
+
+        Returns:
+            bool: True if there is history.
+        """
+        return self.handler.has_history()
+
+    def accept_response(self, question: str, response: Message) -> None:
+        """
+        Commit a speculative response. One from the wrapped handler is also cached, if it is context free.
+
+        Args:
+            question (str): The question.
+            response (Message): The response.
+        """
+        cached = any(response is prepared for prepared in self.prepared)
+        cacheable = not cached and self.context_free(question)
+        self.handler.accept_response(question, response)
+        if cacheable:
+            self.claim(self.cache.put(question, response.content))
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        """
+        Stream a response. A hit yields the whole cached reply at once.
+
+        Args:
+            question (str): The question to ask the AI.
+
+        Yields:
+            str: The response text.
+        """
+        cacheable = self.context_free(question)
+        entry = self.lookup(question)
+        if entry:
+            yield entry.reply
+            return
+        content = []
+        for delta in self.handler.stream_response(question):
+            content.append(delta)
+            yield delta
+        if cacheable:
+            self.claim(self.cache.put(question, "".join(content)))
+
+    def claim(self, entry: CacheEntry) -> None:
+        """
+        Attach speech that was synthesized before its reply was cached, and wait for the rest.
+
+        Args:
+            entry (CacheEntry): The newly cached reply.
+        """
+        for text, audio in list(self.unclaimed):
+            if text in entry.reply:
+                self.cache.add_audio(entry, text, audio)
+        self.pending.append(entry)
+
+    def transcribe_audio_file(self, path: str) -> str:
+        """
+        Transcribe an audio file with the wrapped handler.
+
+        Args:
+            path (str): The path to the audio file.
+
+        Returns:
+            str: The transcription of the audio file.
+        """
+        return self.handler.transcribe_audio_file(path)
+
+    def transcribe_audio(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe audio held in memory with the wrapped handler.
+
+        Args:
+            audio (AudioBuffer): The audio to transcribe.
+
+        Returns:
+            str: The transcription of the audio.
+        """
+        return self.handler.transcribe_audio(audio)
+
+    def open_transcription(self, sample_rate: int, on_partial: callable = None) -> TranscriptionStream:
+        """
+        Start a streaming transcription with the wrapped handler.
+
+        Args:
+            sample_rate (int): The sample rate of the recording.
+            on_partial (callable): Called with each partial transcript.
+
+        Returns:
+            TranscriptionStream: The stream.
+        """
+        return self.handler.open_transcription(sample_rate, on_partial)
+
+    def text_to_speech(self, text: str, file_path: str) -> None:
+        """
+        Convert text to speech and save it, using cached speech if there is any.
+
+        Args:
+            text (str): The text to convert to speech.
+            file_path (str): The path to save the speech file.
+        """
+        self.synthesize_speech(text).save(file_path)
+
+    def synthesize_speech(self, text: str) -> AudioBuffer:
+        """
+        Convert text to speech, from the cache if possible. New speech is attached to the reply it belongs to.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Returns:
+            AudioBuffer: The speech.
+        """
+        audio = self.cache.get_audio(text)
+        if audio:
+            return AudioBuffer(audio.data, audio.sample_rate)
+        audio = self.handler.synthesize_speech(text)
+        self.store_audio(text, audio)
+        return audio
+
+    def stream_speech(self, text: str) -> Iterator[AudioBuffer]:
+        """
+        Convert text to speech in chunks, from the cache if possible. New speech is attached to the
+        reply it belongs to once every chunk has arrived.
+
+        Args:
+            text (str): The text to convert to speech.
+
+        Yields:
+            AudioBuffer: The next chunk of speech.
+        """
+        audio = self.cache.get_audio(text)
+        if audio:
+            yield AudioBuffer(audio.data, audio.sample_rate)
+            return
+        chunks = []
+        for chunk in self.handler.stream_speech(text):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            self.store_audio(text, AudioBuffer(np.concatenate([chunk.data for chunk in chunks]), chunks[0].sample_rate))
+
+    def store_audio(self, text: str, audio: AudioBuffer) -> None:
+        """
+        Attach new speech to the pending reply that contains its text, or keep it until that reply is stored.
+
+        Args:
+            text (str): The spoken text.
+            audio (AudioBuffer): The speech.
+        """
+        for entry in reversed(list(self.pending)):
+            if text in entry.reply:
+                self.cache.add_audio(entry, text, audio)
+                break
+        else:
+            self.unclaimed.append((text, audio))
@@ -0,0 +1,197 @@
+import collections
+import threading
+from typing import Dict, List
+
+
+## Tokens added per message for the role and separators in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    def __init__(self, model: str = "gpt-4o"):
+        """
+        Initialize the TokenCounter.
+
+        Uses tiktoken when it is installed, otherwise estimates about four characters per token.
+
+        Args:
+            model (str): The chat model, used to pick the tiktoken encoding.
+        """
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            pass
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a string.
+
+        Args:
+            text (str): The text to count.
+
+        Returns:
+            int: The number of tokens.
+        """
+        if self.encoding:
+            return len(self.encoding.encode(text))
+        return (len(text) + 3) // 4
+
+
+class Message:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str, tokens: int):
+        """
+        Initialize a Message, one compact entry of the conversation.
+
+        Args:
+            role (str): "system", "user" or "assistant".
+            content (str): The message text.
+            tokens (int): The token cost of the message, counted once when it is added.
+        """
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Convert the message for the chat completions API.
+
+        Returns:
+            Dict[str, str]: The message in the chat completions format.
+        """
+        return {"role": self.role, "content": self.content}
+
+
+class ConversationMemory:
+    def __init__(self, system_message: str, token_budget: int = 3000, summarizer: callable = None, model: str = "gpt-4o"):
+        """
+        Initialize the ConversationMemory, a sliding window over the conversation that fits a token budget.
+
+        The system message is always kept. When the budget is exceeded the oldest messages are evicted,
+        down to three quarters of the budget so eviction does not happen on every turn. If a summarizer is
+        given, evicted messages are folded into a running summary that is sent after the system message.
+        The memory is shared by the pipeline stages and speculative requests, so every method takes its lock.
+
+        Args:
+            system_message (str): The system message for the AI.
+            token_budget (int): The maximum number of prompt tokens the history may use.
+            summarizer (callable): Called with the previous summary and the evicted messages (as dicts). Returns the new summary.
+            model (str): The chat model, used for token counting.
+        """
+        self.counter = TokenCounter(model)
+        self.token_budget = int(token_budget)
+        self.summarizer = summarizer
+        self.system = self.create_message("system", system_message)
+        self.summary = None
+        self.summary_text = ""
+        self.history = collections.deque()
+        self.tokens = 0
+        ## Bumped on every change, so a request built from an older history can be recognized
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def create_message(self, role: str, content: str) -> Message:
+        """
+        Create a message and count its tokens.
+
+        Args:
+            role (str): The message role.
+            content (str): The message text.
+
+        Returns:
+            Message: The message.
+        """
+        return Message(role, content or "", self.counter.count(content or "") + MESSAGE_OVERHEAD_TOKENS)
+
+    def add(self, role: str, content: str) -> None:
+        """
+        Add a message to the conversation, evicting old messages if the budget is exceeded.
+
+        Args:
+            role (str): "user" or "assistant".
+            content (str): The message text.
+        """
+        message = self.create_message(role, content)
+        with self.lock:
+            self.history.append(message)
+            self.tokens += message.tokens
+            self.version += 1
+            if self.total_tokens > self.token_budget:
+                self.evict(int(self.token_budget * 0.75))
+
+    def add_exchange(self, question: str, reply: str) -> None:
+        """
+        Add a question and its reply together, so no other message lands between them.
+
+        Args:
+            question (str): The user message.
+            reply (str): The assistant message.
+        """
+        with self.lock:
+            self.add("user", question)
+            self.add("assistant", reply)
+
+    @property
+    def total_tokens(self) -> int:
+        """
+        The token cost of everything messages() returns.
+        """
+        summary_tokens = self.summary.tokens if self.summary else 0
+        return self.system.tokens + summary_tokens + self.tokens
+
+    def evict(self, target: int) -> None:
+        """
+        Drop the oldest messages until the conversation fits target. The newest message is always kept.
+        The caller holds the lock.
+
+        Args:
+            target (int): The token count to shrink to.
+        """
+        evicted = []
+        while len(self.history) > 1 and self.total_tokens > target:
+            message = self.history.popleft()
+            self.tokens -= message.tokens
+            evicted.append(message)
+        ## Never start the window on an assistant reply without its question
+        while len(self.history) > 1 and self.history[0].role == "assistant":
+            message = self.history.popleft()
+            self.tokens -= message.tokens
+            evicted.append(message)
+
+        if evicted and self.summarizer:
+            try:
+                self.summary_text = self.summarizer(self.summary_text, [message.to_dict() for message in evicted])
+                self.summary = self.create_message("system", f"Summary of the earlier conversation: {self.summary_text}")
+            except Exception as e:
+                print(f"Could not summarize the conversation: {e}")
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        Build the request history: the system message, the summary if there is one, then the window.
+
+        Returns:
+            List[Dict[str, str]]: The messages to send, in the chat completions format.
+        """
+        with self.lock:
+            messages = [self.system.to_dict()]
+            if self.summary:
+                messages.append(self.summary.to_dict())
+            messages.extend(message.to_dict() for message in self.history)
+        return messages
+
+    def clear(self) -> None:
+        """
+        Forget the conversation, keeping the system message.
+        """
+        with self.lock:
+            self.summary = None
+            self.summary_text = ""
+            self.history.clear()
+            self.tokens = 0
+            self.version += 1
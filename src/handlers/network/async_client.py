@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import httpx
+
+from handlers.network.delivery import DeliveryMetrics
+from handlers.network.streaming import frame_bytes, iter_frames
+
+
+class AsyncRestClient:
+    def __init__(self, endpoint: str, base_url: str, instance_name: str, pool_size: int = 4, connect_timeout: float = 3.05,
+                 read_timeout: float = 30, retries: int = 3, stream_endpoint: str = "stream_audio",
+                 stream_chunk_ms: int = 100, **kwargs):
+        """
+        Initialize the AsyncRestClient, the asyncio counterpart of RestClient. It takes the same network config.
+
+        Requests share one pooled httpx.AsyncClient. Only connection failures are retried, so a POST that
+        may already have started playback is never sent twice. Create and close it on the event loop
+        that uses it.
+
+        Args:
+            endpoint (str): The endpoint to send to.
+            base_url (str): The base URL of the REST API.
+            instance_name (str): The Audio2Face player instance to drive.
+            pool_size (int): The number of connections kept open.
+            connect_timeout (float): Seconds to wait for a connection.
+            read_timeout (float): Seconds to wait for the response.
+            retries (int): The maximum number of retries on connection failures.
+            stream_endpoint (str): The endpoint that takes streamed PCM uploads.
+            stream_chunk_ms (int): The length of the chunks a clip is uploaded in.
+        """
+        self.instance_name = instance_name
+        self.url = base_url.rstrip("/") + "/" + endpoint.lstrip("/")
+        self.stream_url = base_url.rstrip("/") + "/" + stream_endpoint.lstrip("/")
+        self.stream_chunk_ms = int(stream_chunk_ms)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=int(pool_size), max_keepalive_connections=int(pool_size)),
+            timeout=httpx.Timeout(float(read_timeout), connect=float(connect_timeout)),
+            transport=httpx.AsyncHTTPTransport(retries=int(retries)),
+        )
+
+    async def __aenter__(self):
+        """
+        Use the client as an async context manager that closes it on exit.
+        """
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        """
+        Close the client when the context exits.
+        """
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled connections.
+        """
+        await self.client.aclose()
+
+    async def send_text(self, text: str):
+        """
+        Send a string to the specified endpoint.
+
+        Args:
+            text (str): The string to send.
+
+        Returns:
+            Response: The HTTP response from the server, or None on error.
+        """
+        data = {'path': text, 'instance_name': self.instance_name}
+        try:
+            response = await self.client.post(self.url, json=data)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    async def send_audio(self, audio):
+        """
+        Upload a clip held in memory as chunked 16 bit PCM, without copying its samples.
+
+        Args:
+            audio (AudioBuffer): The clip.
+
+        Returns:
+            Response: The HTTP response from the server, or None on error.
+        """
+        size = frame_bytes(audio.sample_rate, audio.channels, self.stream_chunk_ms)
+
+        async def chunks():
+            for frame in iter_frames(audio.pcm16(), size):
+                yield frame
+
+        params = {'instance_name': self.instance_name, 'sample_rate': audio.sample_rate, 'channels': audio.channels}
+        try:
+            response = await self.client.post(
+                self.stream_url, params=params, content=chunks(),
+                headers={'Content-Type': 'application/octet-stream'}
+            )
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            print(f"An error occurred: {e}")
+            return None
+
+
+class AsyncDelivery:
+    def __init__(self, config: dict, save: callable, on_metrics: callable = None):
+        """
+        Initialize the AsyncDelivery, the callback the async live loop hands each voice response to.
+
+        The loop's delivery stage awaits one response at a time from a bounded queue, so ordering and
+        backpressure match DeliveryQueue with the "block" policy. The client is created on first use,
+        on the loop that runs the deliveries.
+
+        Args:
+            config (dict): The network configuration.
+            save (callable): Called with a clip without a path, returns the path it was saved to. Used in path mode.
+            on_metrics (callable): Called with a DeliveryMetrics snapshot after each delivery.
+        """
+        self.config = config
+        self.save = save
+        self.on_metrics = on_metrics
+        self.metrics = DeliveryMetrics()
+        self.client = None
+
+    async def __call__(self, audio, turn_id: int = None):
+        """
+        Send a voice response.
+
+        Args:
+            audio (AudioBuffer): The voice response.
+            turn_id (int): The turn the response belongs to.
+
+        Returns:
+            Response: The HTTP response, or None if sending failed.
+        """
+        if self.client is None:
+            self.client = AsyncRestClient(**self.config)
+        start = time.monotonic()
+        if self.config.get("upload_mode", "path") == "stream":
+            response = await self.client.send_audio(audio)
+        else:
+            ## Writing the clip is blocking file IO, kept off the event loop
+            path = audio.path or await asyncio.to_thread(self.save, audio)
+            response = await self.client.send_text(path)
+        self.metrics.record((time.monotonic() - start) * 1000, response is not None)
+        if self.on_metrics:
+            self.on_metrics(self.metrics.snapshot())
+        return response
+
+    async def aclose(self) -> None:
+        """
+        Close the client, if it was created.
+        """
+        if self.client:
+            await self.client.aclose()
+            self.client = None
@@ -1,7 +1,9 @@
 import requests
-import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from config import Config
+from handlers.network.streaming import frame_bytes, iter_frames
 
 class NetworkConfig(Config):
     NAME = "NETWORK_CONFIG"
@@ -26,38 +28,108 @@ class NetworkConfig(Config):
         pass
 
 
+def create_session(pool_size: int = 4, retries: int = 3, backoff: float = 0.3) -> requests.Session:
+    """
+    Create a session with a keep-alive connection pool and retries.
+
+    Connection failures are retried for every method, because the request never reached the server.
+    Read failures and 502/503/504 responses are only retried for idempotent methods, so a POST that
+    may already have started playback is never sent twice.
+
+    Args:
+        pool_size (int): The number of connections kept open per host.
+        retries (int): The maximum number of retries.
+        backoff (float): The exponential backoff factor, in seconds.
+
+    Returns:
+        requests.Session: The session.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 ##This class can be further implemented to send audio files over to another computer doing the audio calculations. For now, we will be sending file location locally
 class RestClient:
-    def __init__(self, endpoint:str, base_url: str, instance_name: str, **kwargs):
+    def __init__(self, endpoint:str, base_url: str, instance_name: str, pool_size: int = 4, connect_timeout: float = 3.05,
+                 read_timeout: float = 30, retries: int = 3, retry_backoff: float = 0.3, session: requests.Session = None,
+                 stream_endpoint: str = "stream_audio", stream_chunk_ms: int = 100, **kwargs):
         """
         Initialize the RestClient with the base URL of the REST API.
 
+        Requests share one pooled session, so consecutive messages reuse the same connection.
+
         Args:
+            endpoint (str): The endpoint to send to.
             base_url (str): The base URL of the REST API.
+            instance_name (str): The Audio2Face player instance to drive.
+            pool_size (int): The number of connections kept open.
+            connect_timeout (float): Seconds to wait for a connection.
+            read_timeout (float): Seconds to wait for the response. The server answers after playback is queued or done.
+            retries (int): The maximum number of retries on connection failures.
+            retry_backoff (float): The exponential backoff factor between retries, in seconds.
+            session (requests.Session): A session to share with other clients. One is created if not given.
+            stream_endpoint (str): The endpoint that takes streamed PCM uploads.
+            stream_chunk_ms (int): The length of the chunks a clip is uploaded in.
         """
         self.endpoint = endpoint
         self.base_url = base_url
         self.instance_name = instance_name
+        self.url = base_url.rstrip("/") + "/" + endpoint.lstrip("/")
+        self.stream_url = base_url.rstrip("/") + "/" + stream_endpoint.lstrip("/")
+        self.stream_chunk_ms = int(stream_chunk_ms)
+        self.timeout = (float(connect_timeout), float(read_timeout))
+        self.owns_session = session is None
+        self.session = session or create_session(int(pool_size), int(retries), float(retry_backoff))
+
+    def __enter__(self):
+        """
+        Use the client as a context manager that closes it on exit.
+        """
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        Close the client when the context exits.
+        """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the pooled connections, unless the session is shared.
+        """
+        if self.owns_session:
+            self.session.close()
 
     def send_audio_file(self, file_path: str):
         """
         Send an audio file to the specified endpoint.
 
         Args:
-            endpoint (str): The endpoint to send the audio file to.
             file_path (str): The path to the audio file.
         
         Returns:
             Response: The HTTP response from the server.
         """
-        url = str(os.path.join(self.base_url, self.endpoint))
-        print(url)
-        files = {'file': open(file_path, 'rb')}
+        print(self.url)
         try:
-            response = requests.post(url, files=files)
+            with open(file_path, 'rb') as file:
+                response = self.session.post(self.url, files={'file': file}, timeout=self.timeout)
             response.raise_for_status()  # Raise an error for bad status codes
             return response
-        except requests.exceptions.RequestException as e:
+        except (OSError, requests.exceptions.RequestException) as e:
             print(f"An error occurred: {e}")
             return None
         
@@ -66,24 +138,88 @@ class RestClient:
         Send a string to the specified endpoint.
 
         Args:
-            endpoint (str): The endpoint to send the string to.
             text (str): The string to send.
         
         Returns:
             Response: The HTTP response from the server.
         """
-        url = self.base_url + "/" + self.endpoint
-        
         data = {'path': text, 'instance_name': self.instance_name}
-        print(url)
+        print(self.url)
         try:
-            response = requests.post(url, json=data)
+            response = self.session.post(self.url, json=data, timeout=self.timeout)
             response.raise_for_status()  # Raise an error for bad status codes
             return response
         except requests.exceptions.RequestException as e:
             print(f"An error occurred: {e}")
             return None
 
+    def stream_audio(self, chunks, sample_rate: int, channels: int = 1):
+        """
+        Upload raw 16 bit PCM with chunked transfer encoding. The server starts playback with the first chunk,
+        so this can be fed while the audio is still being produced, for example from a ChunkStream.
+
+        Args:
+            chunks: An iterable of bytes-like objects (bytes, memoryview) holding interleaved little-endian samples.
+            sample_rate (int): The sample rate.
+            channels (int): The number of interleaved channels.
+
+        Returns:
+            Response: The HTTP response from the server.
+        """
+        params = {'instance_name': self.instance_name, 'sample_rate': int(sample_rate), 'channels': int(channels)}
+        try:
+            response = self.session.post(
+                self.stream_url, params=params, data=iter(chunks),
+                headers={'Content-Type': 'application/octet-stream'}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def send_audio(self, audio):
+        """
+        Upload a clip held in memory, so the server does not need to share a filesystem with the client.
+
+        The clip is sent as slices of its own sample buffer, without copying it.
+
+        Args:
+            audio (AudioBuffer): The clip.
+
+        Returns:
+            Response: The HTTP response from the server.
+        """
+        size = frame_bytes(audio.sample_rate, audio.channels, self.stream_chunk_ms)
+        return self.stream_audio(iter_frames(audio.pcm16(), size), audio.sample_rate, audio.channels)
+
+    def send_speech(self, speech):
+        """
+        Upload a voice response while it is still being synthesized. The first chunk sets the sample rate
+        and channel count of the upload, and every chunk is sent as slices of its own sample buffer.
+
+        Args:
+            speech (SpeechStream): The voice response. It is closed once the upload ends, even if it failed.
+
+        Returns:
+            Response: The HTTP response from the server, or None if nothing was synthesized or sending failed.
+        """
+        try:
+            chunks = iter(speech)
+            first = next(chunks, None)
+            if first is None:
+                return None
+            size = frame_bytes(first.sample_rate, first.channels, self.stream_chunk_ms)
+
+            def frames():
+                yield from iter_frames(first.pcm16(), size)
+                for chunk in chunks:
+                    yield from iter_frames(chunk.pcm16(), size)
+
+            return self.stream_audio(frames(), first.sample_rate, first.channels)
+        finally:
+            speech.close()
+
 
 # if __name__ == "__main__":
 #     # Example usage
@@ -0,0 +1,181 @@
+import collections
+import threading
+import time
+
+
+class DeliveryMetrics:
+    def __init__(self):
+        """
+        Initialize the DeliveryMetrics, counters for one delivery queue.
+        """
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.queue_depth = 0
+        self.last_latency_ms = 0.0
+        self.mean_latency_ms = 0.0
+
+    def record(self, latency_ms: float, success: bool) -> None:
+        """
+        Record a finished delivery.
+
+        Args:
+            latency_ms (float): Milliseconds from submit to the end of the send.
+            success (bool): Whether the send succeeded.
+        """
+        if success:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self.last_latency_ms = latency_ms
+        ## Exponential moving average, so the UI shows recent behaviour
+        self.mean_latency_ms = latency_ms if self.sent + self.failed == 1 else 0.8 * self.mean_latency_ms + 0.2 * latency_ms
+
+    def snapshot(self) -> dict:
+        """
+        Copy the counters.
+
+        Returns:
+            dict: The counters by name.
+        """
+        return dict(vars(self))
+
+
+class DeliveryQueue:
+    ## What submit does when the queue is full
+    POLICIES = ("block", "drop_newest", "drop_oldest", "coalesce")
+
+    def __init__(self, send: callable, max_queue_size: int = 8, policy: str = "block", on_metrics: callable = None,
+                 on_drop: callable = None):
+        """
+        Initialize the DeliveryQueue, which sends items in order on a background worker.
+
+        When the queue is full, the policy decides:
+            block: wait for space, so the producer slows down and nothing is lost.
+            drop_newest: discard the new item.
+            drop_oldest: discard the oldest queued item.
+            coalesce: discard every queued item from older groups (turns), so the endpoint catches up
+                to the newest turn without cutting a turn short.
+
+        Args:
+            send (callable): Sends one item. Returning None or raising counts as a failure.
+            max_queue_size (int): The number of items that may wait.
+            policy (str): One of POLICIES.
+            on_metrics (callable): Called with a metrics snapshot whenever the metrics change.
+            on_drop (callable): Called with every item that is dropped instead of sent, for example to release it.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {self.POLICIES}")
+        self.send = send
+        self.max_queue_size = int(max_queue_size)
+        self.policy = policy
+        self.on_metrics = on_metrics
+        self.on_drop = on_drop
+        self.metrics = DeliveryMetrics()
+        self.items = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="delivery", daemon=True)
+        self.thread.start()
+
+    def submit(self, item, group=None) -> bool:
+        """
+        Queue an item for delivery.
+
+        Args:
+            item: The item to send.
+            group: The group the item belongs to, for the coalesce policy. Usually the turn id.
+
+        Returns:
+            bool: False if the item was dropped.
+        """
+        dropped = []
+        accepted = True
+        with self.condition:
+            if len(self.items) >= self.max_queue_size:
+                if self.policy == "block":
+                    self.condition.wait_for(lambda: len(self.items) < self.max_queue_size or self.closed)
+                elif self.policy == "drop_newest":
+                    accepted = False
+                elif self.policy == "drop_oldest":
+                    dropped.append(self.items.popleft()[0])
+                    self.metrics.dropped += 1
+                elif self.policy == "coalesce":
+                    kept = [queued for queued in self.items if queued[1] == group]
+                    dropped.extend(queued[0] for queued in self.items if queued[1] != group)
+                    ## Everything queued is from this group: fall back to dropping its oldest item
+                    if len(kept) >= self.max_queue_size:
+                        dropped.append(kept.pop(0)[0])
+                    self.metrics.dropped += len(self.items) - len(kept)
+                    self.items = collections.deque(kept)
+            if self.closed:
+                accepted = False
+            if accepted:
+                self.items.append((item, group, time.monotonic()))
+                self.metrics.queue_depth = len(self.items)
+                self.condition.notify_all()
+            else:
+                ## A rejected item counts as dropped unless it was refused because the queue is closed
+                if not self.closed:
+                    self.metrics.dropped += 1
+                dropped.append(item)
+        self.release(dropped)
+        self.publish()
+        return accepted
+
+    def run(self) -> None:
+        """
+        Worker loop that sends items one at a time, in submit order.
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.items or self.closed)
+                if not self.items:
+                    break
+                item, _, submitted = self.items.popleft()
+                self.metrics.queue_depth = len(self.items)
+                self.condition.notify_all()
+            try:
+                success = self.send(item) is not None
+            except Exception as e:
+                print(f"Delivery failed: {e}")
+                success = False
+            self.metrics.record((time.monotonic() - submitted) * 1000, success)
+            self.publish()
+
+    def release(self, items: list) -> None:
+        """
+        Hand dropped items to on_drop, outside the lock.
+
+        Args:
+            items (list): The dropped items.
+        """
+        if self.on_drop:
+            for item in items:
+                self.on_drop(item)
+
+    def publish(self) -> None:
+        """
+        Report the metrics, if anyone is listening.
+        """
+        if self.on_metrics:
+            self.on_metrics(self.metrics.snapshot())
+
+    def close(self, drain: bool = True, timeout: float = None) -> None:
+        """
+        Stop the worker.
+
+        Args:
+            drain (bool): If True, send the items already queued first. Otherwise drop them.
+            timeout (float): The maximum time to wait for the worker.
+        """
+        dropped = []
+        with self.condition:
+            if not drain:
+                self.metrics.dropped += len(self.items)
+                dropped = [queued[0] for queued in self.items]
+                self.items.clear()
+            self.closed = True
+            self.condition.notify_all()
+        self.release(dropped)
+        self.thread.join(timeout)
@@ -0,0 +1,450 @@
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+
+
+## Where the Audio2Face player extension keeps its streaming client and gRPC stubs
+A2F_SCRIPTS_PATH = os.path.join(
+    os.getenv('APPDATA', ''),
+    "../Local/ov/pkg/audio2face-2023.2.0/exts/omni.audio2face.player/omni/audio2face/player/scripts/streaming_server"
+)
+
+
+def read_mono(path: str):
+    """
+    Read an audio file as mono float32, the format Audio2Face streams.
+
+    Args:
+        path (str): The path to the audio file.
+
+    Returns:
+        tuple: The samples and the sample rate.
+    """
+    data, sample_rate = sf.read(path, dtype="float32")
+    if data.ndim > 1:
+        data = np.average(data, axis=1)
+    return data, sample_rate
+
+
+class AudioPlayer:
+    def play_file(self, path: str, instance_name: str) -> bool:
+        """
+        Play an audio file on a player instance.
+
+        Args:
+            path (str): The path to the audio file.
+            instance_name (str): The player instance, for example /World/audio2face/PlayerStreaming.
+
+        Returns:
+            bool: Whether playback succeeded.
+        """
+        data, sample_rate = read_mono(path)
+        return self.play(data, sample_rate, instance_name)
+
+    def play(self, data: np.ndarray, sample_rate: int, instance_name: str) -> bool:
+        """
+        Play mono float32 samples on a player instance.
+
+        Args:
+            data (np.ndarray): The samples.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Whether playback succeeded.
+        """
+        raise NotImplementedError("Subclasses should implement this method")
+
+    def play_stream(self, chunks, sample_rate: int, instance_name: str) -> bool:
+        """
+        Play mono float32 samples as they arrive. Players that cannot stream collect the chunks first.
+
+        Args:
+            chunks: An iterable of mono float32 sample arrays.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Whether playback succeeded.
+        """
+        data = np.concatenate(list(chunks) or [np.zeros(0, dtype=np.float32)])
+        return self.play(data, sample_rate, instance_name)
+
+    def close(self) -> None:
+        """
+        Release any resources held by the player.
+        """
+        pass
+
+
+class Audio2FacePlayer(AudioPlayer):
+    def __init__(self, url: str = "localhost:50051", scripts_path: str = A2F_SCRIPTS_PATH, chunk_ms: int = 100,
+                 block_until_finished: bool = True):
+        """
+        Initialize the Audio2FacePlayer, which streams audio to the Audio2Face gRPC server.
+
+        The gRPC stubs are imported and the channel is opened once, on first use, and reused for every clip.
+
+        Args:
+            url (str): The address of the Audio2Face streaming server.
+            scripts_path (str): The folder holding audio2face_pb2.py and audio2face_pb2_grpc.py.
+            chunk_ms (int): The length of each streamed chunk.
+            block_until_finished (bool): Whether play returns only after Audio2Face finished playing.
+        """
+        self.url = url
+        self.scripts_path = scripts_path
+        self.chunk_ms = int(chunk_ms)
+        self.block_until_finished = block_until_finished
+        self.channel = None
+        self.stub = None
+        self.pb2 = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> None:
+        """
+        Import the gRPC stubs and open the channel, if that has not happened yet.
+        """
+        with self.lock:
+            if self.stub:
+                return
+            import grpc
+            if self.scripts_path not in sys.path:
+                sys.path.append(self.scripts_path)
+            import audio2face_pb2
+            import audio2face_pb2_grpc
+
+            self.pb2 = audio2face_pb2
+            self.channel = grpc.insecure_channel(self.url)
+            self.stub = audio2face_pb2_grpc.Audio2FaceStub(self.channel)
+
+    def requests(self, chunks, sample_rate: int, instance_name: str):
+        """
+        Build the streaming request: a start marker, then the audio chunks.
+
+        Args:
+            chunks: An iterable of mono float32 sample arrays.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Yields:
+            PushAudioStreamRequest: The messages of the stream.
+        """
+        start_marker = self.pb2.PushAudioRequestStart(
+            samplerate=sample_rate,
+            instance_name=instance_name,
+            block_until_playback_is_finished=self.block_until_finished,
+        )
+        yield self.pb2.PushAudioStreamRequest(start_marker=start_marker)
+        for chunk in chunks:
+            yield self.pb2.PushAudioStreamRequest(audio_data=np.ascontiguousarray(chunk, dtype=np.float32).tobytes())
+
+    def play(self, data: np.ndarray, sample_rate: int, instance_name: str) -> bool:
+        """
+        Stream samples to Audio2Face.
+
+        Args:
+            data (np.ndarray): The samples.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Whether Audio2Face reported success.
+        """
+        chunk_size = max(1, int(sample_rate * self.chunk_ms / 1000))
+        chunks = (data[index:index + chunk_size] for index in range(0, len(data), chunk_size))
+        return self.play_stream(chunks, sample_rate, instance_name)
+
+    def play_stream(self, chunks, sample_rate: int, instance_name: str) -> bool:
+        """
+        Stream samples to Audio2Face as they arrive, so playback starts with the first chunk.
+
+        Args:
+            chunks: An iterable of mono float32 sample arrays.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Whether Audio2Face reported success.
+        """
+        self.connect()
+        response = self.stub.PushAudioStream(self.requests(chunks, sample_rate, instance_name))
+        return response.success
+
+    def close(self) -> None:
+        """
+        Close the gRPC channel.
+        """
+        with self.lock:
+            if self.channel:
+                self.channel.close()
+            self.channel = None
+            self.stub = None
+
+
+class SubprocessPlayer(AudioPlayer):
+    def __init__(self, script_path: str = os.path.join(A2F_SCRIPTS_PATH, "test_client.py")):
+        """
+        Initialize the SubprocessPlayer, the original approach: run the Audio2Face test client once per clip.
+
+        Kept for comparison and as a fallback.
+
+        Args:
+            script_path (str): The path to test_client.py.
+        """
+        self.script_path = script_path
+
+    def play_file(self, path: str, instance_name: str) -> bool:
+        """
+        Run the test client on a file.
+
+        Args:
+            path (str): The path to the audio file.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Whether the client exited successfully.
+        """
+        command = [sys.executable, self.script_path, path, instance_name]
+        return subprocess.run(command).returncode == 0
+
+    def play(self, data: np.ndarray, sample_rate: int, instance_name: str) -> bool:
+        """
+        Write samples to a temporary file and run the test client on it.
+
+        Args:
+            data (np.ndarray): The samples.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Whether the client exited successfully.
+        """
+        descriptor, path = tempfile.mkstemp(suffix=".wav")
+        os.close(descriptor)
+        try:
+            sf.write(path, data, sample_rate)
+            return self.play_file(path, instance_name)
+        finally:
+            os.remove(path)
+
+
+class FakePlayer(AudioPlayer):
+    def __init__(self, speed: float = 0.0):
+        """
+        Initialize the FakePlayer, a local stand-in for Audio2Face in tests and benchmarks.
+
+        Args:
+            speed (float): Playback takes duration * speed seconds. 0 returns as soon as the clip is read.
+        """
+        self.speed = float(speed)
+        self.played = []
+
+    def play(self, data: np.ndarray, sample_rate: int, instance_name: str) -> bool:
+        """
+        Pretend to play samples.
+
+        Args:
+            data (np.ndarray): The samples.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Always True.
+        """
+        time.sleep(len(data) / sample_rate * self.speed)
+        self.played.append((instance_name, len(data), sample_rate))
+        return True
+
+    def play_stream(self, chunks, sample_rate: int, instance_name: str) -> bool:
+        """
+        Pretend to play samples as they arrive.
+
+        Args:
+            chunks: An iterable of mono float32 sample arrays.
+            sample_rate (int): The sample rate.
+            instance_name (str): The player instance.
+
+        Returns:
+            bool: Always True.
+        """
+        frames = 0
+        for chunk in chunks:
+            time.sleep(len(chunk) / sample_rate * self.speed)
+            frames += len(chunk)
+        self.played.append((instance_name, frames, sample_rate))
+        return True
+
+
+class PlaybackJob:
+    def __init__(self, path: str, instance_name: str, chunks=None, sample_rate: int = None):
+        """
+        Initialize a PlaybackJob, one clip waiting to be played, either a file or a stream of chunks.
+
+        Args:
+            path (str): The path to the audio file, or None for a stream.
+            instance_name (str): The player instance.
+            chunks: An iterable of mono float32 sample arrays, for a stream.
+            sample_rate (int): The sample rate of the stream.
+        """
+        self.path = path
+        self.instance_name = instance_name
+        self.chunks = chunks
+        self.sample_rate = sample_rate
+        self.success = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class PlaybackWorker:
+    def __init__(self, player: AudioPlayer, max_queue_size: int = 16):
+        """
+        Initialize the PlaybackWorker, a long-lived thread that plays queued jobs in order with one player.
+
+        Args:
+            player (AudioPlayer): The player.
+            max_queue_size (int): The number of jobs that may wait.
+        """
+        self.player = player
+        self.jobs = queue.Queue(maxsize=max_queue_size)
+        self.thread = threading.Thread(target=self.run, name="playback", daemon=True)
+        self.thread.start()
+
+    def submit(self, path: str, instance_name: str, chunks=None, sample_rate: int = None) -> PlaybackJob:
+        """
+        Queue a clip.
+
+        Args:
+            path (str): The path to the audio file, or None for a stream.
+            instance_name (str): The player instance.
+            chunks: An iterable of mono float32 sample arrays, for a stream. Played as the chunks arrive.
+            sample_rate (int): The sample rate of the stream.
+
+        Returns:
+            PlaybackJob: The job. Wait on job.done to block until it has played.
+
+        Raises:
+            queue.Full: If the queue is full.
+        """
+        job = PlaybackJob(path, instance_name, chunks, sample_rate)
+        self.jobs.put_nowait(job)
+        return job
+
+    def run(self) -> None:
+        """
+        Worker loop.
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                if job.chunks is not None:
+                    job.success = self.player.play_stream(job.chunks, job.sample_rate, job.instance_name)
+                else:
+                    job.success = self.player.play_file(job.path, job.instance_name)
+            except Exception as e:
+                print(f"Playback of {job.path or 'stream'} failed: {e}")
+                job.success = False
+                job.error = str(e)
+            ## Release a producer still waiting to hand over chunks the player never asked for
+            if hasattr(job.chunks, "close"):
+                job.chunks.close()
+            job.done.set()
+
+    def close(self, close_player: bool = True) -> None:
+        """
+        Play the queued jobs, then stop the worker.
+
+        Args:
+            close_player (bool): Also close the player. False when the player is shared.
+        """
+        self.jobs.put(None)
+        self.thread.join()
+        if close_player:
+            self.player.close()
+
+
+class PlaybackRouter:
+    def __init__(self, player: AudioPlayer, max_queue_size: int = 16):
+        """
+        Initialize the PlaybackRouter, which gives every player instance its own PlaybackWorker.
+
+        Clips for one instance play in order, while different instances (avatars) play at the same time.
+        All workers share the player, and so its gRPC channel.
+
+        Args:
+            player (AudioPlayer): The shared player.
+            max_queue_size (int): The number of jobs that may wait per instance.
+        """
+        self.player = player
+        self.max_queue_size = max_queue_size
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    def worker(self, instance_name: str) -> PlaybackWorker:
+        """
+        Find the worker for an instance, starting one the first time the instance is used.
+
+        Args:
+            instance_name (str): The player instance.
+
+        Returns:
+            PlaybackWorker: The worker.
+        """
+        with self.lock:
+            if instance_name not in self.workers:
+                self.workers[instance_name] = PlaybackWorker(self.player, self.max_queue_size)
+            return self.workers[instance_name]
+
+    def submit(self, path: str, instance_name: str, chunks=None, sample_rate: int = None) -> PlaybackJob:
+        """
+        Queue a clip on its instance's worker. Takes the same arguments as PlaybackWorker.submit.
+
+        Returns:
+            PlaybackJob: The job.
+
+        Raises:
+            queue.Full: If the instance's queue is full.
+        """
+        return self.worker(instance_name).submit(path, instance_name, chunks, sample_rate)
+
+    def pending(self) -> dict:
+        """
+        Count the queued jobs.
+
+        Returns:
+            dict: The number of queued jobs per instance.
+        """
+        with self.lock:
+            return {name: worker.jobs.qsize() for name, worker in self.workers.items()}
+
+    def close(self) -> None:
+        """
+        Play the queued jobs, stop every worker and close the player.
+        """
+        with self.lock:
+            workers, self.workers = list(self.workers.values()), {}
+        for worker in workers:
+            worker.close(close_player=False)
+        self.player.close()
+
+
+def create_player(name: str) -> AudioPlayer:
+    """
+    Create a player by name.
+
+    Args:
+        name (str): "audio2face", "subprocess" or "fake".
+
+    Returns:
+        AudioPlayer: The player.
+    """
+    players = {"audio2face": Audio2FacePlayer, "subprocess": SubprocessPlayer, "fake": FakePlayer}
+    return players[name]()
@@ -1,30 +1,98 @@
 import os
+import queue
+
 from flask import Flask, request, jsonify
-import subprocess
 
-app = Flask(__name__)
+from handlers.network.players import AudioPlayer, PlaybackRouter, create_player
+from handlers.network.streaming import ChunkStream, frame_bytes, read_frames, to_float32
 
-# Define the path using %APPDATA%
-appdata_path = os.getenv('APPDATA')
-script_path = os.path.join(appdata_path, "../Local/ov/pkg/audio2face-2023.2.0/exts/omni.audio2face.player/omni/audio2face/player/scripts/streaming_server/test_client.py")
 
+def create_app(player: AudioPlayer, max_queue_size: int = 16, max_stream_chunks: int = 8, chunk_ms: int = 100) -> Flask:
+    """
+    Create the server app. Uploaded clips are queued to a long-lived PlaybackWorker per player instance,
+    so the player (and its gRPC channel) is set up once instead of once per request, and several avatars
+    can play at the same time.
 
+    Args:
+        player (AudioPlayer): The player the workers share.
+        max_queue_size (int): The number of clips that may wait for playback, per instance.
+        max_stream_chunks (int): The number of chunks of a streamed upload buffered ahead of the player.
+        chunk_ms (int): The length of the chunks a streamed upload is cut into.
 
-#I need to further integrate the process into nvidia, for now we are just going to run a subprocess
-@app.route('/upload_audio', methods=['POST'])
-def receive_text():
+    Returns:
+        Flask: The app. app.config['WORKER'] holds the PlaybackRouter.
+    """
+    app = Flask(__name__)
+    worker = PlaybackRouter(player, max_queue_size)
+    app.config['WORKER'] = worker
 
-    data = request.get_json()
-    print(data)
-    try:
-        path = data['path']
-        instance_name = data['instance_name']
-        args = [path, instance_name]
-        command = ['python', script_path] + args
-        subprocess.run(command, check=True)
+    @app.route('/upload_audio', methods=['POST'])
+    def receive_text():
+        """
+        Queue a clip for playback. Answers 202 once queued, or 200 after playback when the body sets "wait".
+        """
+        data = request.get_json()
+        print(data)
+        try:
+            job = worker.submit(data['path'], data['instance_name'])
+        except KeyError as e:
+            return jsonify({'message': f'Missing {e}'}), 400
+        except queue.Full:
+            return jsonify({'message': 'Playback queue is full'}), 503
+        if not data.get('wait'):
+            return jsonify({'message': 'Text received', 'received_text': data}), 202
+        job.done.wait()
+        if not job.success:
+            return jsonify({'message': 'Playback failed', 'error': job.error}), 500
         return jsonify({'message': 'Text received', 'received_text': data}), 200
-    except Exception as e:
-        print(e)
+
+    @app.route('/stream_audio', methods=['POST'])
+    def receive_stream():
+        """
+        Play raw 16 bit PCM while it is uploaded. The body is usually sent with chunked transfer encoding.
+
+        Query parameters: instance_name, sample_rate, channels (default 1) and wait.
+        Answers once the whole body has been read, or after playback when wait is set.
+        """
+        try:
+            instance_name = request.args['instance_name']
+            sample_rate = int(request.args['sample_rate'])
+            channels = int(request.args.get('channels', 1))
+        except (KeyError, ValueError) as e:
+            return jsonify({'message': f'Bad stream parameters: {e}'}), 400
+        chunks = ChunkStream(max_stream_chunks)
+        try:
+            job = worker.submit(None, instance_name, chunks, sample_rate)
+        except queue.Full:
+            return jsonify({'message': 'Playback queue is full'}), 503
+
+        frames = 0
+        for frame in read_frames(request.stream, frame_bytes(sample_rate, channels, chunk_ms)):
+            samples = to_float32(frame, channels)
+            frames += len(samples)
+            if not chunks.put(samples):
+                break
+        chunks.end()
+        received = {'instance_name': instance_name, 'sample_rate': sample_rate, 'frames': frames}
+        if request.args.get('wait') not in ('1', 'true'):
+            return jsonify({'message': 'Audio received', 'received': received}), 202
+        job.done.wait()
+        if not job.success:
+            return jsonify({'message': 'Playback failed', 'error': job.error}), 500
+        return jsonify({'message': 'Audio received', 'received': received}), 200
+
+    @app.route('/health', methods=['GET', 'POST'])
+    def health():
+        """
+        Answer immediately, for liveness checks and client benchmarks.
+        """
+        return jsonify({'status': 'ok', 'queued': worker.pending()}), 200
+
+    return app
+
+
+## A2F_PLAYER picks the backend: "audio2face" (default), "subprocess" (the old per-request client) or "fake"
+app = create_app(create_player(os.getenv('A2F_PLAYER', 'audio2face')))
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
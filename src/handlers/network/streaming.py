@@ -0,0 +1,219 @@
+import queue
+import threading
+from typing import Iterator
+
+import numpy as np
+
+from handlers.audio_buffer import AudioBuffer
+
+
+## Bytes per sample of the 16 bit PCM sent over the wire
+SAMPLE_BYTES = 2
+
+
+def frame_bytes(sample_rate: int, channels: int = 1, chunk_ms: int = 100) -> int:
+    """
+    Size a frame of 16 bit PCM.
+
+    Args:
+        sample_rate (int): The sample rate.
+        channels (int): The number of interleaved channels.
+        chunk_ms (int): The length of a frame.
+
+    Returns:
+        int: The frame size in bytes, a whole number of samples on every channel.
+    """
+    return max(1, int(sample_rate * chunk_ms / 1000)) * channels * SAMPLE_BYTES
+
+
+def iter_frames(view: memoryview, size: int) -> Iterator[memoryview]:
+    """
+    Split a buffer into frames without copying it.
+
+    Args:
+        view (memoryview): The buffer, as bytes.
+        size (int): The frame size in bytes. The last frame may be shorter.
+
+    Yields:
+        memoryview: Slices of the buffer.
+    """
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+def read_frames(stream, size: int) -> Iterator[memoryview]:
+    """
+    Read a byte stream in fixed-size frames through one preallocated buffer.
+
+    The yielded view is overwritten by the next read, so consumers must use or copy it before
+    asking for the next frame.
+
+    Args:
+        stream: A binary file-like object, for example a chunked request body.
+        size (int): The frame size in bytes. The last frame may be shorter.
+
+    Yields:
+        memoryview: The frame.
+    """
+    buffer = memoryview(bytearray(size))
+    readinto = getattr(stream, "readinto", None)
+    filled = 0
+    while True:
+        if readinto:
+            count = readinto(buffer[filled:])
+        else:
+            data = stream.read(size - filled)
+            count = len(data)
+            buffer[filled:filled + count] = data
+        if not count:
+            break
+        filled += count
+        if filled == size:
+            yield buffer
+            filled = 0
+    if filled:
+        yield buffer[:filled]
+
+
+def to_float32(frame: memoryview, channels: int = 1) -> np.ndarray:
+    """
+    Convert a frame of 16 bit PCM to the mono float32 samples Audio2Face plays.
+
+    Args:
+        frame (memoryview): The raw samples. A trailing partial sample is ignored.
+        channels (int): The number of interleaved channels.
+
+    Returns:
+        np.ndarray: The samples, in a new array that does not share the frame's memory.
+    """
+    usable = len(frame) - len(frame) % (channels * SAMPLE_BYTES)
+    data = np.frombuffer(frame[:usable], dtype='<i2')
+    if channels > 1:
+        return data.reshape(-1, channels).mean(axis=1, dtype=np.float32) / 32768
+    return data.astype(np.float32) / 32768
+
+
+class ChunkStream:
+    def __init__(self, max_chunks: int = 8, timeout: float = 10.0):
+        """
+        Initialize the ChunkStream, a bounded hand-off of audio chunks from a producer thread to a consumer.
+
+        A full stream blocks the producer, so a slow consumer slows the upload down instead of buffering it.
+        If either side goes away the other stops instead of waiting forever.
+
+        Args:
+            max_chunks (int): The number of chunks that may wait.
+            timeout (float): Seconds the consumer waits for the next chunk before giving up.
+        """
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.timeout = timeout
+        self.abandoned = False
+
+    def put(self, chunk) -> bool:
+        """
+        Hand a chunk to the consumer, waiting while the stream is full.
+
+        Args:
+            chunk: The chunk. None ends the stream.
+
+        Returns:
+            bool: False if the consumer has stopped reading.
+        """
+        while not self.abandoned:
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def end(self) -> None:
+        """
+        Mark the end of the stream.
+        """
+        self.put(None)
+
+    def close(self) -> None:
+        """
+        Stop the stream from the consumer side. A waiting producer gives up.
+        """
+        self.abandoned = True
+
+    def __iter__(self):
+        """
+        Yield chunks until the stream ends, the producer stalls, or the consumer stops iterating.
+        """
+        try:
+            while True:
+                try:
+                    chunk = self.chunks.get(timeout=self.timeout)
+                except queue.Empty:
+                    print("Audio stream stalled, playing what arrived")
+                    return
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.abandoned = True
+
+
+class SpeechStream:
+    def __init__(self, chunks: Iterator[AudioBuffer], name: str = None, on_complete: callable = None,
+                 max_chunks: int = 8, timeout: float = 10.0):
+        """
+        Initialize the SpeechStream, a voice response that is delivered while it is still being synthesized.
+
+        A producer thread pulls the chunks from the speech handler into a ChunkStream, so at most max_chunks
+        wait for the upload and a slow upload slows synthesis down. Closing the stream, after a failed or
+        dropped delivery, stops the producer.
+
+        Args:
+            chunks (Iterator[AudioBuffer]): The speech, for example from AIHandler.stream_speech.
+            name (str): The file name used when the whole clip is archived.
+            on_complete (callable): Called with the whole clip once every chunk was produced, for example to archive it.
+            max_chunks (int): The number of chunks that may wait for the upload.
+            timeout (float): Seconds the upload waits for the next chunk before giving up.
+        """
+        self.name = name
+        self.path = None
+        self.on_complete = on_complete
+        self.stream = ChunkStream(max_chunks, timeout)
+        self.thread = threading.Thread(target=self.produce, args=(chunks,), name="speech-stream", daemon=True)
+        self.thread.start()
+
+    def produce(self, chunks: Iterator[AudioBuffer]) -> None:
+        """
+        Hand the chunks to the upload until they run out or the stream is closed. Runs on the producer thread.
+
+        Args:
+            chunks (Iterator[AudioBuffer]): The speech.
+        """
+        produced = []
+        try:
+            for chunk in chunks:
+                if not self.stream.put(chunk):
+                    break
+                if self.on_complete:
+                    produced.append(chunk)
+            else:
+                if self.on_complete and produced:
+                    data = np.concatenate([chunk.data for chunk in produced])
+                    self.on_complete(AudioBuffer(data, produced[0].sample_rate, self.name))
+        except Exception as e:
+            print(f"Speech synthesis failed: {e}")
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self.stream.end()
+
+    def close(self) -> None:
+        """
+        Stop the producer. Safe to call more than once, and after the upload has finished.
+        """
+        self.stream.close()
+
+    def __iter__(self) -> Iterator[AudioBuffer]:
+        """
+        Yield the chunks as they are produced. Consumed once, by the upload.
+        """
+        return iter(self.stream)
@@ -0,0 +1,290 @@
+import threading
+import time
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+from handlers.audio_buffer import AudioBuffer
+from handlers.ring_buffer import AudioRingBuffer
+from metrics import metrics
+
+
+## The sounddevice CallbackFlags counted during playback
+STATUS_FLAGS = ("output_overflow", "output_underflow")
+
+
+class Playback:
+    def __init__(self, sample_rate: int, channels: int, buffer_ms: int = 500, device=None, on_finished: callable = None):
+        """
+        Initialize a Playback, one sound played through an output stream as it is produced.
+
+        A producer thread writes blocks with write, which waits while the ring buffer is full, so memory
+        stays at buffer_ms however long the sound is. The output callback copies from the ring buffer
+        without locking or allocating. The stream starts once the buffer is full or the input has ended,
+        and stops by itself when everything written has been played.
+
+        Args:
+            sample_rate (int): The sample rate of the sound.
+            channels (int): The number of channels of the sound.
+            buffer_ms (int): How much audio is buffered ahead of the output.
+            device: The output device, None for the default one.
+            on_finished (callable): Called once playback has finished or was stopped.
+        """
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.ring = AudioRingBuffer(max(1, int(self.sample_rate * int(buffer_ms) / 1000)), self.channels)
+        self.poll_interval = min(0.01, buffer_ms / 4000)
+        self.on_finished = on_finished
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        ## Set by the producer only, read by the callback
+        self.ended = False
+        self.started = False
+        self.lock = threading.Lock()
+        self.stream = self.open_stream(device)
+
+    def open_stream(self, device=None):
+        """
+        Open the output stream that is fed by callback.
+
+        Args:
+            device: The output device, None for the default one.
+
+        Returns:
+            sd.OutputStream: The stream, not started.
+        """
+        return sd.OutputStream(samplerate=self.sample_rate, device=device, channels=self.channels, dtype='float32',
+                               callback=self.callback, finished_callback=self.on_stream_finished)
+
+    def write(self, block: np.ndarray) -> bool:
+        """
+        Queue audio for playback, waiting while the buffer is full. Called by the producer only.
+
+        Args:
+            block (np.ndarray): Float samples shaped (frames, channels), or (frames,) for mono.
+
+        Returns:
+            bool: False if playback was stopped, the producer should give up.
+        """
+        offset = 0
+        while offset < len(block):
+            if self.cancelled.is_set():
+                return False
+            free = self.ring.capacity - self.ring.available
+            if not free:
+                self.start()
+                time.sleep(self.poll_interval)
+                continue
+            offset += self.ring.write(block[offset:offset + free])
+        return not self.cancelled.is_set()
+
+    def end(self) -> None:
+        """
+        Mark the end of the input. What is buffered is still played. Called by the producer only.
+        """
+        self.ended = True
+        self.start()
+
+    def start(self) -> None:
+        """
+        Start the output stream if it is not running yet. If it cannot start, playback is over: it is
+        cancelled, so the producer gives up, and reported finished.
+        """
+        try:
+            with self.lock:
+                if self.started or self.cancelled.is_set():
+                    return
+                self.started = True
+                self.stream.start()
+        except Exception as e:
+            print(f"Could not start playback: {e}")
+            ## The stream never ran, so its finished callback will not report the end
+            self.cancelled.set()
+            self.on_stream_finished()
+
+    def stop(self) -> None:
+        """
+        Stop playback straight away. Safe to call from any thread, and more than once.
+        """
+        self.cancelled.set()
+        with self.lock:
+            started = self.started
+            self.started = True
+        if started:
+            self.stream.abort()
+        else:
+            self.on_stream_finished()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait until playback has finished or was stopped.
+
+        Args:
+            timeout (float): The maximum time to wait. None waits forever.
+
+        Returns:
+            bool: True if playback is over.
+        """
+        return self.finished.wait(timeout)
+
+    def close(self) -> None:
+        """
+        Release the output stream. Called by the producer once playback is over.
+        """
+        self.finished.wait()
+        self.stream.close()
+
+    def callback(self, outdata: np.ndarray, frames: int, time, status) -> None:
+        """
+        Fill one output block from the ring buffer. Called on the audio thread.
+
+        Args:
+            outdata (np.ndarray): The output block, shaped (frames, channels).
+            frames (int): The number of frames.
+            time: The time information.
+            status: The status of the stream.
+        """
+        if status:
+            for flag in STATUS_FLAGS:
+                if getattr(status, flag):
+                    metrics.increment(f"audio.{flag}")
+        if self.cancelled.is_set():
+            outdata.fill(0)
+            raise sd.CallbackStop()
+        copied = 0
+        for view in self.ring.views(frames):
+            outdata[copied:copied + len(view)] = view
+            copied += len(view)
+        self.ring.consume(copied)
+        if copied < frames:
+            outdata[copied:].fill(0)
+            if self.ended:
+                raise sd.CallbackStop()
+            ## The producer fell behind, the gap is heard as silence
+            metrics.increment("audio.playback_underrun")
+
+    def on_stream_finished(self) -> None:
+        """
+        Report the end of playback. Called once, when the stream stops.
+        """
+        if self.finished.is_set():
+            return
+        self.finished.set()
+        if self.on_finished:
+            self.on_finished()
+
+
+class StreamingPlayer:
+    def __init__(self, device=None, buffer_ms: int = 500, block_frames: int = 4096):
+        """
+        Initialize the StreamingPlayer, which plays files, buffers and streams of chunks without blocking the caller.
+
+        Each sound is played at its own sample rate and channel count. Reading, decoding or producing the
+        next chunk happens on a background thread while the previous one is playing. Only one sound plays
+        at a time, starting a new one stops the current one.
+
+        Args:
+            device: The output device, None for the default one.
+            buffer_ms (int): How much audio is buffered ahead of the output.
+            block_frames (int): How many frames are read from a file at a time.
+        """
+        self.device = device
+        self.buffer_ms = int(buffer_ms)
+        self.block_frames = int(block_frames)
+        self.current = None
+        self.lock = threading.Lock()
+
+    def create_playback(self, sample_rate: int, channels: int, on_finished: callable = None) -> Playback:
+        """
+        Create the Playback for one sound.
+
+        Args:
+            sample_rate (int): The sample rate of the sound.
+            channels (int): The number of channels of the sound.
+            on_finished (callable): Called once playback has finished or was stopped.
+
+        Returns:
+            Playback: The playback, its stream not started.
+        """
+        return Playback(sample_rate, channels, self.buffer_ms, self.device, on_finished)
+
+    def play_file(self, path: str, on_finished: callable = None) -> Playback:
+        """
+        Play an audio file, reading it one block at a time.
+
+        Args:
+            path (str): The path to the audio file.
+            on_finished (callable): Called once playback has finished or was stopped.
+
+        Returns:
+            Playback: The playback, for waiting or stopping.
+        """
+        sound_file = sf.SoundFile(path, mode='r')
+
+        def blocks():
+            with sound_file:
+                yield from sound_file.blocks(self.block_frames, dtype='float32', always_2d=True)
+
+        return self.play_chunks(blocks(), sound_file.samplerate, sound_file.channels, on_finished)
+
+    def play_buffer(self, audio: AudioBuffer, on_finished: callable = None) -> Playback:
+        """
+        Play audio held in memory.
+
+        Args:
+            audio (AudioBuffer): The audio.
+            on_finished (callable): Called once playback has finished or was stopped.
+
+        Returns:
+            Playback: The playback, for waiting or stopping.
+        """
+        data = audio.data.reshape(len(audio.data), -1)
+        if data.dtype == np.int16:
+            data = data.astype('float32') / 32768
+        return self.play_chunks(iter([data]), audio.sample_rate, data.shape[1], on_finished)
+
+    def play_chunks(self, chunks, sample_rate: int, channels: int = 1, on_finished: callable = None) -> Playback:
+        """
+        Play chunks as they are produced. The iterable is consumed on a background thread, so chunk N
+        plays while chunk N + 1 is still being produced.
+
+        Args:
+            chunks: An iterable of float32 sample arrays, shaped (frames, channels) or (frames,) for mono.
+            sample_rate (int): The sample rate.
+            channels (int): The number of channels.
+            on_finished (callable): Called once playback has finished or was stopped.
+
+        Returns:
+            Playback: The playback, for waiting or stopping.
+        """
+        playback = self.create_playback(sample_rate, channels, on_finished)
+        with self.lock:
+            previous, self.current = self.current, playback
+        if previous:
+            previous.stop()
+
+        def produce() -> None:
+            try:
+                for chunk in chunks:
+                    if not playback.write(chunk):
+                        break
+            except Exception as e:
+                print(f"Playback failed: {e}")
+            finally:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+                playback.end()
+                playback.close()
+
+        threading.Thread(target=produce, name="playback", daemon=True).start()
+        return playback
+
+    def stop(self) -> None:
+        """
+        Stop whatever is playing.
+        """
+        with self.lock:
+            playback, self.current = self.current, None
+        if playback:
+            playback.stop()
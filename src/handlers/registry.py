@@ -0,0 +1,135 @@
+import importlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import to_bool
+from handlers.ai_handler import AIHandler
+
+
+class HandlerRegistry:
+    ## Handler classes by module string, shared by every registry
+    classes = {}
+
+    def __init__(self):
+        """
+        Initialize the HandlerRegistry, which builds AI handlers off the critical path and reuses them.
+
+        Handler classes are resolved once per module string. The handler for a config is built, and
+        optionally warmed up, on a background thread as soon as the config is known, and the same
+        instance is handed out until the config changes, then closed once its replacement is built.
+        Each module string has its own slot, so the synchronous and the asyncio handler for one config
+        are kept side by side.
+        """
+        ## The config key and the build of the current handler, per module string
+        self.slots = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="handler-registry")
+
+    @classmethod
+    def resolve(cls, module_string: str) -> type:
+        """
+        Import a handler class, or return it from the cache.
+
+        Args:
+            module_string (str): The module path and class name, for example "handlers.ai_handler.OpenAIHandler".
+
+        Returns:
+            type: The handler class.
+        """
+        handler_class = cls.classes.get(module_string)
+        if handler_class is None:
+            *module_path_parts, class_name = module_string.split('.')
+            module = importlib.import_module('.'.join(module_path_parts))
+            handler_class = cls.classes[module_string] = getattr(module, class_name)
+        return handler_class
+
+    @staticmethod
+    def config_key(config: dict) -> str:
+        """
+        Identify a config by its content, so an edited config gets a new handler.
+
+        Args:
+            config (dict): The AI configuration.
+
+        Returns:
+            str: The key.
+        """
+        return json.dumps(config, sort_keys=True, default=str)
+
+    def prepare(self, config: dict) -> Future:
+        """
+        Start building the handler for a config in the background, unless it is already built or building.
+
+        Args:
+            config (dict): The AI configuration.
+
+        Returns:
+            Future: Resolves to the handler.
+        """
+        module = config.get("module")
+        key = self.config_key(config)
+        with self.lock:
+            current_key, future = self.slots.get(module, (None, None))
+            ## A failed build is retried, it may have been a network error during warm-up
+            failed = future is not None and future.done() and future.exception() is not None
+            if key != current_key or future is None or failed:
+                previous = future
+                future = self.executor.submit(self.build, dict(config))
+                self.slots[module] = (key, future)
+                ## The single worker runs this after the new build, so the old handler is replaced first
+                if previous is not None:
+                    self.executor.submit(self.retire, previous)
+            return future
+
+    def build(self, config: dict) -> AIHandler:
+        """
+        Construct a handler and, if the config sets warm_up, send one cheap request so the import,
+        the client and the TLS connection are all ready before the first turn.
+
+        Args:
+            config (dict): The AI configuration.
+
+        Returns:
+            AIHandler: The handler.
+        """
+        handler = self.resolve(config.get("module"))(**config)
+        if to_bool(config.get("warm_up", False)):
+            try:
+                handler.warm_up()
+            except Exception as e:
+                print(f"Handler warm-up failed: {e}")
+        return handler
+
+    @staticmethod
+    def retire(future: Future) -> None:
+        """
+        Close a replaced handler, if it was built.
+
+        Args:
+            future (Future): The replaced handler's build.
+        """
+        if future.exception() is not None:
+            return
+        try:
+            future.result().close()
+        except Exception as e:
+            print(f"Could not close the replaced handler: {e}")
+
+    def get(self, config: dict) -> AIHandler:
+        """
+        Get the handler for a config, waiting for it if it is still being built.
+
+        Args:
+            config (dict): The AI configuration.
+
+        Returns:
+            AIHandler: The handler.
+        """
+        return self.prepare(config).result()
+
+    def close(self) -> None:
+        """
+        Stop the background thread. A build in progress finishes.
+        """
+        self.executor.shutdown(wait=False)
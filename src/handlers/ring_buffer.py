@@ -0,0 +1,131 @@
+import time
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity: int, channels: int = 1, dtype: str = 'float32'):
+        """
+        Initialize the AudioRingBuffer, a preallocated single-producer single-consumer queue of audio frames.
+
+        The producer (the audio callback) copies each block into the preallocated storage and only moves
+        the write position. The consumer only moves the read position. The positions are plain counters
+        that each side alone assigns, so neither side takes a lock or allocates frame storage.
+        When the consumer falls behind, frames that do not fit are dropped and counted.
+
+        Args:
+            capacity (int): The number of frames the buffer holds.
+            channels (int): The number of channels per frame.
+            dtype (str): The sample type, 'float32' or 'int16'.
+        """
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self.storage = np.zeros((self.capacity, self.channels), dtype=dtype)
+        self.written = 0
+        self.read_position = 0
+        self.overflows = 0
+        self.dropped_frames = 0
+
+    @property
+    def available(self) -> int:
+        """
+        The number of frames written and not yet consumed.
+        """
+        return self.written - self.read_position
+
+    def write(self, block: np.ndarray) -> int:
+        """
+        Copy a block in. Called by the producer only.
+
+        Args:
+            block (np.ndarray): Frames shaped (frames, channels), or (frames,) for mono.
+
+        Returns:
+            int: The number of frames written. Fewer than the block holds when the buffer is full.
+        """
+        frames = min(len(block), self.capacity - (self.written - self.read_position))
+        if frames < len(block):
+            self.overflows += 1
+            self.dropped_frames += len(block) - frames
+        if frames <= 0:
+            return 0
+        if block.ndim == 1:
+            block = block[:, None]
+        start = self.written % self.capacity
+        first = min(frames, self.capacity - start)
+        np.copyto(self.storage[start:start + first], block[:first], casting='same_kind')
+        if first < frames:
+            np.copyto(self.storage[:frames - first], block[first:frames], casting='same_kind')
+        ## Publish the frames only after they are copied
+        self.written += frames
+        return frames
+
+    def views(self, max_frames: int = None) -> tuple:
+        """
+        Look at the unread frames without copying them. Called by the consumer only.
+
+        The frames stay valid until they are consumed. Wrapped data comes back as two views.
+
+        Args:
+            max_frames (int): The maximum number of frames. None returns everything available.
+
+        Returns:
+            tuple: Up to two contiguous (frames, channels) views, oldest first.
+        """
+        frames = self.available if max_frames is None else min(self.available, int(max_frames))
+        if frames <= 0:
+            return ()
+        start = self.read_position % self.capacity
+        first = min(frames, self.capacity - start)
+        if first == frames:
+            return (self.storage[start:start + frames],)
+        return (self.storage[start:], self.storage[:frames - first])
+
+    def consume(self, frames: int) -> None:
+        """
+        Release frames seen through views, so the producer can reuse their storage. Called by the consumer only.
+
+        Args:
+            frames (int): The number of frames to release.
+        """
+        self.read_position += min(int(frames), self.available)
+
+    def read(self, max_frames: int = None) -> np.ndarray:
+        """
+        Copy out and consume the unread frames. Called by the consumer only.
+
+        Args:
+            max_frames (int): The maximum number of frames. None reads everything available.
+
+        Returns:
+            np.ndarray: The frames, shaped (frames, channels).
+        """
+        views = self.views(max_frames)
+        data = np.concatenate(views) if len(views) > 1 else (views[0].copy() if views else self.storage[:0].copy())
+        self.consume(len(data))
+        return data
+
+    def clear(self) -> None:
+        """
+        Drop every unread frame. Called by the consumer only.
+        """
+        self.read_position = self.written
+
+    def wait(self, frames: int = 1, timeout: float = None, poll: float = 0.005) -> bool:
+        """
+        Wait until frames are available. Polls, so the producer never has to signal anything.
+
+        Args:
+            frames (int): The number of frames to wait for.
+            timeout (float): The maximum time to wait. None waits forever.
+            poll (float): Seconds between checks.
+
+        Returns:
+            bool: True if the frames are available.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.available < frames:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
@@ -0,0 +1,98 @@
+import re
+from typing import Iterable, Iterator, List
+
+
+## A sentence ends at . ! ? (optionally followed by quotes or brackets) and whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s')
+## A clause ends at , ; : or a dash followed by whitespace
+CLAUSE_END = re.compile(r'[,;:—]\s')
+## Words whose trailing period does not end a sentence
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "etc.", "e.g.", "i.e."}
+
+
+class SentenceSegmenter:
+    def __init__(self, min_chars: int = 12, max_chars: int = 200):
+        """
+        Initialize the SentenceSegmenter, which cuts streamed text into pieces that can be spoken on their own.
+
+        Args:
+            min_chars (int): Clause breaks are only used once a segment is at least this long. Sentence breaks are always used.
+            max_chars (int): A segment with no break is cut at the last space once it reaches this length.
+        """
+        self.min_chars = int(min_chars)
+        self.max_chars = int(max_chars)
+        self.buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        Add streamed text and return the segments it completed.
+
+        Args:
+            delta (str): The new text.
+
+        Returns:
+            List[str]: The finished segments, in order. May be empty.
+        """
+        self.buffer += delta
+        segments = []
+        while True:
+            end = self.find_break()
+            if end is None:
+                break
+            segment, self.buffer = self.buffer[:end].strip(), self.buffer[end:]
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> List[str]:
+        """
+        Return whatever text is left once the stream has ended.
+
+        Returns:
+            List[str]: The last segment, or an empty list.
+        """
+        segment, self.buffer = self.buffer.strip(), ""
+        return [segment] if segment else []
+
+    def find_break(self) -> int:
+        """
+        Find where the first complete segment in the buffer ends.
+
+        Returns:
+            int: The end index of the segment, or None if there is no complete segment yet.
+        """
+        ## Take the earliest break, so a whole reply is cut the same way as the same reply streamed
+        ends = []
+        for match in SENTENCE_END.finditer(self.buffer):
+            words = self.buffer[:match.end()].split()
+            if words[-1].lower() not in ABBREVIATIONS:
+                ends.append(match.end())
+                break
+        for match in CLAUSE_END.finditer(self.buffer):
+            if match.end() >= self.min_chars:
+                ends.append(match.end())
+                break
+        if ends:
+            return min(ends)
+        if len(self.buffer) >= self.max_chars:
+            space = self.buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+
+def segment_stream(deltas: Iterable[str], min_chars: int = 12, max_chars: int = 200) -> Iterator[str]:
+    """
+    Turn a stream of text deltas into a stream of speakable segments.
+
+    Args:
+        deltas (Iterable[str]): The streamed text, for example from AIHandler.stream_response.
+        min_chars (int): The minimum length of a segment ending at a clause break.
+        max_chars (int): The maximum length of a segment with no break.
+
+    Yields:
+        str: Each segment as soon as it is complete.
+    """
+    segmenter = SentenceSegmenter(min_chars, max_chars)
+    for delta in deltas:
+        yield from segmenter.feed(delta)
+    yield from segmenter.flush()
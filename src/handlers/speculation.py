@@ -0,0 +1,151 @@
+import re
+import threading
+import time
+
+from metrics import metrics
+
+
+def normalize_transcript(text: str) -> str:
+    """
+    Normalize a transcript for exact-match lookup: lower case, no punctuation, single spaces.
+
+    Args:
+        text (str): The transcript.
+
+    Returns:
+        str: The normalized transcript.
+    """
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+class SpeculativeResponse:
+    def __init__(self, handler, stable_ms: int = 500, limit: int = 2):
+        """
+        Initialize the SpeculativeResponse, which asks for the reply to a turn before the user has finished it.
+
+        Partial transcripts are passed to observe. Once the same partial transcript has been reported
+        for stable_ms, the handler's prepare_response starts on a background thread, without touching the
+        conversation. When the final transcript is known, resolve uses the speculative reply if the words
+        match and the conversation has not changed since the request started, and commits it to the
+        conversation; otherwise the request is cancelled and counted as wasted.
+
+        Args:
+            handler (AIHandler): The handler that answers.
+            stable_ms (int): How long a partial transcript must stay unchanged before a request starts.
+            limit (int): The most speculative requests per turn, so a rambling user cannot run up the bill.
+        """
+        self.handler = handler
+        self.stable_seconds = int(stable_ms) / 1000
+        self.limit = int(limit)
+        self.lock = threading.Lock()
+        ## The latest partial and when it first appeared
+        self.partial = None
+        self.partial_since = None
+        ## The request in flight: its question, cancel event, finish event and result
+        self.question = None
+        self.cancelled = None
+        self.finished = None
+        self.response = None
+        self.started_at = None
+        self.version = None
+        self.started = 0
+        self.closed = False
+
+    def observe(self, text: str) -> None:
+        """
+        Take a partial transcript. A changed transcript cancels the request for the previous one,
+        and one that has not changed for stable_ms starts a new request.
+
+        Args:
+            text (str): The partial transcript.
+        """
+        key = normalize_transcript(text)
+        now = time.monotonic()
+        with self.lock:
+            if self.closed or not key:
+                return
+            if key != self.partial:
+                self.partial, self.partial_since = key, now
+            if self.question is not None and self.question != key:
+                self.cancel_locked()
+            if (self.question is None and self.started < self.limit
+                    and now - self.partial_since >= self.stable_seconds):
+                self.start_locked(text, key)
+
+    def start_locked(self, text: str, key: str) -> None:
+        """
+        Start a speculative request on a background thread. Called with the lock held.
+
+        Args:
+            text (str): The question as transcribed.
+            key (str): Its normalized words.
+        """
+        cancelled, finished = threading.Event(), threading.Event()
+        self.question, self.cancelled, self.finished, self.response = key, cancelled, finished, None
+        self.started_at = time.monotonic()
+        ## An earlier turn may still be answered while this one is spoken, its reply would be missing
+        self.version = self.handler.history_version()
+        self.started += 1
+        metrics.increment("speculation.started")
+
+        def run() -> None:
+            try:
+                response = self.handler.prepare_response(text, cancelled)
+            except Exception as e:
+                print(f"Speculative response failed: {e}")
+                response = None
+            with self.lock:
+                if self.finished is finished:
+                    self.response = response
+            finished.set()
+
+        threading.Thread(target=run, name="speculation", daemon=True).start()
+
+    def cancel_locked(self) -> None:
+        """
+        Cancel the request in flight and count it as wasted. Called with the lock held.
+        """
+        self.cancelled.set()
+        metrics.increment("speculation.wasted")
+        metrics.increment("speculation.wasted_ms", int((time.monotonic() - self.started_at) * 1000))
+        self.question = self.cancelled = self.finished = self.response = None
+
+    def resolve(self, question: str):
+        """
+        Settle the turn once the final transcript is known. No new requests start afterwards.
+
+        Args:
+            question (str): The final transcript.
+
+        Returns:
+            The response, already committed to the conversation, or None if the speculation missed
+            and the caller has to ask normally.
+        """
+        with self.lock:
+            self.closed = True
+            if self.question is None:
+                return None
+            if self.question != normalize_transcript(question or ""):
+                self.cancel_locked()
+                return None
+            finished = self.finished
+        finished.wait()
+        with self.lock:
+            response = self.response
+            if response is None or self.handler.history_version() != self.version:
+                ## Failed, or built on a history that has changed since, nothing was saved by speculating
+                self.cancel_locked()
+                return None
+            self.question = None
+        self.handler.accept_response(question, response)
+        metrics.increment("speculation.used")
+        return response
+
+    def close(self) -> None:
+        """
+        Abandon the turn, cancelling any request in flight.
+        """
+        with self.lock:
+            self.closed = True
+            if self.question is not None:
+                self.cancel_locked()
@@ -0,0 +1,372 @@
+import importlib
+import threading
+
+import numpy as np
+
+from handlers.audio_buffer import AudioBuffer
+
+
+class TranscriptionBackend:
+    def __init__(self, handler=None, **kwargs):
+        """
+        Initialize the TranscriptionBackend, which turns one piece of a recording into text for a TranscriptionStream.
+
+        The default backend sends every piece through the handler's own transcribe_audio.
+        Other backends are named by module string in stt_backend in the AI config.
+
+        Args:
+            handler (AIHandler): The handler the streams belong to.
+            kwargs: Additional keyword arguments.
+        """
+        self.handler = handler
+
+    def transcribe(self, audio: AudioBuffer) -> str:
+        """
+        Transcribe a piece of a recording.
+
+        Args:
+            audio (AudioBuffer): The audio, at the capture rate and channel count.
+
+        Returns:
+            str: The text.
+        """
+        return self.handler.transcribe_audio(audio)
+
+
+def create_backend(module_string: str, handler=None) -> TranscriptionBackend:
+    """
+    Create the transcription backend named in the config.
+
+    Args:
+        module_string (str): The module path and class name, for example "benchmarks.fakes.FakeTranscriptionBackend".
+            Empty uses the handler's transcribe_audio.
+        handler (AIHandler): The handler the streams belong to.
+
+    Returns:
+        TranscriptionBackend: The backend.
+    """
+    if not module_string:
+        return TranscriptionBackend(handler)
+    *module_path_parts, class_name = module_string.split('.')
+    module = importlib.import_module('.'.join(module_path_parts))
+    return getattr(module, class_name)(handler)
+
+
+class TranscriptionStream:
+    ## Audio quieter than this RMS level (full scale 1.0) is silence
+    SILENCE_RMS = 0.005
+    ## A pause is at least PAUSE_MS of frames quieter than PAUSE_RATIO of the loud frames, measured per FRAME_MS
+    FRAME_MS = 30
+    PAUSE_MS = 120
+    PAUSE_RATIO = 0.15
+    ## Without a pause, a window is cut at its quietest frame within this distance of its end
+    CUT_SEARCH_MS = 1000
+
+    def __init__(self, backend: TranscriptionBackend, sample_rate: int, partial_ms: int = 1000, window_ms: int = 5000,
+                 on_partial: callable = None):
+        """
+        Initialize the TranscriptionStream, which transcribes a recording while it is still being captured.
+
+        A worker thread commits the audio up to each pause in speech (or, without pauses, every window_ms)
+        as soon as it has been spoken, so no stretch is transcribed twice for the final transcript. Every
+        partial_ms of new audio it also transcribes the uncommitted tail and reports the text as a partial
+        transcript. At the end of the utterance only the tail since the last commit is left to do, and
+        nothing at all if the last partial already covered it or only silence came after it.
+
+        Args:
+            backend (TranscriptionBackend): Transcribes each piece.
+            sample_rate (int): The sample rate of the fed audio.
+            partial_ms (int): New audio needed before the next partial transcript. Also the shortest committed piece.
+            window_ms (int): The longest stretch of audio left uncommitted.
+            on_partial (callable): Called on the worker thread with each partial transcript. The same
+                transcript is reported again whenever only silence has followed it.
+        """
+        self.backend = backend
+        self.sample_rate = int(sample_rate)
+        self.partial_frames = max(1, int(self.sample_rate * int(partial_ms) / 1000))
+        self.window_frames = max(1, int(self.sample_rate * int(window_ms) / 1000))
+        self.frame_size = max(1, int(self.sample_rate * self.FRAME_MS / 1000))
+        self.pause_frames = max(1, self.PAUSE_MS // self.FRAME_MS)
+        self.on_partial = on_partial
+
+        ## Everything below is shared between the feeding thread, the worker and finish, under the lock
+        self.lock = threading.Lock()
+        self.blocks = []
+        self.frames = 0
+        self.generation = 0
+        self.closed = False
+        ## The committed pieces and their text
+        self.committed = 0
+        self.texts = []
+        ## The last partial: the text of the audio from tail_start to tail_end
+        self.tail_text = ""
+        self.tail_start = 0
+        self.tail_end = 0
+        ## The last partial transcript reported, and the end of the audio it covered
+        self.partial = None
+        self.partial_end = 0
+        self.requested = 0
+        self.checked = 0
+        self.requests = 0
+        ## The worker's request in flight, as (start, end, finished event)
+        self.in_flight = None
+
+        self.final = None
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="transcription", daemon=True)
+        self.thread.start()
+
+    def feed(self, block: np.ndarray) -> None:
+        """
+        Add captured audio. The block is kept, not copied, so it must not be reused by the caller.
+
+        Args:
+            block (np.ndarray): Frames shaped (frames, channels) or (frames,).
+        """
+        if not len(block):
+            return
+        with self.lock:
+            self.blocks.append(block)
+            self.frames += len(block)
+            ## Pauses are looked for every PAUSE_MS, partial transcripts made every partial_ms
+            due = (self.frames - self.checked >= self.pause_frames * self.frame_size
+                   or self.frames - self.requested >= self.partial_frames)
+        if due:
+            self.wakeup.set()
+
+    def reset(self) -> None:
+        """
+        Drop everything fed so far, for example when voice activity detection discards a false start.
+        Results of requests already in flight are ignored.
+        """
+        with self.lock:
+            self.blocks = []
+            self.frames = 0
+            self.generation += 1
+            self.committed, self.texts, self.requested, self.checked = 0, [], 0, 0
+            self.tail_text, self.tail_start, self.tail_end = "", 0, 0
+            self.partial, self.partial_end = None, 0
+
+    def finish(self, frames: int = None) -> str:
+        """
+        End the utterance and produce the final transcript on the calling thread. The worker stops,
+        and a request it still has in flight is not waited for.
+
+        Args:
+            frames (int): The length of the utterance. Audio fed beyond it is ignored. None keeps everything fed.
+
+        Returns:
+            str: The final transcript, or None if it failed.
+        """
+        with self.lock:
+            self.closed = True
+            limit = self.frames if frames is None else min(int(frames), self.frames)
+            in_flight = self.in_flight
+        self.wakeup.set()
+        ## A request already covering the tail is further along than a new one would be
+        if in_flight:
+            start, end, finished = in_flight
+            if start == self.committed and (end >= limit or self.is_silent(end, limit)):
+                finished.wait()
+        with self.lock:
+            committed, texts = min(self.committed, limit), list(self.texts)
+            tail_text, tail_start, tail_end = self.tail_text, self.tail_start, self.tail_end
+        try:
+            ## The last partial is reused when it covered the whole tail, up to trailing silence
+            covered = tail_start == committed and tail_end > committed
+            if not (covered and (tail_end >= limit or self.is_silent(tail_end, limit))):
+                tail_text = self.transcribe(committed, limit)
+            self.final = self.join(texts + [tail_text])
+        except Exception as e:
+            print(f"Streaming transcription failed: {e}")
+        return self.final
+
+    def close(self) -> None:
+        """
+        Abandon the utterance and stop the worker.
+        """
+        with self.lock:
+            self.closed = True
+        self.wakeup.set()
+
+    def audio(self, start: int, end: int) -> AudioBuffer:
+        """
+        Take a piece of the fed audio, joining the blocks fed so far into one array first.
+
+        Args:
+            start (int): The first frame.
+            end (int): The frame after the last one.
+
+        Returns:
+            AudioBuffer: The piece, a view of the joined array.
+        """
+        with self.lock:
+            if len(self.blocks) > 1:
+                self.blocks = [np.concatenate(self.blocks)]
+            data = self.blocks[0][start:end] if self.blocks else np.zeros((0,), dtype='float32')
+        return AudioBuffer(data, self.sample_rate, "speech.wav")
+
+    def levels(self, start: int, end: int) -> np.ndarray:
+        """
+        Measure the RMS level of every FRAME_MS frame of a piece of the fed audio.
+
+        Args:
+            start (int): The first frame.
+            end (int): The frame after the last one.
+
+        Returns:
+            np.ndarray: One level per complete frame.
+        """
+        data = self.audio(start, end).data
+        mono = data.mean(axis=1) if data.ndim > 1 else data
+        count = len(mono) // self.frame_size
+        frames = mono[:count * self.frame_size].reshape(count, self.frame_size)
+        return np.sqrt(np.square(frames, dtype='float32').mean(axis=1))
+
+    def is_silent(self, start: int, end: int) -> bool:
+        """
+        Check whether a piece of the fed audio is silence.
+
+        Args:
+            start (int): The first frame.
+            end (int): The frame after the last one.
+
+        Returns:
+            bool: True if no frame of it is louder than SILENCE_RMS.
+        """
+        levels = self.levels(start, end)
+        return not len(levels) or float(levels.max()) < self.SILENCE_RMS
+
+    def find_cut(self, start: int, end: int) -> int:
+        """
+        Find where the uncommitted audio can be cut without splitting a word: the middle of the last
+        pause at least partial_ms in, or the quietest frame near the end of a full window.
+
+        Args:
+            start (int): The first uncommitted frame.
+            end (int): The frame after the newest one.
+
+        Returns:
+            int: The frame to cut at, or None if the audio should stay uncommitted for now.
+        """
+        levels = self.levels(start, end)
+        if not len(levels):
+            return None
+        quiet = levels < max(self.SILENCE_RMS, self.PAUSE_RATIO * float(np.percentile(levels, 90)))
+        ## runs[i] is True when frames i to i + pause_frames - 1 are all quiet
+        runs = np.convolve(quiet, np.ones(self.pause_frames, dtype=int), 'valid') == self.pause_frames
+        first = -(-self.partial_frames // self.frame_size)
+        ## The newest frames may be the start of a pause that is not over yet
+        pauses = np.flatnonzero(runs[first:len(runs) - 1]) + first
+        if len(pauses):
+            return start + int(pauses[-1]) * self.frame_size + self.pause_frames * self.frame_size // 2
+        if end - start <= self.window_frames:
+            return None
+        window = levels[:self.window_frames // self.frame_size]
+        search = max(1, self.CUT_SEARCH_MS // self.FRAME_MS)
+        quietest = len(window) - search + int(np.argmin(window[-search:]))
+        return start + quietest * self.frame_size + self.frame_size // 2
+
+    def transcribe(self, start: int, end: int, worker: bool = False) -> str:
+        """
+        Transcribe a piece of the fed audio. Silence is never sent, recognizers tend to make words up for it.
+
+        Args:
+            start (int): The first frame.
+            end (int): The frame after the last one.
+            worker (bool): Whether the worker is asking, so finish can wait for the request instead of repeating it.
+                The worker calls settle once it has stored the result.
+
+        Returns:
+            str: The text.
+        """
+        if self.is_silent(start, end):
+            return ""
+        self.requests += 1
+        if not worker:
+            return (self.backend.transcribe(self.audio(start, end)) or "").strip()
+        self.in_flight = (start, end, threading.Event())
+        try:
+            return (self.backend.transcribe(self.audio(start, end)) or "").strip()
+        except Exception:
+            self.settle()
+            raise
+
+    def settle(self) -> None:
+        """
+        Mark the worker's request as done. Called once its result is stored, so finish never wakes up
+        before it can read the result.
+        """
+        in_flight, self.in_flight = self.in_flight, None
+        if in_flight:
+            in_flight[2].set()
+
+    @staticmethod
+    def join(texts: list) -> str:
+        """
+        Join the texts of consecutive pieces.
+
+        Args:
+            texts (list): The texts.
+
+        Returns:
+            str: The transcript.
+        """
+        return " ".join(text for text in texts if text)
+
+    def run(self) -> None:
+        """
+        Worker loop: commit the audio up to the last pause, then produce a partial transcript if enough audio is new.
+        """
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            with self.lock:
+                if self.closed:
+                    return
+                frames, generation, committed = self.frames, self.generation, self.committed
+                self.checked = frames
+            try:
+                cut = self.find_cut(committed, frames)
+                if cut is not None:
+                    text = self.transcribe(committed, cut, worker=True)
+                    ## Results are kept even after finish was called, it may be waiting for them
+                    try:
+                        with self.lock:
+                            if self.generation != generation:
+                                continue
+                            self.texts.append(text)
+                            self.committed = committed = cut
+                            if self.closed:
+                                return
+                    finally:
+                        self.settle()
+                    ## A pause followed by silence ends a partial transcript without another request
+                    if text and self.on_partial and self.is_silent(cut, frames):
+                        with self.lock:
+                            if self.generation != generation:
+                                continue
+                            partial = self.join(self.texts)
+                            self.partial, self.partial_end = partial, cut
+                        self.on_partial(partial)
+                        continue
+
+                if frames - self.requested >= self.partial_frames:
+                    self.requested = frames
+                    tail_text = self.transcribe(committed, frames, worker=True)
+                    try:
+                        with self.lock:
+                            if self.generation != generation:
+                                continue
+                            self.tail_text, self.tail_start, self.tail_end = tail_text, committed, frames
+                            partial = None if self.closed else self.join(self.texts + [tail_text])
+                            self.partial, self.partial_end = partial, frames
+                    finally:
+                        self.settle()
+                    if partial and self.on_partial:
+                        self.on_partial(partial)
+                elif self.partial and self.on_partial and self.is_silent(self.partial_end, frames):
+                    ## Nothing was said since the last partial, so it still stands
+                    self.on_partial(self.partial)
+            except Exception as e:
+                print(f"Streaming transcription failed: {e}")
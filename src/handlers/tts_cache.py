@@ -0,0 +1,241 @@
+import argparse
+import collections
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import yaml
+
+from handlers.audio_buffer import AudioBuffer
+from metrics import metrics
+
+
+## Temporary files older than this are left over from a crashed write, not one still in progress
+STALE_TEMP_SECONDS = 3600
+
+
+class TTSCache:
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, keep_seconds: float = 300):
+        """
+        Initialize the TTSCache, a content-addressed store of synthesized speech on disk.
+
+        Each clip is stored as <hash of speech model, voice and text>.wav. The total size is capped,
+        and the least recently used clips are deleted first. Hits touch the file, so the order
+        survives restarts. Clips returned in the last keep_seconds are never deleted, because a
+        path-mode delivery may still be queued to send their path; the cache can briefly exceed
+        max_bytes instead.
+
+        Args:
+            path (str): The folder to store the clips in.
+            max_bytes (int): The maximum total size of the clips.
+            keep_seconds (float): How long a clip that was just read or written is protected from eviction.
+        """
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.keep_seconds = float(keep_seconds)
+        self.lock = threading.Lock()
+        self.files = collections.OrderedDict()
+        ## Monotonic time each clip was last handed out, for the clips used since startup
+        self.used = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.gauge = lambda: {"hits": self.hits, "misses": self.misses}
+        metrics.register_gauge("cache.tts", self.gauge)
+
+        os.makedirs(self.path, exist_ok=True)
+        self.scan()
+
+    @staticmethod
+    def key(speech_model: str, voice: str, text: str) -> str:
+        """
+        Hash the inputs that decide what a clip sounds like.
+
+        Args:
+            speech_model (str): The speech model name.
+            voice (str): The voice name.
+            text (str): The spoken text.
+
+        Returns:
+            str: The hex digest used as the file name.
+        """
+        return hashlib.sha256("\0".join((speech_model, voice, text)).encode("utf-8")).hexdigest()
+
+    def file_path(self, key: str) -> str:
+        """
+        Find where a clip is stored.
+
+        Args:
+            key (str): The clip hash.
+
+        Returns:
+            str: The path of the clip.
+        """
+        return os.path.join(self.path, key + ".wav")
+
+    def scan(self) -> None:
+        """
+        Index the clips already on disk, least recently used first, and delete the temporary files
+        of writes that never finished.
+        """
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.path):
+            if not entry.is_file() or not entry.name.endswith(".wav"):
+                continue
+            stat = entry.stat()
+            ## Temporary files start with a dot. A recent one may belong to another process writing right now
+            if entry.name.startswith("."):
+                if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                continue
+            entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.files[key] = size
+            self.size += size
+        self.evict()
+
+    def get(self, speech_model: str, voice: str, text: str) -> AudioBuffer:
+        """
+        Look a clip up.
+
+        Args:
+            speech_model (str): The speech model name.
+            voice (str): The voice name.
+            text (str): The spoken text.
+
+        Returns:
+            AudioBuffer: The clip, with path set to the cached file, or None on a miss.
+        """
+        key = self.key(speech_model, voice, text)
+        with self.lock:
+            if key not in self.files:
+                self.misses += 1
+                return None
+            self.files.move_to_end(key)
+            self.used[key] = time.monotonic()
+            self.hits += 1
+        path = self.file_path(key)
+        try:
+            os.utime(path)
+            return AudioBuffer.from_file(path)
+        except (OSError, RuntimeError):
+            ## Deleted behind our back
+            with self.lock:
+                self.size -= self.files.pop(key, 0)
+                self.used.pop(key, None)
+            return None
+
+    def put(self, speech_model: str, voice: str, text: str, audio: AudioBuffer) -> str:
+        """
+        Store a clip. The file is written under a temporary name and renamed, so readers never see half a clip.
+
+        Args:
+            speech_model (str): The speech model name.
+            voice (str): The voice name.
+            text (str): The spoken text.
+            audio (AudioBuffer): The clip. Its path is set to the cached file.
+
+        Returns:
+            str: The path of the cached file.
+        """
+        key = self.key(speech_model, voice, text)
+        path = self.file_path(key)
+        descriptor, temporary_path = tempfile.mkstemp(prefix=".", suffix=".wav", dir=self.path)
+        os.close(descriptor)
+        try:
+            audio.save(temporary_path)
+            os.replace(temporary_path, path)
+        except Exception:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        audio.path = path
+
+        with self.lock:
+            self.size -= self.files.pop(key, 0)
+            self.files[key] = os.path.getsize(path)
+            self.size += self.files[key]
+            self.used[key] = time.monotonic()
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        """
+        Delete the least recently used clips until the cache fits max_bytes, skipping the ones used in the last keep_seconds.
+        """
+        with self.lock:
+            recent = time.monotonic() - self.keep_seconds
+            for key in list(self.files):
+                if self.size <= self.max_bytes or len(self.files) <= 1:
+                    break
+                if self.used.get(key, recent) > recent:
+                    continue
+                self.size -= self.files.pop(key)
+                self.used.pop(key, None)
+                try:
+                    os.remove(self.file_path(key))
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """
+        Stop reporting the hit rate, unless a newer cache reports it now. The clips stay on disk for
+        the next cache on the same folder.
+        """
+        metrics.unregister_gauge("cache.tts", self.gauge)
+
+
+def warm(handler, phrases: list) -> int:
+    """
+    Pre-render phrases through a handler so they are cached before they are needed.
+
+    Args:
+        handler: An AI handler with a TTS cache, for example OpenAIHandler with tts_cache_path set.
+        phrases (list): The phrases to render.
+
+    Returns:
+        int: The number of phrases that had to be synthesized.
+    """
+    rendered = 0
+    for phrase in phrases:
+        misses = handler.tts_cache.misses
+        handler.synthesize_speech(phrase)
+        if handler.tts_cache.misses != misses:
+            rendered += 1
+            print(f"Rendered: {phrase}")
+    return rendered
+
+
+def main() -> None:
+    """
+    Warm the TTS cache from a YAML phrase list.
+
+    Run from the src directory:
+        python -m handlers.tts_cache --config ../configs/open_ai.yml --phrases ../configs/phrases.yml
+    """
+    parser = argparse.ArgumentParser(description="Pre-render phrases into the TTS cache")
+    parser.add_argument("--config", required=True, help="The AI config, with tts_cache_path set")
+    parser.add_argument("--phrases", required=True, help="A YAML file with a 'phrases' list")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    with open(args.phrases, 'r') as file:
+        phrases = yaml.safe_load(file).get("phrases", [])
+    if not config.get("tts_cache_path"):
+        parser.error("tts_cache_path is not set in the AI config")
+
+    from handlers.registry import HandlerRegistry
+    handler = HandlerRegistry.resolve(config.get("module"))(**config)
+    rendered = warm(handler, phrases)
+    print(f"{rendered} of {len(phrases)} phrases rendered, the rest were already cached")
+
+
+if __name__ == "__main__":
+    main()
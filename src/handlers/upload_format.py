@@ -0,0 +1,134 @@
+import functools
+import io
+import math
+
+import numpy as np
+import soundfile as sf
+
+from handlers.audio_buffer import AudioBuffer
+
+
+@functools.lru_cache(maxsize=16)
+def design_filter(up: int, down: int, half_width: int = 10, beta: float = 5.0) -> np.ndarray:
+    """
+    Design the anti-aliasing low-pass filter for a rational resampling, a Kaiser-windowed sinc
+    at the lower of the two Nyquist frequencies.
+
+    Args:
+        up (int): The upsampling factor.
+        down (int): The downsampling factor.
+        half_width (int): Filter taps on each side of the center, per unit of the larger factor.
+        beta (float): The Kaiser window shape. Higher trades transition width for stopband attenuation.
+
+    Returns:
+        np.ndarray: The taps, scaled by up so the passband gain is 1 after upsampling.
+    """
+    rate = max(up, down)
+    half_length = half_width * rate
+    n = np.arange(-half_length, half_length + 1)
+    taps = np.sinc(n / rate) * np.kaiser(len(n), beta)
+    return taps * up / taps.sum()
+
+
+def resample_poly(data: np.ndarray, up: int, down: int, chunk: int = 4096) -> np.ndarray:
+    """
+    Resample by up/down with a polyphase FIR filter. Only the output samples are computed: each one is the
+    dot product of one filter phase with the input samples under it, so the upsampled signal never exists.
+
+    Args:
+        data (np.ndarray): Mono samples, shaped (frames,).
+        up (int): The upsampling factor.
+        down (int): The downsampling factor.
+        chunk (int): Output samples computed per vectorized step, which bounds the temporary memory.
+
+    Returns:
+        np.ndarray: The resampled samples, float64, ceil(frames * up / down) of them.
+    """
+    divisor = math.gcd(up, down)
+    up, down = up // divisor, down // divisor
+    data = np.asarray(data, dtype=np.float64)
+    if up == down:
+        return data
+    taps = design_filter(up, down)
+    length = -(-len(taps) // up)
+    ## phases[p, j] is taps[p + j * up], reversed so it lines up with a forward window of the input
+    padded = np.zeros(up * length)
+    padded[:len(taps)] = taps
+    phases = padded.reshape(length, up).T[:, ::-1]
+    source = np.concatenate((np.zeros(length - 1), data, np.zeros(length)))
+    windows = np.lib.stride_tricks.sliding_window_view(source, length)
+
+    ## Output n sits at position n * down + len(taps) // 2 of the upsampled signal, which removes the filter delay
+    count = -(-len(data) * up // down)
+    output = np.empty(count)
+    for begin in range(0, count, chunk):
+        positions = np.arange(begin, min(begin + chunk, count)) * down + len(taps) // 2
+        output[begin:begin + len(positions)] = np.einsum('ij,ij->i', windows[positions // up], phases[positions % up])
+    return output
+
+
+class UploadFormat:
+    ## Extension, soundfile format and subtype of every encoding
+    FORMATS = {
+        "wav": ("wav", "WAV", "PCM_16"),
+        "flac": ("flac", "FLAC", "PCM_16"),
+        "opus": ("ogg", "OGG", "OPUS"),
+    }
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1, format: str = "wav"):
+        """
+        Initialize the UploadFormat, the conversion from captured audio to what is sent for transcription.
+
+        Speech recognizers work on 16 kHz mono, so anything more only makes the upload bigger.
+
+        Args:
+            sample_rate (int): The upload sample rate. 0 keeps the capture rate.
+            channels (int): 1 downmixes to mono. 0 keeps the capture channels.
+            format (str): "wav" (16 bit PCM), "flac" (lossless, about half the size) or "opus" (lossy, smallest).
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown upload format {format}, expected one of {', '.join(self.FORMATS)}")
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.format = format
+
+    def convert(self, audio: AudioBuffer) -> AudioBuffer:
+        """
+        Downmix, resample and quantize a clip.
+
+        Args:
+            audio (AudioBuffer): The captured clip.
+
+        Returns:
+            AudioBuffer: The clip as int16, at the upload rate and channel count.
+        """
+        data = audio.data
+        if data.dtype.kind in "iu":
+            data = data / float(np.iinfo(data.dtype).max)
+        if self.channels == 1 and data.ndim > 1:
+            data = data.mean(axis=1)
+        sample_rate = audio.sample_rate
+        if self.sample_rate and self.sample_rate != sample_rate:
+            if data.ndim > 1:
+                data = np.stack([resample_poly(channel, self.sample_rate, sample_rate) for channel in data.T], axis=1)
+            else:
+                data = resample_poly(data, self.sample_rate, sample_rate)
+            sample_rate = self.sample_rate
+        pcm = np.rint(np.clip(data, -1.0, 1.0) * 32767).astype('<i2')
+        return AudioBuffer(pcm, sample_rate, audio.name)
+
+    def encode(self, audio: AudioBuffer) -> tuple:
+        """
+        Convert and encode a clip for upload.
+
+        Args:
+            audio (AudioBuffer): The captured clip.
+
+        Returns:
+            tuple: The file name and the encoded bytes, as taken by the OpenAI SDK's file argument.
+        """
+        extension, format, subtype = self.FORMATS[self.format]
+        converted = self.convert(audio)
+        encoded = io.BytesIO()
+        sf.write(encoded, converted.data, converted.sample_rate, format=format, subtype=subtype)
+        return f"speech.{extension}", encoded.getvalue()
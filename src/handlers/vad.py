@@ -0,0 +1,167 @@
+import collections
+
+import numpy as np
+
+
+class VoiceActivityEndpointer:
+    ## The sample rates webrtcvad accepts
+    VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+    ## The frame lengths webrtcvad accepts
+    FRAME_DURATIONS_MS = (10, 20, 30)
+
+    def __init__(self, vad, sample_rate: int, frame_ms: int = 30, silence_ms: int = 800, hangover_ms: int = 210,
+                 pre_roll_ms: int = 300, min_speech_ms: int = 150, energy_floor: float = 0.005):
+        """
+        Initialize the VoiceActivityEndpointer, which finds where an utterance starts and ends in a stream of audio blocks.
+
+        Each block is one VAD frame long. Blocks are downmixed, resampled to a rate webrtcvad accepts and
+        quantized to 16 bit. Quiet frames are rejected by a vectorized energy gate before webrtcvad is asked.
+
+        Args:
+            vad: The webrtcvad.Vad instance.
+            sample_rate (int): The sample rate of the incoming blocks.
+            frame_ms (int): The duration of each block, 10, 20 or 30 ms.
+            silence_ms (int): The utterance ends after this much trailing silence, hangover included, so this is
+                the real delay between the end of speech and the endpoint.
+            hangover_ms (int): Audio kept after the last voiced frame, so trailing consonants are not cut.
+                It is part of the silence_ms window, not added to it.
+            pre_roll_ms (int): Audio kept from before speech was detected, so the first syllable is not cut.
+            min_speech_ms (int): Utterances with less voiced audio than this are discarded as noise.
+            energy_floor (float): Frames with a lower RMS level (full scale 1.0) are silence without asking webrtcvad.
+        """
+        if frame_ms not in self.FRAME_DURATIONS_MS:
+            raise ValueError(f"frame_ms must be one of {self.FRAME_DURATIONS_MS}")
+        self.vad = vad
+        self.sample_rate = int(sample_rate)
+        self.frame_ms = int(frame_ms)
+        self.block_size = int(self.sample_rate * self.frame_ms / 1000)
+        self.vad_sample_rate = 16000 if self.sample_rate >= 16000 else 8000
+        self.vad_frame_size = int(self.vad_sample_rate * self.frame_ms / 1000)
+        self.silence_frames = max(1, int(silence_ms) // self.frame_ms)
+        self.hangover_frames = int(hangover_ms) // self.frame_ms
+        self.min_speech_frames = int(min_speech_ms) // self.frame_ms
+        self.energy_floor = float(energy_floor)
+
+        ## Sample positions of the VAD frame inside a capture block, for vectorized linear resampling
+        positions = np.linspace(0, self.block_size - 1, self.vad_frame_size)
+        self.resample_index = positions.astype(int)
+        self.resample_next = np.minimum(self.resample_index + 1, self.block_size - 1)
+        self.resample_fraction = (positions - self.resample_index).astype('float32')
+
+        self.pre_roll = collections.deque(maxlen=max(1, int(pre_roll_ms) // self.frame_ms))
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget the current utterance and start listening again.
+        """
+        self.pre_roll.clear()
+        self.blocks = []
+        self.triggered = False
+        self.speech_frames = 0
+        self.since_voiced = 0
+        self.last_voiced = 0
+        self.finished = False
+        self.vad_calls = 0
+
+    def to_vad_frames(self, blocks: np.ndarray) -> np.ndarray:
+        """
+        Convert capture blocks into frames webrtcvad accepts.
+
+        Args:
+            blocks (np.ndarray): Blocks shaped (count, block_size) or (count, block_size, channels).
+
+        Returns:
+            np.ndarray: int16 frames shaped (count, vad_frame_size).
+        """
+        if blocks.dtype.kind == 'i':
+            blocks = blocks.astype('float32') / 32768
+        mono = blocks.mean(axis=2) if blocks.ndim == 3 else blocks
+        if self.vad_frame_size != self.block_size:
+            mono = (mono[:, self.resample_index] * (1 - self.resample_fraction)
+                    + mono[:, self.resample_next] * self.resample_fraction)
+        return (np.clip(mono, -1, 1) * 32767).astype('int16')
+
+    def is_speech(self, blocks: np.ndarray) -> np.ndarray:
+        """
+        Decide which blocks contain speech.
+
+        Args:
+            blocks (np.ndarray): Blocks shaped (count, block_size) or (count, block_size, channels).
+
+        Returns:
+            np.ndarray: A bool per block.
+        """
+        frames = self.to_vad_frames(blocks)
+        rms = np.sqrt(np.mean(np.square(frames, dtype='float32'), axis=1)) / 32768
+        voiced = rms >= self.energy_floor
+        for index in np.flatnonzero(voiced):
+            voiced[index] = self.vad.is_speech(frames[index].tobytes(), self.vad_sample_rate)
+            self.vad_calls += 1
+        return voiced
+
+    def feed(self, blocks: np.ndarray) -> bool:
+        """
+        Process capture blocks.
+
+        Args:
+            blocks (np.ndarray): Blocks shaped (count, block_size) or (count, block_size, channels).
+
+        Returns:
+            bool: True once the utterance has ended. Blocks after the end are ignored.
+        """
+        if self.finished:
+            return True
+        for block, voiced in zip(blocks, self.is_speech(blocks)):
+            if not self.triggered:
+                self.pre_roll.append(block)
+                if voiced:
+                    ## Speech started, the pre-roll becomes the start of the utterance
+                    self.triggered = True
+                    self.blocks = list(self.pre_roll)
+                    self.speech_frames = 1
+                    self.since_voiced = 0
+                    self.last_voiced = len(self.blocks)
+                continue
+
+            self.blocks.append(block)
+            if voiced:
+                self.speech_frames += 1
+                self.since_voiced = 0
+                self.last_voiced = len(self.blocks)
+                continue
+
+            self.since_voiced += 1
+            if self.since_voiced >= self.silence_frames:
+                if self.speech_frames < self.min_speech_frames:
+                    ## Too short to be speech, keep listening
+                    self.triggered = False
+                    self.pre_roll.clear()
+                    self.blocks = []
+                    continue
+                self.finished = True
+                return True
+        return False
+
+    @property
+    def utterance(self) -> np.ndarray:
+        """
+        The audio of the utterance, from the pre-roll up to the hangover after the last voiced frame.
+        """
+        end = min(len(self.blocks), self.last_voiced + self.hangover_frames)
+        if not end:
+            return np.zeros((0,), dtype='float32')
+        return np.concatenate(self.blocks[:end])
+
+    def blocks_from(self, data: np.ndarray) -> np.ndarray:
+        """
+        Split a whole recording into blocks, dropping the incomplete last block.
+
+        Args:
+            data (np.ndarray): Samples shaped (frames,) or (frames, channels).
+
+        Returns:
+            np.ndarray: Blocks shaped (count, block_size) or (count, block_size, channels), without copying.
+        """
+        count = data.shape[0] // self.block_size
+        return data[:count * self.block_size].reshape(count, self.block_size, *data.shape[1:])
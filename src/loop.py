@@ -1,15 +1,18 @@
 import os
-import keyboard
-import sounddevice as sd
-import soundfile as sf
-from enum import Enum
 
+from config import to_bool
+from handlers.audio_buffer import AudioArchive
 from handlers.audio_handler import VoiceRecorder
-from ui.signal import application_signal
+from pipeline import TurnPipeline, Turn
+from tracing import tracer
+from triggers import create_trigger, STOP_POLL_INTERVAL
+from events import application_signal, PARTIAL_PREFIX
 
 
 class RecordingLoop:
-    def __init__(self, path: str, filename: str, ai_service, sample_rate: int, recording_key: str, **kwargs):
+    def __init__(self, path: str, filename: str, ai_service, sample_rate: int, recording_key: str, max_queue_size: int = 2, archive: bool = True,
+                 capture_mode: str = "key", silence_ms: int = 800, trigger_port: int = 8765, trace: bool = False,
+                 trace_path: str = "", recorder: VoiceRecorder = None, playback_buffer_ms: int = 500, **kwargs):
         """
         Initialize the RecordingLoop instance.
 
@@ -19,14 +22,32 @@ class RecordingLoop:
             ai_service: The AI service for transcribing and responding.
             sample_rate (int): The sample rate for recording.
             recording_key (str): The key to start recording.
+            max_queue_size (int): The number of turns each pipeline stage may hold before recording blocks.
+            archive (bool): Whether live recordings and responses are also written to path, in the background.
+            capture_mode (str): "key" records while recording_key is held, "vad" records hands-free until silence,
+                "http" records between POST /press and POST /release on trigger_port.
+            silence_ms (int): In "vad" mode, the trailing silence that ends an utterance.
+            trigger_port (int): In "http" mode, the port the trigger listens on.
+            trace (bool): Time every stage of every turn. Percentiles are kept in tracing.tracer.
+            trace_path (str): A JSONL file the spans are appended to. Empty keeps them in memory only.
+            recorder (VoiceRecorder): Records the turns. Defaults to a VoiceRecorder on the default input device.
+            playback_buffer_ms (int): How much audio is read ahead of the output when a recording is played back.
             **kwargs: Additional arguments.
         """
-        self.recorder = VoiceRecorder(sample_rate=int(sample_rate))
+        self.recorder = recorder or VoiceRecorder(
+            sample_rate=int(sample_rate), silence_ms=int(silence_ms), playback_buffer_ms=int(playback_buffer_ms)
+        )
+        self.capture_mode = capture_mode
+        self.trigger_port = int(trigger_port)
         self.ai_service = ai_service
         self.recording_key = recording_key
         self.path = path
         self.file_index = 0
         self.filename = filename
+        self.max_queue_size = int(max_queue_size)
+        self.archive = AudioArchive(path) if to_bool(archive) else None
+        self.capture_started = None
+        tracer.configure(to_bool(trace), trace_path or None)
 
         self.is_recording = False
 
@@ -37,7 +58,26 @@ class RecordingLoop:
         """
         Stop any currently playing audio.
         """
-        sd.stop()
+        self.recorder.stop_playing()
+
+    def create_trigger(self, capture_mode: str = None):
+        """
+        Create the trigger that starts each turn.
+
+        Args:
+            capture_mode (str): Overrides the configured capture mode.
+
+        Returns:
+            TurnTrigger: The trigger, not yet started.
+        """
+        return create_trigger(capture_mode or self.capture_mode, self.recording_key, self.trigger_port)
+
+    def on_recording_start(self) -> None:
+        """
+        Report that a recording started.
+        """
+        self.capture_started = tracer.now()
+        application_signal.isRecording.emit("RECORDING")
 
     def test_record(self, id: int, stop: callable) -> None:
         """
@@ -47,74 +87,165 @@ class RecordingLoop:
             id (int): An identifier for the recording session.
             stop (callable): A callable to determine if the loop should stop.
         """
-        while True:
-            if stop():
-                ## Exit the loop if the stop condition is met
-                print("Exiting loop.")
-                self.is_recording = False
-                break
-
-            if keyboard.is_pressed(self.recording_key):
-                if self.is_recording == False:
-                    application_signal.isRecording.emit("RECORDING")
-                    self.is_recording = True
-                ## Generate the file path for the new recording
-                file_path = os.path.join(self.path, f"{self.filename}_{self.file_index}.wav")
-                self.file_index += 1
-                ## Record and play the audio
-                self.recorder.record(file_path, self.recording_key)
-                application_signal.isRecording.emit("PLAYING")
-                self.recorder.play(file_path)
-            elif self.is_recording == True:
-                application_signal.isRecording.emit("USER")
-                self.is_recording = False
-                
-
-    def start_live(self, id: int, stop: callable, callback: callable) -> None:
+        ## Play back always uses the recording key
+        trigger = self.create_trigger("key")
+        trigger.start()
+        while not stop():
+            ## Sleep until the key goes down, waking only to check the stop condition
+            if not trigger.wait(STOP_POLL_INTERVAL):
+                continue
+            ## A new recording cuts the previous playback short
+            self.recorder.stop_playing()
+            audio = trigger.capture(self.recorder, stop, self.on_recording_start)
+            if audio is None or not audio.frames:
+                continue
+            ## Generate the file path for the new recording
+            file_path = os.path.join(self.path, f"{self.filename}_{self.file_index}.wav")
+            self.file_index += 1
+            ## Save and play the audio
+            audio.save(file_path)
+            ## Playback runs in the background, the next recording can start while it plays
+            application_signal.isRecording.emit("PLAYING")
+            self.recorder.play(file_path, on_finished=lambda: application_signal.isRecording.emit("USER"))
+
+        ## Exit the loop if the stop condition is met
+        print("Exiting loop.")
+        trigger.close()
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release what the session holds once its loop has ended: write the recordings still queued,
+        stop the archive worker, and stop listening for the dialog closing.
+        """
+        application_signal.closeDialogSignal.disconnect(self.stop_playing)
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+
+    def open_transcription(self, speculation=None):
+        """
+        Start transcribing the next turn while it is captured, if the AI handler streams transcription.
+
+        Args:
+            speculation (SpeculativeResponse): Also gets every partial transcript, if given.
+
+        Returns:
+            TranscriptionStream: The stream, or None.
+        """
+        if not self.ai_service.streaming_stt:
+            return None
+
+        def on_partial(text: str) -> None:
+            self.show_partial(text)
+            if speculation:
+                speculation.observe(text)
+
+        return self.ai_service.open_transcription(self.recorder.sample_rate, on_partial)
+
+    def show_partial(self, text: str) -> None:
+        """
+        Show a partial transcript in the conversation log.
+
+        Args:
+            text (str): The transcript so far.
+        """
+        application_signal.addResponseWidgetSignal.emit(f"{PARTIAL_PREFIX}{text}")
+
+    def capture_turn(self, trigger, stop: callable) -> tuple:
+        """
+        Record the turn that just started, transcribing it on the way if the AI handler streams transcription,
+        and asking for the reply early if it also speculates.
+
+        Args:
+            trigger (TurnTrigger): The trigger that started the turn.
+            stop (callable): A callable to determine if the loop should stop.
+
+        Returns:
+            tuple: The recording, or None if there is nothing to process, its TranscriptionStream or None,
+                and its SpeculativeResponse or None.
+        """
+        speculation = self.ai_service.open_speculation() if self.ai_service.streaming_stt else None
+        transcription = self.open_transcription(speculation)
+        audio = trigger.capture(self.recorder, stop, self.on_recording_start, transcription)
+        if transcription and (audio is None or not audio.frames):
+            transcription.close()
+            transcription = None
+            if speculation:
+                speculation.close()
+                speculation = None
+        return audio, transcription, speculation
+
+    def create_turn(self, audio, transcription=None, speculation=None) -> Turn:
+        """
+        Name a recording, archive it and wrap it in a turn. The capture is traced as the turn's record span.
+
+        Args:
+            audio (AudioBuffer): The recording.
+            transcription (TranscriptionStream): The transcription streamed during the capture, if any.
+            speculation (SpeculativeResponse): The reply requested during the capture, if any.
+
+        Returns:
+            Turn: The turn.
+        """
+        audio.name = f"{self.filename}_{self.file_index}.wav"
+        self.file_index += 1
+        if self.archive:
+            self.archive.submit(audio)
+        turn = Turn(audio)
+        turn.transcription = transcription
+        turn.speculation = speculation
+        if self.capture_started is not None:
+            tracer.add("record", turn.turn_id, self.capture_started, tracer.now(), {"seconds": audio.duration})
+        return turn
+
+    def submit_turn(self, pipeline: TurnPipeline, audio, transcription=None, speculation=None) -> None:
+        """
+        Name a recording, archive it and hand it to the pipeline.
+
+        Args:
+            pipeline (TurnPipeline): The running pipeline. Blocks only if its transcribe stage is full.
+            audio (AudioBuffer): The recording.
+            transcription (TranscriptionStream): The transcription streamed during the capture, if any.
+            speculation (SpeculativeResponse): The reply requested during the capture, if any.
+        """
+        pipeline.submit(self.create_turn(audio, transcription, speculation))
+
+    def start_live(self, id: int, stop: callable, callback: callable, stream_speech: bool = False) -> None:
         """
         Live recording and interaction loop.
 
+        Recording happens on this thread, while transcription, the AI response, speech synthesis
+        and the callback each run on their own pipeline worker. The next utterance can be
+        recorded while the previous one is still being processed.
+
         Args:
             id (int): An identifier for the recording session.
             stop (callable): A callable to determine if the loop should stop.
+            callback (callable): Called with the AudioBuffer of each voice response and its turn id, in turn order.
+            stream_speech (bool): Call the callback with a SpeechStream as soon as synthesis starts instead.
         """
-        while True:
-            if stop():
-                ## Exit the loop if the stop condition is met
-                print("Exiting loop.")
-                break
-
-            if keyboard.is_pressed(self.recording_key):
-                if self.is_recording == False:
-                    application_signal.isRecording.emit("RECORDING")
-                    self.is_recording = True
-                ## Generate the file path for the new recording
-                file_path = self.path + "/" + f"{self.filename}_{self.file_index}.wav"
-                self.file_index += 1
-                ## Record the audio
-                self.recorder.record(file_path, self.recording_key)
-                application_signal.isRecording.emit("WAITING")
-                ## Transcribe the audio file
-                question = self.ai_service.transcribe_audio_file(file_path)
-                question_message = f"USER : {question}"
-                ## Emit the transcribed question signal
-                application_signal.addResponseWidgetSignal.emit(question_message)
-
-                ## Get the AI response
-                text_response = self.ai_service.get_response(question)
-                response_message = f"{self.ai_service.NAME} : {text_response.content}"
-                ## Emit the AI response signal
-                application_signal.addResponseWidgetSignal.emit(response_message)
-
-                ## Convert the AI response to speech and play it
-                voice_response_file = file_path.replace(".wav", "_bot.wav")
-                self.ai_service.text_to_speech(text_response.content, voice_response_file)
-                application_signal.isRecording.emit("PLAYING")
-                
-                #Send path to callback, then play. In most cases it sends it to the network
-                with sf.SoundFile(voice_response_file, mode='r') as sound_file:
-                    callback(voice_response_file)
-                #self.recorder.play(voice_response_file)
-            elif self.is_recording == True:
-                application_signal.isRecording.emit("USER")
-                self.is_recording = False
\ No newline at end of file
+        pipeline = TurnPipeline.from_handler(
+            self.ai_service, callback, max_queue_size=self.max_queue_size,
+            streaming=self.ai_service.stream, archive=self.archive, stream_speech=stream_speech
+        )
+        pipeline.start()
+        trigger = self.create_trigger()
+        trigger.start()
+        while not stop():
+            ## Sleep until a turn starts, waking only to check the stop condition
+            if not trigger.wait(STOP_POLL_INTERVAL):
+                continue
+            audio, transcription, speculation = self.capture_turn(trigger, stop)
+            if audio is None or not audio.frames:
+                continue
+            application_signal.isRecording.emit("WAITING")
+            self.submit_turn(pipeline, audio, transcription, speculation)
+            application_signal.isRecording.emit("USER")
+
+        ## Exit the loop if the stop condition is met
+        print("Exiting loop.")
+        trigger.close()
+        pipeline.stop()
+        tracer.flush()
+        self.close()
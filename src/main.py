@@ -1,28 +1,121 @@
+import argparse
+import json
+import os
+import signal
 import sys
-from PyQt5.QtWidgets import QApplication
+import threading
+import time
 
-import qdarkstyle
+## Cold start is measured from here, before any heavy import
+START_TIME = time.perf_counter()
 
-from ui.view import MainView
-from ui.signal import application_signal
+CONFIGS_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "configs"))
 
 
+def report_startup(mode: str) -> dict:
+    """
+    Print how long startup took and how much memory the process holds.
 
-def main() -> None:
+    Args:
+        mode (str): "gui" or "headless".
+
+    Returns:
+        dict: The mode, the cold-start time in milliseconds and the RSS in megabytes.
+    """
+    from metrics import resident_memory
+
+    rss = resident_memory()
+    report = {
+        "mode": mode,
+        "startup_ms": round((time.perf_counter() - START_TIME) * 1000, 1),
+        "rss_mb": round(rss / 2 ** 20, 1) if rss is not None else None,
+        "qt_loaded": "PyQt5" in sys.modules,
+    }
+    print(f"STARTUP {json.dumps(report)}", flush=True)
+    return report
+
+
+def run_gui(args) -> None:
     """
-    The main function initializes the application, sets the stylesheet, shows the main view,
-    and waits for the shutdown signal before closing.
+    Initialize the application, set the stylesheet, show the main view and run the Qt event loop.
+    PyQt is only imported here.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
     """
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    import qdarkstyle
+
+    from ui.view import MainView
+
     app = QApplication(sys.argv)
     view = MainView()
     app.setStyleSheet(qdarkstyle.load_stylesheet())
     view.show()
-    
-    # Emit shutdown signal (comment suggests a 1-second wait, but not implemented here)
-    application_signal.shutdownSignal.emit()
+
+    ## Report once the first frame has been processed
+    QTimer.singleShot(0, lambda: report_startup("gui"))
+    if args.exit_after_start:
+        QTimer.singleShot(0, app.quit)
 
     sys.exit(app.exec_())
 
 
+def run_headless(args) -> None:
+    """
+    Load the three configs, run the live pipeline without a window and stop on SIGINT or SIGTERM.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+    """
+    from events import application_signal
+    from handlers.ai_handler import AIConfig
+    from handlers.audio_handler import AudioConfig
+    from handlers.network.client import NetworkConfig
+    from ui.model import Model
+
+    model = Model()
+    model.load_config(AIConfig, args.ai_config)
+    model.load_config(AudioConfig, args.audio_config)
+    model.load_config(NetworkConfig, args.network_config)
+
+    ## There is no log widget, print the conversation instead
+    application_signal.addResponseWidgetSignal.connect(lambda message: print(message, flush=True))
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    if args.exit_after_start:
+        stop.set()
+    else:
+        model.live_audio()
+    report_startup("headless")
+
+    ## Wake up regularly, signal handlers only run on the main thread between waits
+    while not stop.wait(0.5):
+        pass
+    application_signal.shutdownSignal.emit()
+
+
+def main() -> None:
+    """
+    Parse the arguments and start the GUI, or the headless pipeline with --headless.
+    """
+    parser = argparse.ArgumentParser(description="Omniverse AI Service")
+    parser.add_argument("--headless", action="store_true", help="Run the live pipeline without a window")
+    parser.add_argument("--ai-config", default=os.path.join(CONFIGS_PATH, "open_ai.yml"))
+    parser.add_argument("--audio-config", default=os.path.join(CONFIGS_PATH, "audio_config.yml"))
+    parser.add_argument("--network-config", default=os.path.join(CONFIGS_PATH, "network.yml"))
+    parser.add_argument("--exit-after-start", action="store_true", help="Report the startup time and memory, then exit")
+    args = parser.parse_args()
+
+    if args.headless:
+        run_headless(args)
+    else:
+        run_gui(args)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
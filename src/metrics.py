@@ -0,0 +1,91 @@
+import os
+import threading
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Initialize the MetricsRegistry, a thread-safe store of counters and gauges.
+
+        Counters are bumped where events happen (an audio overflow, a finished turn). Gauges are
+        callables that are only read when a snapshot is taken (queue depths, cache hit counts),
+        so they cost nothing per event.
+        """
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name: str, count: int = 1) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            name (str): The counter name, for example "audio.input_overflow".
+            count (int): The amount to add.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def register_gauge(self, name: str, read: callable) -> None:
+        """
+        Register a value to read at snapshot time. Replaces a gauge with the same name.
+
+        Args:
+            name (str): The gauge name, for example "queue.transcribe".
+            read (callable): Returns the current value.
+        """
+        with self.lock:
+            self.gauges[name] = read
+
+    def unregister_gauge(self, name: str, read: callable = None) -> None:
+        """
+        Remove a gauge.
+
+        Args:
+            name (str): The gauge name.
+            read (callable): If given, the gauge is only removed if it was not replaced since.
+        """
+        with self.lock:
+            if read is None or self.gauges.get(name) is read:
+                self.gauges.pop(name, None)
+
+    def snapshot(self) -> dict:
+        """
+        Read every counter and gauge.
+
+        Returns:
+            dict: "counters" and "gauges", each by name. Gauges that fail to read are left out.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        values = {}
+        for name, read in gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                pass
+        return {"counters": counters, "gauges": values}
+
+
+def resident_memory() -> int:
+    """
+    Read the resident set size of this process. Uses psutil when it is installed, /proc otherwise.
+
+    Returns:
+        int: The RSS in bytes, or None where it cannot be read.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+## The registry the pipeline, caches and recorder report to
+metrics = MetricsRegistry()
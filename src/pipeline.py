@@ -0,0 +1,383 @@
+import itertools
+import queue
+import threading
+import time
+
+from handlers.audio_buffer import AudioBuffer
+from handlers.network.streaming import SpeechStream
+from handlers.segmenter import segment_stream
+from metrics import metrics
+from tracing import tracer
+from events import application_signal, USER_PREFIX
+
+
+## Sentinel pushed through the queues to shut the workers down in order
+STOP = object()
+
+
+class Turn:
+    _ids = itertools.count()
+
+    def __init__(self, audio: AudioBuffer):
+        """
+        Initialize a Turn, the unit of work that moves through the pipeline.
+
+        Args:
+            audio (AudioBuffer): The captured user audio.
+        """
+        self.turn_id = next(Turn._ids)
+        self.audio = audio
+        self.transcription = None
+        self.speculation = None
+        self.question = None
+        self.response = None
+        self.voice = None
+        self.created = time.monotonic()
+        self.first_audio = None
+        self.delivered = None
+
+    @property
+    def latency(self) -> float:
+        """
+        Seconds from capture to delivery, or None if the turn was not delivered.
+        """
+        if self.delivered is None:
+            return None
+        return self.delivered - self.created
+
+    @property
+    def time_to_first_audio(self) -> float:
+        """
+        Seconds from capture until the first audio was delivered, or None if nothing was delivered.
+        """
+        if self.first_audio is None:
+            return None
+        return self.first_audio - self.created
+
+    def close(self) -> None:
+        """
+        Release what a dropped or failed turn still holds: the worker of its streamed transcription,
+        any speculative request and the synthesis of streamed speech. Harmless once the turn has been delivered.
+        """
+        if self.transcription:
+            self.transcription.close()
+        if self.speculation:
+            self.speculation.close()
+        if isinstance(self.voice, SpeechStream):
+            self.voice.close()
+
+
+class Segment:
+    def __init__(self, turn: Turn, index: int, text: str):
+        """
+        Initialize a Segment, one spoken piece of a streamed response.
+
+        Args:
+            turn (Turn): The turn the segment belongs to.
+            index (int): The position of the segment in the response.
+            text (str): The text to speak, or None for the closing segment of a turn.
+        """
+        self.turn = turn
+        self.index = index
+        self.text = text
+        self.voice = None
+
+    def close(self) -> None:
+        """
+        Release what the segment and its turn still hold.
+        """
+        if isinstance(self.voice, SpeechStream):
+            self.voice.close()
+        self.turn.close()
+
+
+def voice_name(audio: AudioBuffer, suffix: str) -> str:
+    """
+    Name a response after the recording it answers.
+
+    Args:
+        audio (AudioBuffer): The user recording.
+        suffix (str): Replaces the ".wav" extension of the recording name.
+
+    Returns:
+        str: The file name for the response.
+    """
+    name = audio.name or "response.wav"
+    return name.replace(".wav", suffix)
+
+
+class PipelineStage:
+    def __init__(self, name: str, handler: callable, max_queue_size: int = 2, fan_out: bool = False):
+        """
+        Initialize a PipelineStage that runs handler on its own worker thread.
+
+        Args:
+            name (str): The name of the stage, used for logging.
+            handler (callable): Called with each input item. Returns the item for the next stage or None to drop it.
+            max_queue_size (int): The size of the input queue. A full queue blocks the previous stage (backpressure).
+            fan_out (bool): If True, handler returns an iterable and each element is forwarded as soon as it is produced.
+        """
+        self.name = name
+        self.handler = handler
+        self.fan_out = fan_out
+        self.input = queue.Queue(maxsize=max_queue_size)
+        self.next_stage = None
+        self.cancelled = None
+        self.thread = None
+
+    def start(self, cancelled: threading.Event) -> None:
+        """
+        Start the worker thread.
+
+        Args:
+            cancelled (threading.Event): Set when pending items should be dropped instead of processed.
+        """
+        self.cancelled = cancelled
+        self.thread = threading.Thread(target=self.run, name=f"pipeline-{self.name}", daemon=True)
+        self.thread.start()
+
+    def put(self, item) -> None:
+        """
+        Queue an item for this stage, blocking while the queue is full.
+
+        Args:
+            item: The item to process.
+        """
+        self.input.put(item)
+
+    def discard(self) -> None:
+        """
+        Close every item still waiting in the input queue, without blocking.
+        """
+        while True:
+            try:
+                item = self.input.get_nowait()
+            except queue.Empty:
+                return
+            if item is not STOP:
+                item.close()
+
+    def forward(self, item) -> None:
+        """
+        Hand an item to the next stage, if there is one.
+
+        Args:
+            item: The processed item.
+        """
+        if item is not None and self.next_stage:
+            self.next_stage.put(item)
+
+    def run(self) -> None:
+        """
+        Worker loop. Items are handled one at a time, so the order of the input queue is preserved downstream.
+        """
+        while True:
+            item = self.input.get()
+            if item is STOP:
+                if self.next_stage:
+                    self.next_stage.put(STOP)
+                break
+            if self.cancelled.is_set():
+                item.close()
+                continue
+            try:
+                if self.fan_out:
+                    for result in self.handler(item):
+                        self.forward(result)
+                else:
+                    self.forward(self.handler(item))
+            except Exception as e:
+                print(f"Pipeline stage {self.name} failed: {e}")
+                item.close()
+
+
+class TurnPipeline:
+    def __init__(self, stages: list):
+        """
+        Initialize a TurnPipeline from an ordered list of stages.
+
+        Args:
+            stages (list): The PipelineStage instances, first to last.
+        """
+        self.stages = stages
+        self.cancelled = threading.Event()
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+
+    @classmethod
+    def from_handler(cls, ai_service, callback: callable, max_queue_size: int = 2, streaming: bool = False, archive=None,
+                     stream_speech: bool = False):
+        """
+        Build the STT -> LLM -> TTS -> delivery pipeline for an AI handler.
+
+        Args:
+            ai_service: The AI service for transcribing and responding.
+            callback (callable): Called with the AudioBuffer (or SpeechStream) of each synthesized response and its turn id, in turn order.
+            max_queue_size (int): The input queue size for every stage.
+            streaming (bool): Stream the response and synthesize and deliver it one sentence at a time.
+            archive (AudioArchive): If given, synthesized responses are also written to disk in the background.
+            stream_speech (bool): Hand the callback a SpeechStream as soon as synthesis starts, so the response
+                can be uploaded while it is still being synthesized.
+
+        Returns:
+            TurnPipeline: The (not yet started) pipeline.
+        """
+        def transcribe(turn: Turn) -> Turn:
+            with tracer.span("transcribe", turn.turn_id):
+                ## A streamed transcription only has the end of the utterance left, and falls back if it failed
+                if turn.transcription:
+                    turn.question = turn.transcription.finish(turn.audio.frames)
+                if turn.question is None:
+                    turn.question = ai_service.transcribe_audio(turn.audio)
+            application_signal.addResponseWidgetSignal.emit(f"{USER_PREFIX}{turn.question}")
+            return turn
+
+        def respond(turn: Turn) -> Turn:
+            with tracer.span("get_response", turn.turn_id):
+                ## A reply requested from a matching partial transcript is used, anything else is cancelled
+                if turn.speculation:
+                    turn.response = turn.speculation.resolve(turn.question)
+                if turn.response is None:
+                    turn.response = ai_service.get_response(turn.question)
+            application_signal.addResponseWidgetSignal.emit(f"{ai_service.NAME} : {turn.response.content}")
+            return turn
+
+        def synthesize(text: str, name: str):
+            ## A streamed voice is archived by its producer once it is complete
+            if stream_speech:
+                return SpeechStream(ai_service.stream_speech(text), name, archive.submit if archive else None)
+            voice = ai_service.synthesize_speech(text)
+            voice.name = name
+            if archive:
+                archive.submit(voice)
+            return voice
+
+        def speak(turn: Turn) -> Turn:
+            with tracer.span("text_to_speech", turn.turn_id):
+                turn.voice = synthesize(turn.response.content, voice_name(turn.audio, "_bot.wav"))
+            return turn
+
+        def deliver(turn: Turn) -> Turn:
+            application_signal.isRecording.emit("PLAYING")
+            with tracer.span("callback", turn.turn_id):
+                callback(turn.voice, turn.turn_id)
+            turn.delivered = time.monotonic()
+            turn.first_audio = turn.delivered
+            metrics.increment("turns.completed")
+            return turn
+
+        def respond_streaming(turn: Turn):
+            ## Segments are yielded while the model is still generating, so TTS starts on the first sentence
+            ## The span is the wall time of the whole stream, including waits for the speak stage
+            texts = []
+            start = tracer.now()
+            failure = None
+            try:
+                speculated = turn.speculation.resolve(turn.question) if turn.speculation else None
+                deltas = iter([speculated.content]) if speculated else ai_service.stream_response(turn.question)
+                for index, text in enumerate(segment_stream(deltas)):
+                    texts.append(text)
+                    yield Segment(turn, index, text)
+            except Exception as e:
+                ## The sentences already spoken still complete the turn, the failure is reported after
+                failure = e
+            finally:
+                tracer.add("get_response", turn.turn_id, start, tracer.now())
+                turn.response = " ".join(texts)
+                application_signal.addResponseWidgetSignal.emit(f"{ai_service.NAME} : {turn.response}")
+            ## An empty closing segment tells the delivery stage the turn is complete
+            yield Segment(turn, len(texts), None)
+            if failure:
+                raise failure
+
+        def speak_segment(segment: Segment) -> Segment:
+            if segment.text is None:
+                return segment
+            with tracer.span("text_to_speech", segment.turn.turn_id, segment=segment.index):
+                segment.voice = synthesize(segment.text, voice_name(segment.turn.audio, f"_bot_{segment.index}.wav"))
+            return segment
+
+        def deliver_segment(segment: Segment) -> Segment:
+            turn = segment.turn
+            if segment.text is None:
+                turn.delivered = time.monotonic()
+                metrics.increment("turns.completed")
+                return segment
+            if turn.first_audio is None:
+                application_signal.isRecording.emit("PLAYING")
+            with tracer.span("callback", turn.turn_id, segment=segment.index):
+                callback(segment.voice, turn.turn_id)
+            if turn.first_audio is None:
+                turn.first_audio = time.monotonic()
+            return segment
+
+        if streaming:
+            return cls([
+                PipelineStage("transcribe", transcribe, max_queue_size),
+                PipelineStage("respond", respond_streaming, max_queue_size, fan_out=True),
+                PipelineStage("speak", speak_segment, max_queue_size),
+                PipelineStage("deliver", deliver_segment, max_queue_size),
+            ])
+        return cls([
+            PipelineStage("transcribe", transcribe, max_queue_size),
+            PipelineStage("respond", respond, max_queue_size),
+            PipelineStage("speak", speak, max_queue_size),
+            PipelineStage("deliver", deliver, max_queue_size),
+        ])
+
+    def start(self) -> None:
+        """
+        Start a worker thread for every stage, and publish the stage queue depths as gauges.
+        """
+        for stage in self.stages:
+            stage.start(self.cancelled)
+            metrics.register_gauge(f"queue.{stage.name}", stage.input.qsize)
+
+    def submit(self, turn: Turn) -> None:
+        """
+        Submit a captured turn. Blocks while the first stage is full.
+
+        Args:
+            turn (Turn): The turn to process.
+        """
+        self.stages[0].put(turn)
+
+    def run_serial(self, item, index: int = 0) -> None:
+        """
+        Run the stages one after another on the calling thread, without queues or workers.
+
+        Args:
+            item: The item to process.
+            index (int): The stage to start from.
+        """
+        if item is None or index == len(self.stages):
+            return
+        stage = self.stages[index]
+        if stage.fan_out:
+            for result in stage.handler(item):
+                self.run_serial(result, index + 1)
+        else:
+            self.run_serial(stage.handler(item), index + 1)
+
+    def stop(self, drain: bool = False, timeout: float = None) -> None:
+        """
+        Stop the pipeline and join the workers.
+
+        Args:
+            drain (bool): If True, finish the turns already queued. Otherwise drop them.
+            timeout (float): The maximum time to wait for each worker.
+        """
+        if not drain:
+            self.cancelled.set()
+            ## The queued turns would be dropped anyway, this makes room for STOP
+            self.stages[0].discard()
+        try:
+            self.stages[0].input.put(STOP, timeout=timeout)
+        except queue.Full:
+            print(f"Pipeline stage {self.stages[0].name} did not take the stop signal in time")
+        for stage in self.stages:
+            stage.thread.join(timeout)
+            metrics.unregister_gauge(f"queue.{stage.name}")
+        ## Turns still queued behind a worker that did not stop in time
+        for stage in self.stages:
+            stage.discard()
@@ -0,0 +1,348 @@
+import collections
+import os
+import statistics
+import threading
+
+from config import to_bool
+from handlers.audio_buffer import AudioBuffer
+from handlers.cache import CachedAIHandler, ResponseCache, read_cache_settings
+from handlers.network.client import RestClient, create_session
+from handlers.registry import HandlerRegistry
+from pipeline import TurnPipeline, Turn
+
+
+class FairScheduler:
+    def __init__(self, workers: int = 4, max_pending: int = 2):
+        """
+        Initialize the FairScheduler, a worker pool shared by many sessions.
+
+        Every session has its own FIFO queue. Workers serve the sessions round robin, one job at a time,
+        so a session with a backlog cannot starve the others. A session never has two jobs running at
+        once, so its handler state needs no locking.
+
+        Args:
+            workers (int): The number of worker threads.
+            max_pending (int): The number of jobs a session may have waiting. Further submits block or fail.
+        """
+        self.max_pending = int(max_pending)
+        self.queues = {}
+        self.ready = collections.deque()
+        self.running = set()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.threads = [threading.Thread(target=self.run, name=f"session-worker-{index}", daemon=True)
+                        for index in range(int(workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, job: callable, block: bool = True) -> bool:
+        """
+        Queue a job for a session.
+
+        Args:
+            key: The session the job belongs to.
+            job (callable): Called with no arguments on a worker.
+            block (bool): Wait while the session's queue is full. Otherwise the job is dropped.
+
+        Returns:
+            bool: False if the job was dropped.
+        """
+        with self.condition:
+            jobs = self.queues.setdefault(key, collections.deque())
+            if len(jobs) >= self.max_pending:
+                if not block:
+                    return False
+                self.condition.wait_for(lambda: len(jobs) < self.max_pending or self.closed)
+            ## Closed, or the session was removed while waiting
+            if self.closed or self.queues.get(key) is not jobs:
+                return False
+            jobs.append(job)
+            if key not in self.running and key not in self.ready:
+                self.ready.append(key)
+            self.condition.notify_all()
+        return True
+
+    def run(self) -> None:
+        """
+        Worker loop. Takes the next job from the session at the front of the rotation.
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.ready or (self.closed and not self.running))
+                if not self.ready:
+                    break
+                key = self.ready.popleft()
+                job = self.queues[key].popleft()
+                self.running.add(key)
+                self.condition.notify_all()
+            try:
+                job()
+            except Exception as e:
+                print(f"Session {key} job failed: {e}")
+            with self.condition:
+                self.running.discard(key)
+                ## Back of the rotation, so every other waiting session goes first
+                if self.queues.get(key):
+                    self.ready.append(key)
+                self.condition.notify_all()
+
+    def remove(self, key) -> int:
+        """
+        Forget a session, dropping its waiting jobs. A running job finishes.
+
+        Args:
+            key: The session.
+
+        Returns:
+            int: The number of jobs dropped.
+        """
+        with self.condition:
+            jobs = self.queues.pop(key, collections.deque())
+            if key in self.ready:
+                self.ready.remove(key)
+            self.condition.notify_all()
+            return len(jobs)
+
+    def close(self, drain: bool = True, timeout: float = None) -> None:
+        """
+        Stop the workers.
+
+        Args:
+            drain (bool): If True, run the jobs already queued first. Otherwise drop them.
+            timeout (float): The maximum time to wait for each worker.
+        """
+        with self.condition:
+            if not drain:
+                self.queues.clear()
+                self.ready.clear()
+            self.closed = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+class Session:
+    def __init__(self, session_id: str, ai_service, send: callable, streaming: bool = False):
+        """
+        Initialize a Session, one conversation with its own handler, history and target instance.
+
+        Args:
+            session_id (str): The session name. Recordings and responses are named after it.
+            ai_service: The session's own AI handler, so conversation histories never mix.
+            send (callable): Called with each voice response and its turn id.
+            streaming (bool): Stream responses and speak them sentence by sentence.
+        """
+        self.session_id = session_id
+        self.ai_service = ai_service
+        self.send = send
+        self.pipeline = TurnPipeline.from_handler(ai_service, send, streaming=streaming)
+        self.file_index = 0
+        self.completed = 0
+        self.latencies = collections.deque(maxlen=256)
+
+    def create_turn(self, audio: AudioBuffer) -> Turn:
+        """
+        Name a recording after the session and wrap it in a turn.
+
+        Args:
+            audio (AudioBuffer): The recording.
+
+        Returns:
+            Turn: The turn.
+        """
+        audio.name = f"{self.session_id}_{self.file_index}.wav"
+        self.file_index += 1
+        return Turn(audio)
+
+    def process(self, turn: Turn) -> None:
+        """
+        Run a turn through every stage. Called on a scheduler worker, never twice at once for one session.
+
+        Args:
+            turn (Turn): The turn.
+        """
+        self.pipeline.run_serial(turn)
+        self.completed += 1
+        if turn.latency is not None:
+            self.latencies.append(turn.latency)
+
+    def stats(self) -> dict:
+        """
+        Summarize the session.
+
+        Returns:
+            dict: The completed turn count and the mean latency of recent turns.
+        """
+        return {
+            "completed": self.completed,
+            "latency_mean": statistics.mean(self.latencies) if self.latencies else None,
+        }
+
+
+class SessionManager:
+    def __init__(self, create_handler: callable, network: dict = None, workers: int = 4, max_pending: int = 2,
+                 streaming: bool = False, send: callable = None, response_cache: ResponseCache = None):
+        """
+        Initialize the SessionManager, which hosts many independent sessions in one process.
+
+        Sessions share one pooled HTTP session for delivery and one FairScheduler worker pool.
+        Shared caches are passed in through create_handler (see from_configs).
+
+        Args:
+            create_handler (callable): Called with a session id, returns a new AI handler for that session.
+            network (dict): The network configuration. None disables delivery.
+            workers (int): The number of worker threads shared by all sessions.
+            max_pending (int): The number of turns a session may have waiting.
+            streaming (bool): Stream responses and speak them sentence by sentence.
+            send (callable): Replaces network delivery. Called with the session, the voice response and its turn id.
+            response_cache (ResponseCache): The response cache shared by the sessions, saved and closed with the manager.
+        """
+        self.create_handler = create_handler
+        self.response_cache = response_cache
+        self.network = network
+        self.streaming = streaming
+        self.send = send
+        self.scheduler = FairScheduler(workers, max_pending)
+        self.sessions = {}
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.http = None
+        if network:
+            self.http = create_session(
+                int(network.get("pool_size", 4)), int(network.get("retries", 3)), float(network.get("retry_backoff", 0.3))
+            )
+
+    @classmethod
+    def from_configs(cls, ai_config: dict, network: dict = None, workers: int = 4, max_pending: int = 2):
+        """
+        Build a manager whose sessions use the handler class named in an AI config.
+
+        One handler is built; every session gets a fork of it, with its own conversation memory but the
+        same client, connection pool and TTS cache. The response cache, if enabled, is shared by every
+        session and embeds with the shared client.
+
+        Args:
+            ai_config (dict): The AI configuration, as in open_ai.yml.
+            network (dict): The network configuration, as in network.yml.
+            workers (int): The number of worker threads.
+            max_pending (int): The number of turns a session may have waiting.
+
+        Returns:
+            SessionManager: The manager.
+        """
+        shared = HandlerRegistry.resolve(ai_config.get("module"))(**ai_config)
+        response_cache = None
+        if to_bool(ai_config.get("response_cache", False)):
+            settings = read_cache_settings(ai_config)
+            embedder = shared.embed if settings["similarity_threshold"] > 0 else None
+            response_cache = ResponseCache(**settings, embedder=embedder)
+
+        def create_handler(session_id: str):
+            handler = shared.fork()
+            return CachedAIHandler(handler, response_cache) if response_cache else handler
+
+        return cls(create_handler, network, workers, max_pending, streaming=to_bool(ai_config.get("stream", False)),
+                   response_cache=response_cache)
+
+    def open(self, session_id: str, instance_name: str = None) -> Session:
+        """
+        Start a session.
+
+        Args:
+            session_id (str): The session name. Must be unique.
+            instance_name (str): The Audio2Face instance the session drives. Defaults to the network config's.
+
+        Returns:
+            Session: The session.
+        """
+        client = None
+        if self.network and not self.send:
+            config = dict(self.network)
+            if instance_name:
+                config["instance_name"] = instance_name
+            client = RestClient(**config, session=self.http)
+
+        def send(audio: AudioBuffer, turn_id: int) -> None:
+            if self.send:
+                self.send(session, audio, turn_id)
+            elif client:
+                self.deliver(client, audio)
+
+        session = Session(session_id, self.create_handler(session_id), send, self.streaming)
+        with self.lock:
+            if session_id in self.sessions:
+                raise ValueError(f"Session {session_id} is already open")
+            self.sessions[session_id] = session
+            self.clients[session_id] = client
+        return session
+
+    def deliver(self, client: RestClient, audio: AudioBuffer):
+        """
+        Send a voice response to a session's instance, the same way Model.deliver does.
+
+        Args:
+            client (RestClient): The session's client.
+            audio (AudioBuffer): The voice response.
+
+        Returns:
+            Response: The HTTP response, or None if sending failed.
+        """
+        if self.network.get("upload_mode", "path") == "stream":
+            return client.send_audio(audio)
+        path = audio.path or audio.save(os.path.join(self.network.get("folder_path"), audio.name))
+        return client.send_text(text=path)
+
+    def submit(self, session_id: str, audio: AudioBuffer, block: bool = True) -> bool:
+        """
+        Queue a recording for a session.
+
+        Args:
+            session_id (str): The session.
+            audio (AudioBuffer): The recording.
+            block (bool): Wait while the session's queue is full. Otherwise the recording is dropped.
+
+        Returns:
+            bool: False if the recording was dropped.
+        """
+        session = self.sessions[session_id]
+        turn = session.create_turn(audio)
+        return self.scheduler.submit(session_id, lambda: session.process(turn), block)
+
+    def close_session(self, session_id: str) -> None:
+        """
+        End a session, dropping its waiting turns.
+
+        Args:
+            session_id (str): The session.
+        """
+        self.scheduler.remove(session_id)
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            client = self.clients.pop(session_id, None)
+        if client:
+            client.close()
+
+    def stats(self) -> dict:
+        """
+        Summarize every session.
+
+        Returns:
+            dict: Session stats by session id.
+        """
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return {session.session_id: session.stats() for session in sessions}
+
+    def close(self, drain: bool = True, timeout: float = None) -> None:
+        """
+        Stop the workers and release the shared connections.
+
+        Args:
+            drain (bool): If True, finish the turns already queued. Otherwise drop them.
+            timeout (float): The maximum time to wait for each worker.
+        """
+        self.scheduler.close(drain, timeout)
+        if self.response_cache:
+            self.response_cache.close()
+        if self.http:
+            self.http.close()
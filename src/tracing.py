@@ -0,0 +1,287 @@
+"""
+Lightweight spans for the conversation pipeline.
+
+Every stage of a turn (record, transcribe, get_response, text_to_speech, callback) is timed with
+time.perf_counter_ns and tagged with the turn id. Spans can be streamed to a JSONL file, converted
+to the Chrome trace-event format (chrome://tracing, Perfetto), and are folded into rolling
+p50/p95/p99 aggregates per stage. When tracing is disabled, span() returns a shared no-op object.
+
+Convert a JSONL trace and print its percentiles, from the src directory:
+    python -m tracing trace.jsonl --chrome trace.json
+"""
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class Span:
+    __slots__ = ("tracer", "name", "turn_id", "start", "end", "attrs")
+
+    def __init__(self, tracer, name: str, turn_id: int = None, attrs: dict = None):
+        """
+        Initialize a Span, one timed stage of a turn. Use it as a context manager.
+
+        Args:
+            tracer (Tracer): The tracer the span reports to.
+            name (str): The stage name.
+            turn_id (int): The turn the stage belongs to.
+            attrs (dict): Extra fields to export with the span.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.turn_id = turn_id
+        self.attrs = attrs
+        self.start = None
+        self.end = None
+
+    def __enter__(self):
+        """
+        Start timing.
+        """
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        Stop timing and report the span.
+        """
+        self.end = time.perf_counter_ns()
+        self.tracer.add(self.name, self.turn_id, self.start, self.end, self.attrs)
+
+
+class NullSpan:
+    def __enter__(self):
+        """
+        Do nothing, tracing is disabled.
+        """
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        Do nothing, tracing is disabled.
+        """
+        pass
+
+
+## Returned by every span() call while tracing is disabled
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False, path: str = None, window: int = 1024):
+        """
+        Initialize the Tracer.
+
+        Args:
+            enabled (bool): Whether spans are recorded.
+            path (str): A JSONL file to append every span to. None keeps spans in memory only.
+            window (int): The number of recent durations per stage the percentiles are computed over.
+        """
+        self.enabled = False
+        self.configured = False
+        self.watchers = 0
+        self.path = None
+        self.file = None
+        self.window = int(window)
+        self.durations = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self.lock = threading.Lock()
+        self.configure(enabled, path)
+
+    def configure(self, enabled: bool, path: str = None) -> None:
+        """
+        Turn tracing on or off and choose where spans are written.
+
+        Args:
+            enabled (bool): Whether spans are recorded.
+            path (str): A JSONL file to append every span to. None keeps spans in memory only.
+        """
+        with self.lock:
+            if self.file and (path != self.path or not enabled):
+                self.file.close()
+                self.file = None
+            self.path = path
+            if enabled and path and self.file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.file = open(path, "a")
+            self.configured = enabled
+            self.enabled = self.configured or self.watchers > 0
+
+    def watch(self) -> None:
+        """
+        Record spans in memory while someone (the dashboard) is watching, even if tracing is not configured.
+        """
+        with self.lock:
+            self.watchers += 1
+            self.enabled = True
+
+    def unwatch(self) -> None:
+        """
+        Stop watching. Recording stops unless tracing is configured or someone else is watching.
+        """
+        with self.lock:
+            self.watchers = max(0, self.watchers - 1)
+            self.enabled = self.configured or self.watchers > 0
+
+    def span(self, name: str, turn_id: int = None, **attrs):
+        """
+        Time a stage.
+
+        Args:
+            name (str): The stage name.
+            turn_id (int): The turn the stage belongs to.
+            **attrs: Extra fields to export with the span.
+
+        Returns:
+            Span: A context manager, or NULL_SPAN while tracing is disabled.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, turn_id, attrs or None)
+
+    @staticmethod
+    def now() -> int:
+        """
+        Read the clock spans use, for stages timed by hand with add().
+
+        Returns:
+            int: Monotonic nanoseconds.
+        """
+        return time.perf_counter_ns()
+
+    def add(self, name: str, turn_id: int, start: int, end: int, attrs: dict = None) -> None:
+        """
+        Record a finished span.
+
+        Args:
+            name (str): The stage name.
+            turn_id (int): The turn the stage belongs to.
+            start (int): The start, from now().
+            end (int): The end, from now().
+            attrs (dict): Extra fields to export with the span.
+        """
+        if not self.enabled:
+            return
+        record = {
+            "name": name, "turn_id": turn_id, "start_ns": start, "duration_ns": end - start,
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            record.update(attrs)
+        with self.lock:
+            self.durations[name].append((end - start) / 1e6)
+            if self.file:
+                self.file.write(json.dumps(record) + "\n")
+
+    def windows(self) -> dict:
+        """
+        Copy the recent durations of every stage.
+
+        Returns:
+            dict: Per stage, an array of durations in milliseconds, oldest first.
+        """
+        with self.lock:
+            return {name: np.fromiter(durations, dtype=float) for name, durations in self.durations.items() if durations}
+
+    def percentiles(self) -> dict:
+        """
+        Summarize the recent durations of every stage.
+
+        Returns:
+            dict: Per stage, the count and the mean, p50, p95 and p99 in milliseconds.
+        """
+        summary = {}
+        for name, durations in self.windows().items():
+            p50, p95, p99 = np.percentile(durations, (50, 95, 99))
+            summary[name] = {
+                "count": len(durations), "mean": float(durations.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            }
+        return summary
+
+    def flush(self) -> None:
+        """
+        Write buffered spans to the JSONL file.
+        """
+        with self.lock:
+            if self.file:
+                self.file.flush()
+
+    def close(self) -> None:
+        """
+        Close the JSONL file.
+        """
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+def to_chrome_trace(records: list) -> dict:
+    """
+    Convert span records to the Chrome trace-event format. Each thread becomes a track.
+
+    Args:
+        records (list): Span records, as written to the JSONL file.
+
+    Returns:
+        dict: The trace, ready for json.dump.
+    """
+    threads = {}
+    events = []
+    for record in records:
+        tid = threads.setdefault(record.get("thread"), len(threads))
+        args = {key: value for key, value in record.items() if key not in ("name", "start_ns", "duration_ns", "thread")}
+        events.append({
+            "name": record["name"], "cat": "turn", "ph": "X", "pid": 1, "tid": tid,
+            "ts": record["start_ns"] / 1000, "dur": record["duration_ns"] / 1000, "args": args,
+        })
+    for name, tid in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def read_jsonl(path: str) -> list:
+    """
+    Read a JSONL trace.
+
+    Args:
+        path (str): The trace file.
+
+    Returns:
+        list: The span records.
+    """
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+## The tracer the pipeline reports to. Configured by RecordingLoop from audio_config.yml
+tracer = Tracer()
+
+
+def main() -> None:
+    """
+    Print per-stage percentiles of a JSONL trace and optionally convert it to a Chrome trace.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="A JSONL trace written by the tracer")
+    parser.add_argument("--chrome", help="Write a Chrome trace-event file here")
+    args = parser.parse_args()
+
+    records = read_jsonl(args.trace)
+    summary = Tracer(enabled=True, window=len(records) or 1)
+    for record in records:
+        summary.add(record["name"], record.get("turn_id"), record["start_ns"], record["start_ns"] + record["duration_ns"])
+    for name, stats in summary.percentiles().items():
+        print(f"{name:>15}: n {stats['count']:5d}, p50 {stats['p50']:8.1f} ms, p95 {stats['p95']:8.1f} ms, p99 {stats['p99']:8.1f} ms")
+    if args.chrome:
+        with open(args.chrome, "w") as file:
+            json.dump(to_chrome_trace(records), file)
+        print(f"Wrote {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()
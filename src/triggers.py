@@ -0,0 +1,225 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import keyboard
+
+from handlers.audio_buffer import AudioBuffer
+
+
+## How often a waiting loop wakes up to check whether it should stop, in seconds
+STOP_POLL_INTERVAL = 0.25
+
+
+class TurnTrigger:
+    def __init__(self):
+        """
+        Initialize the TurnTrigger, which decides when a turn starts and how it is recorded.
+
+        wait blocks on an event instead of polling, so an idle loop uses no CPU.
+        """
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def start(self) -> None:
+        """
+        Start listening for turns.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Stop listening for turns and release any resources.
+        """
+        pass
+
+    def press(self) -> None:
+        """
+        Start a turn.
+        """
+        self.released.clear()
+        self.started.set()
+
+    def release(self) -> None:
+        """
+        End the turn being recorded.
+        """
+        self.released.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until a turn starts.
+
+        Args:
+            timeout (float): The maximum time to wait, so the caller can check for shutdown.
+
+        Returns:
+            bool: True if a turn started.
+        """
+        if not self.started.wait(timeout):
+            return False
+        self.started.clear()
+        return True
+
+    def capture(self, recorder, stop: callable, on_start: callable, transcription=None) -> AudioBuffer:
+        """
+        Record the turn that just started, until it is released.
+
+        Args:
+            recorder (VoiceRecorder): The recorder to capture with.
+            stop (callable): Returns True when the loop is shutting down.
+            on_start (callable): Called when recording starts.
+            transcription (TranscriptionStream): If given, fed the audio while it is captured.
+
+        Returns:
+            AudioBuffer: The recording, or None if there is nothing to process.
+        """
+        on_start()
+        return recorder.capture(self.released, stop, transcription)
+
+
+class KeyboardTrigger(TurnTrigger):
+    def __init__(self, key: str):
+        """
+        Initialize the KeyboardTrigger. A turn lasts while key is held down.
+
+        Args:
+            key (str): The recording key.
+        """
+        super().__init__()
+        self.key = key
+        self.hooks = []
+        self.pressed = False
+
+    def start(self) -> None:
+        """
+        Install the keyboard hooks.
+        """
+        self.hooks = [
+            keyboard.on_press_key(self.key, self.on_press),
+            keyboard.on_release_key(self.key, self.on_release),
+        ]
+
+    def close(self) -> None:
+        """
+        Remove the keyboard hooks.
+        """
+        for hook in self.hooks:
+            keyboard.unhook(hook)
+        self.hooks = []
+        self.release()
+
+    def on_press(self, event) -> None:
+        """
+        Keyboard hook for the key going down. Auto-repeat presses are ignored.
+
+        Args:
+            event: The keyboard event.
+        """
+        if not self.pressed:
+            self.pressed = True
+            self.press()
+
+    def on_release(self, event) -> None:
+        """
+        Keyboard hook for the key coming up.
+
+        Args:
+            event: The keyboard event.
+        """
+        self.pressed = False
+        self.release()
+
+
+class VadTrigger(TurnTrigger):
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Always start listening straight away, voice activity detection finds the turn.
+
+        Args:
+            timeout (float): Unused.
+
+        Returns:
+            bool: Always True.
+        """
+        return True
+
+    def capture(self, recorder, stop: callable, on_start: callable, transcription=None) -> AudioBuffer:
+        """
+        Listen hands-free until an utterance ends in silence. Blocks on the audio stream while idle.
+
+        Args:
+            recorder (VoiceRecorder): The recorder to capture with.
+            stop (callable): Returns True when the loop is shutting down.
+            on_start (callable): Called when speech is detected.
+            transcription (TranscriptionStream): If given, fed the utterance while it is captured.
+
+        Returns:
+            AudioBuffer: The utterance, or None if the loop is shutting down.
+        """
+        return recorder.listen(stop, on_speech=on_start, transcription=transcription)
+
+
+class HttpTrigger(TurnTrigger):
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        """
+        Initialize the HttpTrigger. POST /press starts a turn and POST /release ends it.
+
+        Args:
+            port (int): The port to listen on.
+            host (str): The address to listen on.
+        """
+        super().__init__()
+        self.address = (host, int(port))
+        self.server = None
+        self.thread = None
+
+    def start(self) -> None:
+        """
+        Start the HTTP server on a background thread.
+        """
+        trigger = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                actions = {"/press": trigger.press, "/release": trigger.release}
+                action = actions.get(self.path)
+                if action:
+                    action()
+                self.send_response(200 if action else 404)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="http-trigger", daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        """
+        Shut the HTTP server down.
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.release()
+
+
+def create_trigger(capture_mode: str, recording_key: str, trigger_port: int = 8765) -> TurnTrigger:
+    """
+    Create the trigger for a capture mode.
+
+    Args:
+        capture_mode (str): "key", "vad" or "http".
+        recording_key (str): The key used in "key" mode.
+        trigger_port (int): The port used in "http" mode.
+
+    Returns:
+        TurnTrigger: The trigger.
+    """
+    if capture_mode == "vad":
+        return VadTrigger()
+    if capture_mode == "http":
+        return HttpTrigger(trigger_port)
+    return KeyboardTrigger(recording_key)
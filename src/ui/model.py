@@ -1,11 +1,20 @@
-import importlib
+import os
 from threading import Thread
 
-from ui.signal import application_signal
+from events import application_signal
 from loop import RecordingLoop
+from async_loop import AsyncRecordingLoop
+from config import to_bool
 from handlers.ai_handler import AIConfig
+from handlers.async_handler import ThreadedAIHandler
+from handlers.cache import CachedAIHandler, ResponseCache, read_cache_settings
+from handlers.registry import HandlerRegistry
 from handlers.audio_handler import AudioConfig
 from handlers.network.client import NetworkConfig, RestClient
+from handlers.network.async_client import AsyncDelivery
+from handlers.network.delivery import DeliveryQueue
+from handlers.network.streaming import SpeechStream
+from metrics import metrics
 
 class Model:
     def __init__(self):
@@ -18,6 +27,10 @@ class Model:
         self.stop_recording = False
         
         self.network = None
+        self.delivery = None
+        self.response_cache = None
+        self.response_cache_settings = None
+        self.handlers = HandlerRegistry()
 
         # Connect the shutdown signal to stop_audio method
         application_signal.shutdownSignal.connect(self.stop_audio)
@@ -30,8 +43,23 @@ class Model:
             config: The configuration class instance.
             config_path (str): The path to the configuration file.
         """
-        config_handler = config.config_class(config_path)
-        self.configs[config.config_class.NAME] = config_handler
+        self.load_config(config.config_class, config_path)
+
+    def load_config(self, config_class: type, config_path: str) -> None:
+        """
+        Load a configuration file without a config dock, as the headless entry point does.
+
+        Args:
+            config_class (type): The configuration class, AIConfig, AudioConfig or NetworkConfig.
+            config_path (str): The path to the configuration file.
+        """
+        self.configs[config_class.NAME] = config_class(config_path)
+        ## Build the handler in the background now, so the first "Go Live" does not wait for it
+        if config_class is AIConfig:
+            config = self.configs[config_class.NAME].config
+            self.handlers.prepare(config)
+            if config.get("async_module"):
+                self.handlers.prepare({**config, "module": config["async_module"]})
 
     def save_config(self, config) -> None:
         """
@@ -61,7 +89,7 @@ class Model:
 
     def get_ai_class(self, module_string: str):
         """
-        Dynamically import and return a class from a module string.
+        Dynamically import and return a class from a module string. Resolved classes are cached.
 
         Args:
             module_string (str): The module path string.
@@ -69,11 +97,56 @@ class Model:
         Returns:
             class: The dynamically imported class.
         """
-        *module_path_parts, class_name = module_string.split('.')
-        module_path = '.'.join(module_path_parts)
-        module = importlib.import_module(module_path)
-        handler_class = getattr(module, class_name)
-        return handler_class
+        return self.handlers.resolve(module_string)
+
+    def create_ai_service(self, config, new_conversation: bool = True):
+        """
+        Get the AI handler for a config, wrapped in the response cache if it is enabled.
+
+        The handler comes from the registry and is reused until the config changes. The cache survives
+        between sessions and is only rebuilt when its own settings change; it always embeds with the current handler.
+
+        Args:
+            config: The AI configuration.
+            new_conversation (bool): Forget the conversation of the previous session.
+
+        Returns:
+            AIHandler: The handler.
+        """
+        service = self.handlers.get(config.config)
+        if new_conversation:
+            service.reset()
+        if not to_bool(config.config.get("response_cache", False)):
+            return service
+
+        settings = read_cache_settings(config.config)
+        if self.response_cache is None or settings != self.response_cache_settings:
+            if self.response_cache:
+                self.response_cache.close()
+            self.response_cache = ResponseCache(**settings)
+            self.response_cache_settings = settings
+        ## The registry builds a new handler when the config changes, the cache embeds with the current one
+        self.response_cache.embedder = service.embed if settings["similarity_threshold"] > 0 else None
+        return CachedAIHandler(service, self.response_cache)
+
+    def create_async_ai_service(self, config):
+        """
+        Get the handler for the async live loop. async_module names a native asyncio handler, which
+        comes from the registry like the regular one; otherwise the regular handler (and its response
+        cache) runs in worker threads.
+
+        Args:
+            config: The AI configuration.
+
+        Returns:
+            AsyncAIHandler: The handler.
+        """
+        module = config.config.get("async_module")
+        if module:
+            service = self.handlers.get({**config.config, "module": module})
+            service.reset()
+            return service
+        return ThreadedAIHandler(self.create_ai_service(config))
 
     def test_ai_response(self) -> str:
         """
@@ -86,9 +159,9 @@ class Model:
 
         if config:
             if application_signal:
-                ai_class = self.get_ai_class(config.config.get("module"))
-                service = ai_class(**config.config)
-                response = service.get_response("What is the weather in Denmark?")
+                ## prepare_response answers without adding the exchange to the live session's history
+                service = self.create_ai_service(config, new_conversation=False)
+                response = service.prepare_response("What is the weather in Denmark?")
                 message = f"{service.NAME} : {response.content}"
                 application_signal.addResponseWidgetSignal.emit(message)
                 application_signal.closeDialogSignal.emit()
@@ -104,8 +177,7 @@ class Model:
         if config:
             if application_signal:
                 if not self.recording_loop:
-                    ai_class = self.get_ai_class(config.config.get("module"))
-                    service = ai_class(**config.config)
+                    service = self.create_ai_service(config)
                     self.recording_loop = RecordingLoop(ai_service=service, **self.configs[AudioConfig.NAME].config)
                     
                     self.stop_recording = False
@@ -120,12 +192,22 @@ class Model:
         if config:
             if application_signal:
                 if not self.recording_loop:
-                    ai_class = self.get_ai_class(config.config.get("module"))
-                    service = ai_class(**config.config)
-                    self.recording_loop = RecordingLoop(ai_service=service, **self.configs[AudioConfig.NAME].config)
-                    
+                    audio_config = self.configs[AudioConfig.NAME].config
+                    if audio_config.get("loop", "thread") == "async":
+                        ## One event loop on the recording thread runs every stage and the delivery
+                        service = self.create_async_ai_service(config)
+                        self.recording_loop = AsyncRecordingLoop(ai_service=service, **audio_config)
+                        callback = self.create_async_delivery()
+                        args = (id, lambda: self.stop_recording, callback)
+                    else:
+                        service = self.create_ai_service(config)
+                        self.recording_loop = RecordingLoop(ai_service=service, **audio_config)
+                        callback = self.send_network_message
+                        ## A streaming endpoint gets each response uploaded while it is still being synthesized
+                        args = (id, lambda: self.stop_recording, callback, self.upload_mode() == "stream")
+
                     self.stop_recording = False
-                    self.recording_thread = Thread(target=self.recording_loop.start_live, args=(id, lambda: self.stop_recording, self.send_network_message))
+                    self.recording_thread = Thread(target=self.recording_loop.start_live, args=args)
                     self.recording_thread.start()
 
     def stop_audio(self) -> None:
@@ -142,11 +224,102 @@ class Model:
                 self.recording_loop = None
                 self.recording_thread = None
 
-    def send_network_message(self, path) -> None:
+                ## Drop undelivered audio and release the pooled connections, the next session may use a different network config
+                if self.delivery:
+                    self.delivery.close(drain=False, timeout=1.0)
+                    self.delivery = None
+                if self.network:
+                    self.network.close()
+                    self.network = None
+
+    def send_network_message(self, audio, turn_id: int = None) -> None:
+        """
+        Queue a voice response for the network endpoint. Returns straight away, a background
+        worker sends the responses in order.
+
+        Args:
+            audio (AudioBuffer): The voice response.
+            turn_id (int): The turn the response belongs to, used by the coalesce delivery policy.
+        """
         config = self.configs[NetworkConfig.NAME]
         if config:
             if application_signal:
                 if self.recording_loop:
                     if self.network == None:
                         self.network = RestClient(**config.config)
-                    self.network.send_text(text=path)
\ No newline at end of file
+                    if self.delivery == None:
+                        self.delivery = DeliveryQueue(
+                            self.deliver,
+                            max_queue_size=int(config.config.get("delivery_queue_size", 8)),
+                            policy=config.config.get("delivery_policy", "block"),
+                            on_metrics=application_signal.deliveryMetricsSignal.emit,
+                            on_drop=self.discard_voice,
+                        )
+                        metrics.register_gauge("queue.delivery", lambda: len(self.delivery.items) if self.delivery else 0)
+                    self.delivery.submit(audio, turn_id)
+
+    def create_async_delivery(self):
+        """
+        Create the delivery callback for the async live loop.
+
+        Returns:
+            callable: An AsyncDelivery, or a callback that drops the audio if there is no network config.
+        """
+        config = self.configs[NetworkConfig.NAME]
+        if not config:
+            return lambda audio, turn_id=None: None
+        return AsyncDelivery(config.config, self.save_voice, on_metrics=application_signal.deliveryMetricsSignal.emit)
+
+    def save_voice(self, audio) -> str:
+        """
+        Write a voice response to folder_path, where a path-mode endpoint reads it.
+
+        Args:
+            audio (AudioBuffer): The voice response.
+
+        Returns:
+            str: The path written to.
+        """
+        config = self.configs[NetworkConfig.NAME]
+        return audio.save(os.path.join(config.config.get("folder_path"), audio.name))
+
+    def upload_mode(self) -> str:
+        """
+        Get how voice responses reach the network endpoint.
+
+        Returns:
+            str: "stream" or "path", "path" without a network config.
+        """
+        config = self.configs.get(NetworkConfig.NAME)
+        return config.config.get("upload_mode", "path") if config else "path"
+
+    def discard_voice(self, audio) -> None:
+        """
+        Release a voice response the delivery queue dropped, so a streamed one stops synthesizing.
+
+        Args:
+            audio (AudioBuffer): The voice response, or a SpeechStream.
+        """
+        if isinstance(audio, SpeechStream):
+            audio.close()
+
+    def deliver(self, audio):
+        """
+        Send a voice response to the network endpoint. Runs on the delivery worker.
+
+        With upload_mode "stream" the clip is uploaded as PCM and the endpoint plays it as it arrives;
+        a SpeechStream is uploaded chunk by chunk while it is still being synthesized.
+        Otherwise the endpoint reads the audio from disk, so the clip is written to folder_path first
+        unless it already has a path.
+
+        Args:
+            audio (AudioBuffer): The voice response, or a SpeechStream in stream mode.
+
+        Returns:
+            Response: The HTTP response, or None if sending failed.
+        """
+        if isinstance(audio, SpeechStream):
+            return self.network.send_speech(audio)
+        if self.upload_mode() == "stream":
+            return self.network.send_audio(audio)
+        return self.network.send_text(text=audio.path or self.save_voice(audio))
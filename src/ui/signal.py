@@ -1,10 +1,80 @@
-from PyQt5.QtCore import pyqtSignal, QObject
+import time
+
+import numpy as np
+from PyQt5.QtCore import pyqtSignal, QObject, QTimer
+
+from events import application_signal, EventBus
+from metrics import metrics
+from tracing import tracer
+
+## Histogram bin edges for stage latencies, in milliseconds
+LATENCY_BINS = np.geomspace(1, 30000, 19)
 
 class Communicate(QObject):
     addResponseWidgetSignal = pyqtSignal(str)
     closeDialogSignal = pyqtSignal()
     shutdownSignal = pyqtSignal()
     isRecording = pyqtSignal(str)
+    deliveryMetricsSignal = pyqtSignal(dict)
+    metricsSignal = pyqtSignal(dict)
+
+# A global instance of Communicate. Widgets connect here, everything emits on application_signal
+qt_signal = Communicate()
+
+## Mirror the event bus onto Qt, so slots of widgets run on the GUI thread whichever thread emitted
+for name in EventBus.SIGNALS:
+    getattr(application_signal, name).connect(getattr(qt_signal, name).emit)
+
+
+class MetricsPublisher(QObject):
+    def __init__(self, refresh_ms: int = 500):
+        """
+        Initialize the MetricsPublisher, which emits one metricsSignal per refresh interval.
+
+        Workers only bump counters and record spans. The GUI thread reads them here at a fixed rate,
+        so a burst of events never turns into a burst of signals.
+
+        Args:
+            refresh_ms (int): Milliseconds between snapshots.
+        """
+        super().__init__()
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(refresh_ms))
+        self.timer.timeout.connect(self.publish)
+        self.last_time = time.monotonic()
+        self.last_turns = 0
+
+    def start(self) -> None:
+        """
+        Start publishing, and record spans in memory for the stage statistics.
+        """
+        tracer.watch()
+        self.last_time = time.monotonic()
+        self.timer.start()
+
+    def stop(self) -> None:
+        """
+        Stop publishing.
+        """
+        self.timer.stop()
+        tracer.unwatch()
+
+    def publish(self) -> None:
+        """
+        Take a snapshot of the metrics and the stage latencies and emit it.
+        """
+        snapshot = metrics.snapshot()
+        now = time.monotonic()
+        turns = snapshot["counters"].get("turns.completed", 0)
+        snapshot["throughput"] = (turns - self.last_turns) / (now - self.last_time) * 60
+        self.last_time, self.last_turns = now, turns
 
-# A global instance of Communicate
-application_signal = Communicate()
\ No newline at end of file
+        stages = {}
+        for name, durations in tracer.windows().items():
+            p50, p95, p99 = np.percentile(durations, (50, 95, 99))
+            stages[name] = {
+                "count": len(durations), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+                "histogram": np.histogram(durations, LATENCY_BINS)[0].tolist(),
+            }
+        snapshot["stages"] = stages
+        application_signal.metricsSignal.emit(snapshot)
@@ -2,13 +2,14 @@ from PyQt5.QtWidgets import QApplication, QMainWindow, QDockWidget, QAction, QTo
 from PyQt5.QtCore import Qt, QTimer
 
 from ui.model import Model
-from ui.signal import application_signal
+from events import application_signal
+from ui.signal import MetricsPublisher
 import handlers.ai_handler as ai_handler
 from handlers.ai_handler import AIConfig
 from handlers.audio_handler import AudioConfig
 from handlers.network.client import NetworkConfig
 from ui.widgets.dialog import SignalDialog
-from ui.widgets.docks import ConfigDock
+from ui.widgets.docks import ConfigDock, DashboardDock
 from ui.widgets.widgets import CenterResponseWidget
 
 class MainView(QMainWindow):
@@ -23,6 +24,7 @@ class MainView(QMainWindow):
         config_dock = ConfigDock(model, AIConfig)
         audio_config_dock = ConfigDock(model, AudioConfig)
         network_dock = ConfigDock(model, NetworkConfig)
+        dashboard_dock = DashboardDock()
 
         response_widget = CenterResponseWidget(model)
 
@@ -32,6 +34,11 @@ class MainView(QMainWindow):
         self.addDockWidget(Qt.LeftDockWidgetArea, config_dock)
         self.addDockWidget(Qt.RightDockWidgetArea, audio_config_dock)
         self.addDockWidget(Qt.RightDockWidgetArea, network_dock)
+        self.addDockWidget(Qt.RightDockWidgetArea, dashboard_dock)
+
+        ## Snapshot the metrics twice a second, however busy the pipeline is
+        self.metrics_publisher = MetricsPublisher(500)
+        self.metrics_publisher.start()
 
         ## Create toolbar
         toolbar = QToolBar("Main Toolbar")
@@ -53,9 +60,15 @@ class MainView(QMainWindow):
         network_dock_action.setChecked(True)
         network_dock_action.triggered.connect(lambda: self.toggle_dock(network_dock))
 
+        dashboard_dock_action = QAction("Dashboard Dock", self)
+        dashboard_dock_action.setCheckable(True)
+        dashboard_dock_action.setChecked(True)
+        dashboard_dock_action.triggered.connect(lambda: self.toggle_dock(dashboard_dock))
+
         toolbar.addAction(config_dock_action)
         toolbar.addAction(audio_config_dock_action)
         toolbar.addAction(network_dock_action)
+        toolbar.addAction(dashboard_dock_action)
         
         self.resize_docks([config_dock, audio_config_dock], [300, 300])
 
@@ -88,6 +101,7 @@ class MainView(QMainWindow):
         Args:
             event: The close event.
         """
+        self.metrics_publisher.stop()
         application_signal.shutdownSignal.emit()
         QTimer.singleShot(1000, self.close_application)
         event.ignore()
@@ -2,7 +2,7 @@ from PyQt5.QtWidgets import QWidget, QDialog, QVBoxLayout, QLabel, QPushButton
 from PyQt5.QtCore import pyqtSlot, Qt
 from PyQt5.QtGui import QPainter, QColor
 
-from ui.signal import application_signal
+from ui.signal import qt_signal
 
 STATUS = {
     "USER" : "red",
@@ -15,7 +15,7 @@ class CircleWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.color = QColor('red')
-        application_signal.isRecording.connect(self.set_color)
+        qt_signal.isRecording.connect(self.set_color)
 
     @pyqtSlot(str)
     def set_color(self, status):
@@ -63,4 +63,4 @@ class SignalDialog(QDialog):
         self.setLayout(layout)
 
         ## Connect the signal to close the dialog
-        application_signal.closeDialogSignal.connect(self.accept)
\ No newline at end of file
+        qt_signal.closeDialogSignal.connect(self.accept)
\ No newline at end of file
@@ -3,6 +3,8 @@ from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLab
 from PyQt5.QtCore import Qt
 
 from ui.model import Model
+from ui.signal import qt_signal
+from ui.widgets.widgets import HistogramWidget
 import handlers.ai_handler as ai_handler
 
 class ConfigDock(QDockWidget):
@@ -134,4 +136,100 @@ class ConfigDock(QDockWidget):
         Reload the view to reflect changes.
         """
         self.update()
-        self.repaint()
\ No newline at end of file
+        self.repaint()
+
+
+class DashboardDock(QDockWidget):
+    NAME = "Dashboard"
+
+    def __init__(self) -> None:
+        """
+        Initialize the DashboardDock, a live view of stage latencies, throughput, queue depths,
+        cache hit rates and audio overflows. It only redraws on metricsSignal, which the
+        MetricsPublisher emits at a fixed rate.
+        """
+        super().__init__()
+        self.setWindowTitle(self.NAME)
+        self.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | Qt.BottomDockWidgetArea)
+
+        self.main_widget = QWidget()
+        self.main_widget.setMinimumWidth(250)
+        self.layout = QVBoxLayout(self.main_widget)
+        self.layout.setAlignment(Qt.AlignTop)
+        self.stage_rows = {}
+
+        self.create_view()
+        self.setWidget(self.main_widget)
+        qt_signal.metricsSignal.connect(self.update_metrics)
+
+    def create_view(self) -> None:
+        """
+        Create the summary labels and the layout the stage rows are added to.
+        """
+        self.throughput_label = QLabel("Throughput: -")
+        self.queue_label = QLabel("Queues: -")
+        self.cache_label = QLabel("Caches: -")
+        self.audio_label = QLabel("Audio: no overflows")
+        self.speculation_label = QLabel("Speculation: -")
+        for label in (self.throughput_label, self.queue_label, self.cache_label, self.audio_label, self.speculation_label):
+            label.setWordWrap(True)
+            self.layout.addWidget(label)
+
+        self.stages_layout = QVBoxLayout()
+        self.layout.addLayout(self.stages_layout)
+
+    def stage_row(self, name: str) -> tuple:
+        """
+        Get the label and histogram of a stage, adding them the first time the stage is seen.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            tuple: The QLabel and the HistogramWidget.
+        """
+        if name not in self.stage_rows:
+            label = QLabel(name)
+            histogram = HistogramWidget()
+            self.stages_layout.addWidget(label)
+            self.stages_layout.addWidget(histogram)
+            self.stage_rows[name] = (label, histogram)
+        return self.stage_rows[name]
+
+    def update_metrics(self, snapshot: dict) -> None:
+        """
+        Show a metrics snapshot.
+
+        Args:
+            snapshot (dict): The MetricsPublisher snapshot.
+        """
+        counters, gauges = snapshot["counters"], snapshot["gauges"]
+        self.throughput_label.setText(
+            f"Throughput: {snapshot['throughput']:.1f} turns/min, {counters.get('turns.completed', 0)} total"
+        )
+
+        queues = [f"{name[len('queue.'):]} {depth}" for name, depth in sorted(gauges.items()) if name.startswith("queue.")]
+        self.queue_label.setText("Queues: " + (", ".join(queues) or "-"))
+
+        caches = []
+        for name, counts in sorted(gauges.items()):
+            if name.startswith("cache."):
+                total = counts["hits"] + counts["misses"]
+                rate = f"{100 * counts['hits'] / total:.0f}%" if total else "-"
+                caches.append(f"{name[len('cache.'):]} {rate} of {total}")
+        self.cache_label.setText("Caches: " + (", ".join(caches) or "-"))
+
+        audio = [f"{name[len('audio.'):].replace('_', ' ')} {count}" for name, count in sorted(counters.items()) if name.startswith("audio.")]
+        self.audio_label.setText("Audio: " + (", ".join(audio) or "no overflows"))
+
+        started = counters.get("speculation.started", 0)
+        if started:
+            self.speculation_label.setText(
+                f"Speculation: used {counters.get('speculation.used', 0)} of {started}, "
+                f"wasted {counters.get('speculation.wasted', 0)} ({counters.get('speculation.wasted_ms', 0) / 1000:.1f} s)"
+            )
+
+        for name, stats in snapshot["stages"].items():
+            label, histogram = self.stage_row(name)
+            label.setText(f"{name}: p50 {stats['p50']:.0f} ms, p95 {stats['p95']:.0f} ms, p99 {stats['p99']:.0f} ms (n {stats['count']})")
+            histogram.set_counts(stats["histogram"])
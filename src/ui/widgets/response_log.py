@@ -0,0 +1,258 @@
+import collections
+
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect, QTimer
+
+from events import PARTIAL_PREFIX, USER_PREFIX
+
+## Messages kept when no limit is configured
+DEFAULT_LOG_LIMIT = 2000
+
+
+class ResponseLogModel(QAbstractListModel):
+    def __init__(self, max_messages: int = DEFAULT_LOG_LIMIT):
+        """
+        Initialize the ResponseLogModel, an append-only list of log messages with a retention cap.
+
+        Args:
+            max_messages (int): The number of messages kept. The oldest are dropped first.
+        """
+        super().__init__()
+        self.max_messages = max(1, int(max_messages))
+        self.messages = collections.deque()
+        ## Messages dropped so far, so rows can be tracked by an index that trimming does not shift
+        self.dropped = 0
+        ## That index for the partial transcript being shown, if any
+        self.partial = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        """
+        Count the messages.
+
+        Args:
+            parent (QModelIndex): Unused, the model is a flat list.
+
+        Returns:
+            int: The number of messages.
+        """
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        """
+        Read a message.
+
+        Args:
+            index (QModelIndex): The row.
+            role (int): The data role. Only DisplayRole is served.
+
+        Returns:
+            str: The message, or None.
+        """
+        if role == Qt.DisplayRole and 0 <= index.row() < len(self.messages):
+            return self.messages[index.row()]
+        return None
+
+    def append(self, messages: list) -> None:
+        """
+        Add a batch of messages at the end, dropping the oldest ones over the cap.
+        The view is told about one removal and one insertion per batch, never a reset.
+
+        Args:
+            messages (list): The messages, oldest first.
+        """
+        messages = self.replace_partial(messages)
+        skipped = max(0, len(messages) - self.max_messages)
+        messages = messages[skipped:]
+        if not messages:
+            return
+        self.trim(self.max_messages - len(messages))
+        self.dropped += skipped
+        first = len(self.messages)
+        self.beginInsertRows(QModelIndex(), first, first + len(messages) - 1)
+        self.messages.extend(messages)
+        self.endInsertRows()
+
+    def trim(self, keep: int) -> None:
+        """
+        Drop the oldest messages until at most keep remain.
+
+        Args:
+            keep (int): The number of messages to keep.
+        """
+        excess = len(self.messages) - max(0, keep)
+        if excess <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+        for _ in range(excess):
+            self.messages.popleft()
+        self.dropped += excess
+        self.endRemoveRows()
+
+    def replace_partial(self, messages: list) -> list:
+        """
+        Let a partial transcript replace the partial transcript shown before it, and the final
+        transcript replace the last partial one, so a turn being spoken takes a single row.
+
+        Args:
+            messages (list): The messages, oldest first.
+
+        Returns:
+            list: The messages that still have to be appended.
+        """
+        appended = []
+        for message in messages:
+            partial = message.startswith(PARTIAL_PREFIX)
+            replaces = partial or message.startswith(USER_PREFIX)
+            position = self.partial - self.dropped if replaces and self.partial is not None else -1
+            if position >= len(self.messages):
+                appended[position - len(self.messages)] = message
+            elif position >= 0:
+                ## Removed and inserted again rather than changed, so the view measures the new height
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self.messages[position]
+                self.endRemoveRows()
+                self.beginInsertRows(QModelIndex(), position, position)
+                self.messages.insert(position, message)
+                self.endInsertRows()
+            else:
+                appended.append(message)
+                position = len(self.messages) + len(appended) - 1
+            if replaces:
+                self.partial = self.dropped + position if partial else None
+        return appended
+
+    def set_limit(self, max_messages: int) -> None:
+        """
+        Change the retention cap, dropping messages if the log is over it.
+
+        Args:
+            max_messages (int): The number of messages kept.
+        """
+        self.max_messages = max(1, int(max_messages))
+        self.trim(self.max_messages)
+
+
+class ResponseDelegate(QStyledItemDelegate):
+    ## Pixels around every message
+    MARGIN = 4
+
+    def __init__(self, view: QListView):
+        """
+        Initialize the ResponseDelegate, which draws messages word wrapped to the width of the view.
+
+        Args:
+            view (QListView): The view the delegate draws in.
+        """
+        super().__init__(view)
+        self.view = view
+        self.heights = {}
+        self.width = 0
+
+    def text_rect(self, option, text: str) -> QRect:
+        """
+        Measure a message wrapped to the width of the view.
+
+        Args:
+            option (QStyleOptionViewItem): The style option, for the font.
+            text (str): The message.
+
+        Returns:
+            QRect: The wrapped text bounds.
+        """
+        width = max(1, self.view.viewport().width() - 2 * self.MARGIN)
+        return option.fontMetrics.boundingRect(QRect(0, 0, width, 0), Qt.TextWordWrap | Qt.AlignLeft | Qt.AlignTop, text)
+
+    def sizeHint(self, option, index: QModelIndex) -> QSize:
+        """
+        Size a message. Heights are cached until the view width changes.
+
+        Args:
+            option (QStyleOptionViewItem): The style option.
+            index (QModelIndex): The row.
+
+        Returns:
+            QSize: The size of the wrapped message.
+        """
+        width = self.view.viewport().width()
+        if width != self.width:
+            self.heights.clear()
+            self.width = width
+        text = index.data(Qt.DisplayRole) or ""
+        height = self.heights.get(text)
+        if height is None:
+            height = self.text_rect(option, text).height() + 2 * self.MARGIN
+            ## Messages repeat rarely, so bound the cache by the log size instead of letting it grow
+            if len(self.heights) > 2 * index.model().rowCount():
+                self.heights.clear()
+            self.heights[text] = height
+        return QSize(width, height)
+
+    def paint(self, painter, option, index: QModelIndex) -> None:
+        """
+        Draw a message.
+
+        Args:
+            painter (QPainter): The painter.
+            option (QStyleOptionViewItem): The style option.
+            index (QModelIndex): The row.
+        """
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            painter.setPen(option.palette.highlightedText().color())
+        rect = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        painter.drawText(rect, Qt.TextWordWrap | Qt.AlignLeft | Qt.AlignTop, index.data(Qt.DisplayRole) or "")
+        painter.restore()
+
+
+class ResponseLogView(QListView):
+    def __init__(self, max_messages: int = DEFAULT_LOG_LIMIT, flush_ms: int = 50):
+        """
+        Initialize the ResponseLogView, a virtualized conversation log. Only visible rows are drawn,
+        and messages arriving close together are inserted as one batch.
+
+        Args:
+            max_messages (int): The number of messages kept.
+            flush_ms (int): How long messages wait to be batched before they are shown.
+        """
+        super().__init__()
+        self.log_model = ResponseLogModel(max_messages)
+        self.setModel(self.log_model)
+        self.setItemDelegate(ResponseDelegate(self))
+        self.setWordWrap(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+        self.pending = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(int(flush_ms))
+        self.flush_timer.timeout.connect(self.flush)
+
+    def add_message(self, message: str) -> None:
+        """
+        Queue a message. It is shown with the rest of its batch when the flush timer fires.
+
+        Args:
+            message (str): The message.
+        """
+        self.pending.append(message)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self) -> None:
+        """
+        Insert the queued messages, following the end of the log if it was already scrolled there.
+        """
+        if not self.pending:
+            return
+        scroll_bar = self.verticalScrollBar()
+        follow = scroll_bar.value() >= scroll_bar.maximum()
+        messages, self.pending = self.pending, []
+        self.log_model.append(messages)
+        if follow:
+            self.scrollToBottom()
@@ -1,10 +1,12 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QScrollArea, QSizePolicy
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSizePolicy
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPainter, QColor
 
 from ui.model import Model
-from ui.signal import application_signal
+from ui.signal import qt_signal
 from handlers.audio_handler import AudioConfig
 from ui.widgets.dialog import SignalDialog
+from ui.widgets.response_log import ResponseLogView, DEFAULT_LOG_LIMIT
 
 
 class CenterResponseWidget(QWidget):
@@ -29,22 +31,21 @@ class CenterResponseWidget(QWidget):
         ## Main layout for the response widget
         main_layout = QVBoxLayout()
         
-        self.scroll = QScrollArea()
-        widget = QWidget()          
-        self.log_layout = QVBoxLayout(widget)
-        self.log_layout.setAlignment(Qt.AlignTop)
+        ## Virtualized log, capped at log_limit messages from the audio config
+        audio_config = self.model.configs.get(AudioConfig.NAME)
+        log_limit = audio_config.config.get("log_limit", DEFAULT_LOG_LIMIT) if audio_config else DEFAULT_LOG_LIMIT
+        self.log_view = ResponseLogView(int(log_limit))
+        self.log_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
-        application_signal.addResponseWidgetSignal.connect(self.add_response)
-
-        ## Scroll area configuration
-        self.scroll.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        self.scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.scroll.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Set expanding policy
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setWidget(widget)
+        qt_signal.addResponseWidgetSignal.connect(self.add_response)
 
         ## Buttons layout
         buttons_layout = QHBoxLayout()
+
+        ## Delivery status, updated by the network delivery worker
+        self.delivery_label = QLabel("")
+        qt_signal.deliveryMetricsSignal.connect(self.update_delivery_metrics)
+        buttons_layout.addWidget(self.delivery_label)
         
         test_button = QPushButton("Test AI Response")
         test_button.clicked.connect(self.test_ai_response)
@@ -60,7 +61,7 @@ class CenterResponseWidget(QWidget):
 
         buttons_layout.setAlignment(Qt.AlignBottom | Qt.AlignRight)
 
-        main_layout.addWidget(self.scroll)
+        main_layout.addWidget(self.log_view)
         main_layout.addLayout(buttons_layout)
         self.layout.addLayout(main_layout)
 
@@ -71,12 +72,20 @@ class CenterResponseWidget(QWidget):
         Args:
             response (str): The response to add.
         """
-        response_widget = QLabel(response)
-        response_widget.setWordWrap(True)  # Enable word wrapping for the label
-        response_widget.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        response_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)  # Set expanding policy
+        self.log_view.add_message(response)
 
-        self.log_layout.addWidget(response_widget)
+    def update_delivery_metrics(self, metrics: dict) -> None:
+        """
+        Show the delivery queue metrics.
+
+        Args:
+            metrics (dict): The DeliveryMetrics snapshot.
+        """
+        self.delivery_label.setText(
+            f"Delivery: queued {metrics['queue_depth']}, sent {metrics['sent']}, "
+            f"failed {metrics['failed']}, dropped {metrics['dropped']}, "
+            f"latency {metrics['mean_latency_ms']:.0f} ms"
+        )
 
     def test_ai_response(self) -> None:
         """
@@ -116,3 +125,41 @@ class CenterResponseWidget(QWidget):
         """
         self.model.stop_audio()
 
+
+
+class HistogramWidget(QWidget):
+    def __init__(self) -> None:
+        """
+        Initialize the HistogramWidget, a small bar chart of bin counts.
+        """
+        super().__init__()
+        self.counts = []
+        self.setMinimumHeight(40)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def set_counts(self, counts: list) -> None:
+        """
+        Show new bin counts.
+
+        Args:
+            counts (list): The count of every bin, left to right.
+        """
+        self.counts = counts
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        """
+        Draw one bar per bin, scaled to the largest bin.
+
+        Args:
+            event: The paint event.
+        """
+        if not self.counts:
+            return
+        painter = QPainter(self)
+        peak = max(max(self.counts), 1)
+        width = self.width() / len(self.counts)
+        for index, count in enumerate(self.counts):
+            height = int(self.height() * count / peak)
+            painter.fillRect(int(index * width), self.height() - height, max(int(width) - 1, 1), height, QColor(70, 130, 180))
+        painter.end()